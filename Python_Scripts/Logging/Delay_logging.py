@@ -1,38 +1,311 @@
-import pexpect
+import time
+import asyncio
+import argparse
 import datetime
 
+from log_writer import COMPRESSIONS, compressed_name, open_output, record_line
 
-with open('nping_log.txt', 'w') as file:  # 'w' for new file
-            file.write("")
-# Define the command
-command = 'sudo nping -p 62 --tcp 129.237.161.212 -c 1'
-
-# Set your password
-password = 'comms'
-
-try:
-    while True:
-        # Run the command using pexpect
-        child = pexpect.spawn(command)
-        child.expect('[sudo]', timeout=30)  # General pattern to match the sudo prompt
-        child.sendline(password)
-        child.expect(pexpect.EOF)
-        output = child.before.decode()
-
-        # Get the current date and time
-        current_time = datetime.datetime.now().strftime('%Y/%b/%d %H:%M:%S')
-
-        # Save the result to a text file
-        with open('nping_log.txt', 'a') as file:  # 'a' for append mode
-            file.write(f"Date and Time: {current_time}\n")
-            file.write(output)
-            file.write("\n\n")  # Add some spacing between entries
-
-        print(f"Nping result saved with timestamp: {current_time}")
-
-except pexpect.TIMEOUT:
-    print("The command timed out. Make sure the password prompt pattern is correct.")
-except KeyboardInterrupt:
-    print("\nScript stopped manually.")
-except Exception as e:
-    print(f"An error occurred: {e}")
+# Server that answers the RTT probes (a PC in Nichols Hall) and the TCP port probed on it
+SERVER_IP = '129.237.161.212'
+SERVER_PORT = 62
+
+LOG_FILE = 'nping_log.txt'
+
+# typed record of every probe (--records), next to the text log
+RECORDS_FILE = 'nping_records.jsonl'
+
+# Password for sudo, only needed by the old nping mode
+PASSWORD = 'comms'
+
+
+class Clock:
+    """Monotonic clock with a fixed anchor to wall-clock time
+
+    Probes are scheduled and timed on time.monotonic(), so RTTs and the spacing
+    of the samples are not disturbed when NTP or GPS steps the system clock.
+    Wall-clock times for the log are derived from the anchor taken at start.
+    """
+
+    def __init__(self):
+        self.monotonic_start = time.monotonic()
+        self.wall_start = datetime.datetime.now()
+
+    def now(self):
+        return time.monotonic()
+
+    def wall(self, monotonic):
+        return self.wall_start + datetime.timedelta(seconds=monotonic - self.monotonic_start)
+
+
+async def probe_rtt(host, port, timeout):
+    """Time one TCP handshake to host:port
+
+    Returns (rtt_ms, status). A SYN/ACK ('ok') and a RST ('refused') both come
+    from the server, so both give an RTT; 'timeout' and 'error' give None.
+    """
+    start = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except ConnectionRefusedError:
+        return (time.monotonic() - start) * 1000, 'refused'
+    except asyncio.TimeoutError:
+        return None, 'timeout'
+    except OSError:
+        return None, 'error'
+    rtt = (time.monotonic() - start) * 1000
+    # reset instead of a FIN handshake, the connection was only needed for its RTT
+    writer.transport.abort()
+    return rtt, 'ok'
+
+
+def format_entry(record, clock):
+    """A probe result in the layout of nping_log.txt, so all_data_extract.py reads both alike"""
+    stamp = clock.wall(record['sent']).strftime('%Y/%b/%d %H:%M:%S')
+    lines = [f"Date and Time: {stamp}",
+             f"Probe: seq={record['seq']} monotonic={record['sent']:.6f} status={record['status']} "
+             f"target={record['target']}"]
+    if record['rtt_ms'] is None:
+        lines.append("Max rtt: N/A | Min rtt: N/A | Avg rtt: N/A")
+        lines.append("Raw packets sent: 1 (TCP connect) | Rcvd: 0 | Lost: 1 (100.00%)")
+    else:
+        rtt = record['rtt_ms']
+        lines.append(f"Max rtt: {rtt:.3f}ms | Min rtt: {rtt:.3f}ms | Avg rtt: {rtt:.3f}ms")
+        lines.append("Raw packets sent: 1 (TCP connect) | Rcvd: 1 | Lost: 0 (0.00%)")
+    return "\n".join(lines) + "\n\n\n"
+
+
+def structured_record(record, clock):
+    """The typed --records form of a probe result, read by all_data_extract.py instead of the text"""
+    date, time_of_day = clock.wall(record['sent']).strftime('%Y/%b/%d %H:%M:%S').split()
+    rtt = record['rtt_ms']
+    return {'type': 'delay', 'seq': record['seq'], 'date': date, 'time': time_of_day,
+            'monotonic': round(record['sent'], 6), 'rtt_ms': None if rtt is None else round(rtt, 3),
+            'status': record['status'], 'target': record['target'], 'sent': 1, 'rcvd': 0 if rtt is None else 1}
+
+
+async def run_prober(host, port, clock, emit, rate=1.0, concurrency=4, timeout=2.0, duration=None):
+    """Probe host:port rate times per second, with at most concurrency probes in flight
+
+    Probes start on a fixed monotonic schedule. When all slots are busy (the
+    link is slower than rate x concurrency allows) that tick is skipped rather
+    than queued, so a backlog never builds up. Every result is handed to
+    emit(record) in the order the probes were sent, so nping_log.txt stays in
+    time order with several probes in flight: a result waits in a small
+    reorder buffer (at most concurrency entries) until the probes sent before
+    it are done. Returns the counters of the run.
+    """
+    interval = 1.0 / rate
+    slots = asyncio.Semaphore(concurrency)
+    stats = {'sent': 0, 'answered': 0, 'lost': 0, 'skipped': 0}
+    pending = set()
+    start = clock.now()
+    # finished probes by the order they were sent in, and the next one to emit
+    ready = {}
+    emitted = 0
+    in_order = asyncio.Lock()
+
+    async def one(index, seq, sent):
+        nonlocal emitted
+        record = None
+        try:
+            rtt, status = await probe_rtt(host, port, timeout)
+            stats['answered' if rtt is not None else 'lost'] += 1
+            record = {'seq': seq, 'sent': sent, 'rtt_ms': rtt, 'status': status, 'target': f"{host}:{port}"}
+        finally:
+            slots.release()
+            # a probe that failed unexpectedly leaves a gap instead of holding back the ones after it
+            ready[index] = record
+        async with in_order:
+            while emitted in ready:
+                record = ready.pop(emitted)
+                emitted += 1
+                if record is not None:
+                    await emit(record)
+
+    seq = 0
+    try:
+        while duration is None or clock.now() - start < duration:
+            tick = start + seq * interval
+            delay = tick - clock.now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            seq += 1
+            if slots.locked():
+                stats['skipped'] += 1
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(one(stats['sent'], seq, clock.now()))
+            stats['sent'] += 1
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    finally:
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return stats
+
+
+async def batch_writer(queue, filename, flush_interval=1.0, batch_size=50, compress=None):
+    """Append the text items of queue to filename in batches
+
+    The file stays open for the whole run; a batch is written when batch_size
+    items are waiting or flush_interval seconds passed since the last write.
+    A None item flushes what is left and ends the writer. With compress every
+    batch ends at a flush point of the gzip/zstd stream (log_writer.CompressedLog).
+    """
+    with open_output(filename, compress) as file:
+        batch = []
+        last = time.monotonic()
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(flush_interval - (time.monotonic() - last), 0.01))
+            except asyncio.TimeoutError:
+                item = ''
+            if item is None:
+                break
+            if item:
+                batch.append(item)
+            if batch and (len(batch) >= batch_size or time.monotonic() - last >= flush_interval):
+                file.write(''.join(batch))
+                file.flush()
+                batch = []
+                last = time.monotonic()
+            elif not batch:
+                last = time.monotonic()
+        if batch:
+            file.write(''.join(batch))
+
+
+async def start_local_listener():
+    """TCP server on 127.0.0.1 standing in for the remote server in tests"""
+    async def accept(reader, writer):
+        writer.close()
+
+    server = await asyncio.start_server(accept, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def probe_to_file(args):
+    clock = Clock()
+    host, port = args.host, args.port
+    server = None
+    if args.local_test:
+        server, port = await start_local_listener()
+        host = '127.0.0.1'
+        print(f"Local test: probing the listener on {host}:{port}")
+
+    queue = asyncio.Queue(maxsize=10000)
+    writer = asyncio.create_task(batch_writer(queue, args.output, args.flush_interval, args.batch, args.compress))
+    records = None
+    if args.records:
+        records = asyncio.Queue(maxsize=10000)
+        records_writer = asyncio.create_task(batch_writer(records, args.records, args.flush_interval, args.batch,
+                                                          args.compress))
+
+    async def emit(record):
+        await queue.put(format_entry(record, clock))
+        if records is not None:
+            await records.put(record_line(structured_record(record, clock)))
+        if not args.quiet:
+            rtt = 'N/A' if record['rtt_ms'] is None else f"{record['rtt_ms']:.3f} ms"
+            print(f"RTT probe {record['seq']}: {rtt} ({record['status']})")
+
+    try:
+        stats = await run_prober(host, port, clock, emit, args.rate, args.concurrency, args.timeout, args.duration)
+    finally:
+        await queue.put(None)
+        await writer
+        if records is not None:
+            await records.put(None)
+            await records_writer
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    print(f"{stats['sent']} probes sent, {stats['answered']} answered, {stats['lost']} lost, "
+          f"{stats['skipped']} skipped (all {args.concurrency} slots busy)")
+
+
+def run_nping(args):
+    """The original logger: one `sudo nping -c 1` process per probe, about 1 per second"""
+    import pexpect
+
+    # Define the command
+    command = f'sudo nping -p {args.port} --tcp {args.host} -c 1'
+
+    try:
+        while True:
+            # Run the command using pexpect
+            child = pexpect.spawn(command)
+            child.expect('[sudo]', timeout=30)  # General pattern to match the sudo prompt
+            child.sendline(PASSWORD)
+            child.expect(pexpect.EOF)
+            output = child.before.decode()
+
+            # Get the current date and time
+            current_time = datetime.datetime.now().strftime('%Y/%b/%d %H:%M:%S')
+
+            # Save the result to a text file
+            with open(args.output, 'a') as file:  # 'a' for append mode
+                file.write(f"Date and Time: {current_time}\n")
+                file.write(output)
+                file.write("\n\n")  # Add some spacing between entries
+
+            print(f"Nping result saved with timestamp: {current_time}")
+
+    except pexpect.TIMEOUT:
+        print("The command timed out. Make sure the password prompt pattern is correct.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Log the RTT between the LTE modem and the server into nping_log.txt")
+    parser.add_argument('--host', default=SERVER_IP, help=f"server to probe (default {SERVER_IP})")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help=f"TCP port to probe (default {SERVER_PORT})")
+    parser.add_argument('--rate', type=float, default=1.0, help="probes per second (default 1)")
+    parser.add_argument('--concurrency', type=int, default=4, help="probes allowed in flight at once (default 4)")
+    parser.add_argument('--timeout', type=float, default=2.0, help="seconds before a probe counts as lost (default 2)")
+    parser.add_argument('--flush-interval', type=float, default=1.0,
+                        help="seconds between two writes to the log (default 1)")
+    parser.add_argument('--batch', type=int, default=50, help="write as soon as this many results wait (default 50)")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds (default: run until Ctrl+C)")
+    parser.add_argument('--output', default=LOG_FILE, help=f"log file (default {LOG_FILE})")
+    parser.add_argument('--records', nargs='?', const=RECORDS_FILE, default=None, metavar='FILE',
+                        help=f"also write one typed JSON record per probe (default file {RECORDS_FILE})")
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="write the logs gzip or zstd compressed (nping_log.txt.gz, ...), all_data_extract.py reads them as they are")
+    parser.add_argument('--local-test', action='store_true',
+                        help="probe a TCP listener started on 127.0.0.1 instead of the server")
+    parser.add_argument('--quiet', action='store_true', help="do not print every probe")
+    parser.add_argument('--nping', action='store_true',
+                        help="use the old logger: one sudo nping process per probe")
+    args = parser.parse_args(argv)
+    if args.rate <= 0 or args.concurrency < 1 or args.timeout <= 0:
+        parser.error("--rate and --timeout must be positive and --concurrency at least 1")
+    if args.compress and args.nping:
+        parser.error("--compress works with the probes of this script, not with --nping")
+    args.output = compressed_name(args.output, args.compress)
+    if args.records:
+        args.records = compressed_name(args.records, args.compress)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # open a new file for the results so the new test won't be added to old ones
+    for output in (args.output, args.records):
+        if output:
+            with open(output, 'w') as file:
+                file.write("")
+
+    try:
+        if args.nping:
+            run_nping(args)
+        else:
+            asyncio.run(probe_to_file(args))
+    except KeyboardInterrupt:
+        print("\nScript stopped manually.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,556 @@
+import os
+import re
+import json
+import time
 import asyncio 
+import argparse
+import functools
+import contextlib
+import calendar
+import statistics
+import collections
 import telnetlib3 
 import nest_asyncio 
 import datetime 
+
+from log_writer import BufferedLog, FSYNC_POLICIES, FLUSH_BYTES, FLUSH_INTERVAL, COMPRESSIONS, compressed_name, record_line, \
+    part_name, old_parts
+from Delay_logging import Clock
   
 now = datetime.datetime.now() 
 filename = now.strftime("lte_log.txt")
 
-async def shell(reader, writer): 
-    while True: 
-        outp = await reader.read(1024) 
-        if not outp: 
-            break 
+# typed records of every polling round (--records), next to the raw capture
+RECORDS_FILE = 'lte_records.jsonl'
 
-        # display all server output 
-        print(outp, flush=True) 
+# modem address and login (change them to match the device)
+MODEM_IP = '192.168.168.2'
+MODEM_PORT = 23
+USERNAME = 'admin'
+PASSWORD = 'Abcd@12345'
 
-        # write server output to txt 
-        with open(filename, 'a') as file: 
-            file.write(outp) 
+# --device ID=HOST[:PORT][,USERNAME,PASSWORD]: one of several modems logged side by side
+Device = collections.namedtuple('Device', 'id host port username password')
+DEVICE_ID = re.compile(r'^[A-Za-z0-9-]+$')
 
-        # commands to run and get output of the radio connection from the modem 
+# AT commands sent at every UserDevice prompt
+AT_COMMANDS = [
+    'AT+MGPSNMEA',   # extract the GPS locaion and date_time information
+    'AT+MMSVRCELL',  # extract the serving cell parameters
+    'AT+MMNEBCELL',  # extract the Neighbor cells parameters
+]
 
-        if 'UserDevice login:' in outp: 
-            writer.write('admin') # user name
-            writer.write('\r\n') 
+def answer_prompt(outp, writer, username=USERNAME, password=PASSWORD):
+    """Log in at the login/password prompts and send the AT commands at every UserDevice prompt"""
+    if 'UserDevice login:' in outp:
+        writer.write(username) # user name
+        writer.write('\r\n')
 
-        elif 'Password:' in outp: 
-            writer.write('Abcd@12345') # the password
-            writer.write('\r\n') 
+    elif 'Password:' in outp:
+        writer.write(password) # the password
+        writer.write('\r\n')
 
-        elif 'UserDevice' in outp:
-            writer.write('AT+MGPSNMEA') # extract the GPS locaion and date_time information
-            writer.write('\r\n') 
-            writer.write('AT+MMSVRCELL') # extract the serving cell parameters
-            writer.write('\r\n') 
-            writer.write('AT+MMNEBCELL') # extract the Neighbor cells parameters
+    elif 'UserDevice' in outp:
+        for command in AT_COMMANDS:
+            writer.write(command)
             writer.write('\r\n')
-            
 
+def parse_device(text):
+    """A Device of --device att=192.168.168.2 or --device vz=192.168.169.2:23,admin,secret"""
+    ident, sep, rest = text.partition('=')
+    address, *login = rest.split(',')
+    host, _, port = address.partition(':')
+    if not sep or not DEVICE_ID.match(ident) or not host or len(login) not in (0, 2) or (port and not port.isdigit()):
+        raise argparse.ArgumentTypeError(f"{text!r} is not ID=HOST[:PORT][,USERNAME,PASSWORD] (ID: letters, digits, -)")
+    username, password = login or (USERNAME, PASSWORD)
+    return Device(ident, host, int(port) if port else MODEM_PORT, username, password)
+
+def device_file(filename, device_id):
+    """lte_log.txt -> lte_log_att.txt for the device att (unchanged for the single modem)"""
+    if not device_id:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{device_id}{ext}"
+
+def new_health():
+    """Health counters of one modem"""
+    return {'connects': 0, 'disconnects': 0, 'errors': 0, 'chunks': 0, 'bytes': 0, 'rounds': 0, 'last_data': None}
+
+def number(text):
+    """int or float of a modem field, the text itself when it is not a number (e.g. '-')"""
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+def rmc_fix(fields):
+    """GPS fix of a $GPRMC sentence, decoded the way all_data_extract.py does it"""
+    utc_time, lat_text, lat_dir, lon_text, lon_dir, utc_date = (fields[1], fields[3], fields[4],
+                                                                fields[5], fields[6], fields[9])
+    if not (lat_text and lon_text and utc_time and utc_date):
+        return {'status': 'empty'}
+    try:
+        lat = float(lat_text[:2]) + float(lat_text[2:]) / 60
+        if lat_dir == 'S':
+            lat *= -1
+        lon = float(lon_text[:3]) + float(lon_text[3:]) / 60
+        if lon_dir == 'W':
+            lon *= -1
+        utc = calendar.timegm(time.strptime(utc_date + utc_time.split('.')[0], '%d%m%y%H%M%S'))
+    except ValueError:
+        return {'status': 'invalid'}
+    return {'status': 'ok', 'lat': lat, 'lon': lon, 'utc': utc}
+
+class RanRecords:
+    """Turns the modem output into one typed record per polling round
+
+    A round starts at its $GPGGA sentence and is complete when the next one
+    starts, like a row of lte_data.txt, so all_data_extract.py can read the
+    records instead of the raw capture. The GPRMC fix, serving cell and
+    neighbour cell answers of the round are kept in 'answers' in the order the
+    modem gave them, repeated answers included, as the text extractor writes
+    them. Identifiers (MCC, MNC) stay text, the measurements become numbers.
+    The last round is returned by finish().
+    """
+
+    def __init__(self, clock=None, device=None):
+        self.clock = clock
+        self.device = device
+        self.partial = ''
+        self.current = None
+        self.seq = 0
+
+    def feed(self, outp):
+        """Complete records found in a chunk of modem output"""
+        lines = (self.partial + outp).split('\n')
+        self.partial = lines.pop()
+        records = []
+        for line in lines:
+            record = self.line(line.rstrip('\r'))
+            if record is not None:
+                records.append(record)
+        return records
+
+    def line(self, line):
+        fields = line.split(',')
+        if line.startswith(' $GPGGA'):
+            if len(fields) < 10:
+                return None
+            try:
+                altitude = float(fields[9]) if fields[9] else None
+            except ValueError:
+                return None
+            finished = self.current
+            self.seq += 1
+            self.current = {'type': 'ran', 'seq': self.seq}
+            if self.device:
+                self.current['device'] = self.device
+            if self.clock is not None:
+                now = self.clock.now()
+                self.current['monotonic'] = round(now, 6)
+                self.current['logged'] = self.clock.wall(now).strftime('%Y/%b/%d %H:%M:%S')
+            self.current.update({'altitude': altitude, 'answers': []})
+            return finished
+        if self.current is None:
+            # output before the first fix sentence, it belongs to no row
+            return None
+        answers = self.current['answers']
+        if line.startswith(' $GPRMC') and len(fields) >= 10:
+            answers.append(dict(kind='fix', **rmc_fix(fields)))
+        elif line.startswith(' "servingcell"') and len(fields) >= 17:
+            try:
+                cell, lac = int(fields[6], 16), int(fields[12], 16)
+            except ValueError:
+                return None
+            answers.append({
+                'kind': 'serving', 'state': fields[1].strip('"'), 'mcc': fields[4], 'mnc': fields[5], 'cell_id': cell,
+                'pci': number(fields[7]), 'earfcn': number(fields[8]), 'lac': lac,
+                'rsrp': number(fields[13]), 'rsrq': number(fields[14]), 'rssi': number(fields[15]),
+                'sinr': number(fields[16])})
+        elif line.startswith(' "neighbourcell') and len(fields) >= 8:
+            answers.append({
+                'kind': 'intra' if 'intra' in fields[0] else 'inter', 'earfcn': number(fields[2]),
+                'pci': number(fields[3]), 'rsrq': number(fields[4]), 'rsrp': number(fields[5]),
+                'rssi': number(fields[6])})
+        return None
+
+    def finish(self):
+        """The round still open at the end of the session"""
+        if self.partial:
+            self.feed('\n')
+        finished, self.current = self.current, None
+        return [finished] if finished is not None else []
+
+# --rate polling: every answer of the modem ends with one of these lines
+RESPONSE_END = ('OK', 'ERROR')
+
+# Latest latencies kept per command for the percentiles (the counters cover the whole flight)
+LATENCY_WINDOW = 4096
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+class PollScheduler:
+    """Polls the modem at a fixed rate instead of at every prompt, and times every answer
+
+    After the login a round of the AT commands is sent rate times per second on
+    a fixed monotonic schedule (rate 0: as soon as the last round is answered).
+    The three commands of a round are written at once without waiting for each
+    answer, and up to max_outstanding rounds may be unanswered before ticks are
+    skipped, so a slow modem does not build up a backlog.
+
+    The modem answers in order, so every OK/ERROR line closes the oldest command
+    waiting. The output is logged unchanged, with a 'Poll:' line holding the
+    send and receive times added after every answer (all_data_extract.py skips it).
+    """
+
+    def __init__(self, clock, rate, max_outstanding=2):
+        self.clock = clock
+        self.rate = rate
+        self.max_outstanding = max_outstanding
+        self.task = None
+        self.waiting = collections.deque()
+        self.partial = ''
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.started = None
+        self.rounds = {'sent': 0, 'answered': 0, 'skipped': 0}
+        self.lateness = collections.deque(maxlen=LATENCY_WINDOW)
+        self.answers = {command: 0 for command in AT_COMMANDS}
+        self.latency = {command: collections.deque(maxlen=LATENCY_WINDOW) for command in AT_COMMANDS}
+
+    def handle(self, outp, writer, username=USERNAME, password=PASSWORD):
+        """Log in, start polling at the first prompt after it; returns the text to log"""
+        if self.task is not None:
+            return self.feed(outp)
+        if 'UserDevice' in outp and 'login:' not in outp:
+            self.task = asyncio.ensure_future(self.run(writer))
+        else:
+            answer_prompt(outp, writer, username, password)
+        return outp
+
+    async def run(self, writer):
+        start = self.clock.now()
+        seq = 0
+        while True:
+            if self.rate:
+                tick = start + seq / self.rate
+                delay = tick - self.clock.now()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await self.idle.wait()
+                tick = self.clock.now()
+            seq += 1
+            if len({sent_seq for sent_seq, _, _ in self.waiting}) >= self.max_outstanding:
+                self.rounds['skipped'] += 1
+                continue
+            self.send(writer, seq, tick)
+
+    def send(self, writer, seq, tick):
+        sent = self.clock.now()
+        if self.started is None:
+            self.started = sent
+        self.lateness.append(sent - tick)
+        for command in AT_COMMANDS:
+            writer.write(command)
+            writer.write('\r\n')
+            self.waiting.append((seq, command, sent))
+        self.rounds['sent'] += 1
+        self.idle.clear()
+
+    def feed(self, outp):
+        """Pass complete lines on, adding the timing line after every answer"""
+        received = self.clock.now()
+        lines = (self.partial + outp).split('\n')
+        self.partial = lines.pop()
+        text = []
+        for line in lines:
+            text.append(line + '\n')
+            if self.waiting and line.strip().startswith(RESPONSE_END):
+                seq, command, sent = self.waiting.popleft()
+                latency = (received - sent) * 1000
+                self.answers[command] += 1
+                self.latency[command].append(latency)
+                if command == AT_COMMANDS[-1]:
+                    self.rounds['answered'] += 1
+                wall = self.clock.wall(sent).strftime('%Y/%b/%d %H:%M:%S.%f')[:-3]
+                text.append(f"Poll: seq={seq} command={command} sent={sent:.6f} received={received:.6f} "
+                            f"latency_ms={latency:.1f} wall={wall}\r\n")
+        if not self.waiting:
+            self.idle.set()
+        return ''.join(text)
+
+    def stop(self):
+        """Stop polling; returns the output still held back (an unfinished last line)"""
+        if self.task is not None:
+            self.task.cancel()
+        rest, self.partial = self.partial, ''
+        return rest
+
+    def summary(self):
+        elapsed = self.clock.now() - self.started if self.started is not None else 0.0
+        lateness = [late * 1000 for late in self.lateness]
+        summary = {
+            'target_hz': self.rate,
+            'elapsed_s': round(elapsed, 3),
+            'rounds': dict(self.rounds),
+            'achieved_hz': round(self.rounds['answered'] / elapsed, 3) if elapsed else 0.0,
+            # how late the rounds were sent against their schedule
+            'jitter_ms': round(statistics.pstdev(lateness), 3) if len(lateness) > 1 else 0.0,
+            'late_max_ms': round(max(lateness), 3) if lateness else 0.0,
+            'latency_ms': {},
+        }
+        for command, values in self.latency.items():
+            if values:
+                summary['latency_ms'][command] = {
+                    'answers': self.answers[command],
+                    'mean': round(statistics.fmean(values), 1),
+                    'p50': round(percentile(values, 50), 1),
+                    'p95': round(percentile(values, 95), 1),
+                    'max': round(max(values), 1),
+                }
+        return summary
+
+def format_summary(summary):
+    target = 'as fast as possible' if not summary['target_hz'] else f"target {summary['target_hz']:g} Hz"
+    rounds = summary['rounds']
+    lines = [f"Polling: {summary['achieved_hz']:.2f} Hz ({target}), {rounds['answered']}/{rounds['sent']} rounds "
+             f"answered, {rounds['skipped']} skipped, jitter {summary['jitter_ms']:.1f} ms "
+             f"(max {summary['late_max_ms']:.1f} ms late)"]
+    for command, latency in summary['latency_ms'].items():
+        lines.append(f"  {command:<13} latency mean {latency['mean']:.1f} ms, p50 {latency['p50']:.1f}, "
+                     f"p95 {latency['p95']:.1f}, max {latency['max']:.1f}")
+    return '\n'.join(lines)
+
+async def report_polling(scheduler, interval, label=''):
+    """Print the polling metrics every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        print(f"[{label}] " * bool(label) + format_summary(scheduler.summary()), flush=True)
+
+def format_health(devices, health, clock):
+    lines = []
+    for device in devices:
+        counts = health[device.id]
+        state = 'connected' if counts['connects'] > counts['disconnects'] else 'not connected'
+        age = '-' if counts['last_data'] is None else f"{clock.now() - counts['last_data']:.1f} s ago"
+        lines.append(f"  {device.id} ({device.host}:{device.port}): {state}, {counts['rounds']} rounds, "
+                     f"{counts['bytes'] / 1024:.0f} KB, last data {age}, {counts['connects']} connects, "
+                     f"{counts['errors']} errors")
+    return '\n'.join(lines)
+
+async def report_health(devices, health, clock, interval):
+    """Print the health counters of every modem every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        print("Modems:\n" + format_health(devices, health, clock), flush=True)
+
+async def shell(reader, writer, log, quiet=False, scheduler=None, status_interval=10, records=None, clock=None,
+                username=USERNAME, password=PASSWORD, device='', health=None): 
+    # the buffer goes to the file about once a second, also when the modem is silent
+    flusher = asyncio.ensure_future(log.autoflush())
+    # --records: typed records of every round go to their own buffered log
+    rounds = None
+    if records is not None:
+        rounds = RanRecords(clock, device)
+        records_flusher = asyncio.ensure_future(records.autoflush())
+    status = None
+    if scheduler is not None and status_interval > 0:
+        status = asyncio.ensure_future(report_polling(scheduler, status_interval, device))
+    health = new_health() if health is None else health
+    # end of the previous read, so a $GPGGA split between two reads is still counted once
+    tail = ''
+    try:
+        while True: 
+            try:
+                outp = await reader.read(1024) 
+            except ConnectionError:
+                # the modem went away in the middle of a write (rebooted, cable pulled)
+                health['errors'] += 1
+                break
+            if not outp: 
+                break 
+            health['chunks'] += 1
+            health['bytes'] += len(outp)
+            seen = tail + outp
+            health['rounds'] += seen.count('$GPGGA')
+            tail = seen[-len('$GPGGA') + 1:]
+            health['last_data'] = time.monotonic()
+
+            # display all server output 
+            if not quiet:
+                print(f"[{device}] " * bool(device) + outp, flush=True) 
+
+            if scheduler is None:
+                # write server output to txt (buffered, see log_writer.py)
+                log.write(outp)
+
+                # commands to run and get output of the radio connection from the modem 
+                answer_prompt(outp, writer, username, password)
+            else:
+                # --rate: the scheduler sends the commands, the output gets its timing lines
+                log.write(scheduler.handle(outp, writer, username, password))
+
+            if rounds is not None:
+                for record in rounds.feed(outp):
+                    records.write(record_line(record))
+    finally:
+        flusher.cancel()
+        if rounds is not None:
+            records_flusher.cancel()
+            for record in rounds.finish():
+                records.write(record_line(record))
+            records.flush()
+        if status is not None:
+            status.cancel()
+        if scheduler is not None:
+            log.write(scheduler.stop())
+            print(f"[{device}] " * bool(device) + format_summary(scheduler.summary()))
+        log.flush()
 
     # EOF 
     print() 
 
-async def main(): 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Log the RAN parameters reported by the pMLTE modem into lte_log.txt")
+    parser.add_argument('--modem', default=MODEM_IP, help=f"modem address (default {MODEM_IP})")
+    parser.add_argument('--port', type=int, default=MODEM_PORT, help=f"modem telnet port (default {MODEM_PORT})")
+    parser.add_argument('--output', default=filename, help=f"log file (default {filename})")
+    parser.add_argument('--startup-delay', type=float, default=300,
+                        help="seconds to wait for the modem to boot before connecting (default 300)")
+    parser.add_argument('--quiet', action='store_true', help="do not echo the modem output to the console")
+    parser.add_argument('--flush-kb', type=float, default=FLUSH_BYTES / 1024,
+                        help=f"write to the file once this many KB wait (default {FLUSH_BYTES // 1024})")
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL,
+                        help=f"or once the oldest output waited this many seconds (default {FLUSH_INTERVAL:g})")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default='rotate',
+                        help="when to force the log onto the SD card: never, at every rotation and at exit "
+                             "(default), or at every write")
+    parser.add_argument('--rotate-mb', type=float, default=None,
+                        help="start a new numbered part (lte_log.001.txt, ...) when the log reaches this size")
+    parser.add_argument('--rotate-minutes', type=float, default=None,
+                        help="start a new numbered part after this many minutes")
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="write the logs gzip or zstd compressed (lte_log.txt.gz, ...) with a flush point at every "
+                             "write, all_data_extract.py reads them as they are")
+    parser.add_argument('--records', nargs='?', const=RECORDS_FILE, default=None, metavar='FILE',
+                        help=f"also write one typed JSON record per polling round (default file {RECORDS_FILE}), "
+                             "all_data_extract.py then reads those instead of parsing the raw log")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="poll the modem this many times per second, 0 for as fast as it answers "
+                             "(default: at every prompt, as before)")
+    parser.add_argument('--max-outstanding', type=int, default=2,
+                        help="with --rate, unanswered rounds allowed before a poll is skipped (default 2)")
+    parser.add_argument('--status-interval', type=float, default=10,
+                        help="with --rate, seconds between two printouts of rate, jitter and latency, with several "
+                             "--device also of the health of every modem (default 10)")
+    parser.add_argument('--metrics', default=None,
+                        help="with --rate, write the polling metrics to this JSON file at the end "
+                             "(per modem, with its health counters, for several --device)")
+    parser.add_argument('--device', type=parse_device, action='append', metavar='ID=HOST[:PORT][,USER,PASSWORD]',
+                        help="log this modem, repeat for several (e.g. one per operator): all run on one event loop, "
+                             "each into its own lte_log_ID.txt (and lte_records_ID.jsonl); replaces --modem/--port")
+    parser.add_argument('--reconnect', type=float, default=None, metavar='SECONDS',
+                        help="connect again this many seconds after a modem was lost (default: stop logging that modem)")
+    args = parser.parse_args(argv)
+    if (args.rate is not None and args.rate < 0) or args.max_outstanding < 1:
+        parser.error("--rate cannot be negative and --max-outstanding must be at least 1")
+    if args.device and len({device.id for device in args.device}) < len(args.device):
+        parser.error("every --device needs its own ID")
+    if args.reconnect is not None and args.reconnect < 0:
+        parser.error("--reconnect cannot be negative")
+    if args.rotate_mb or args.rotate_minutes:
+        # the parts of an earlier flight would be numbered on with this one
+        for device in args.device or [Device('', args.modem, args.port, USERNAME, PASSWORD)]:
+            for path in output_files(args, device.id):
+                if path and old_parts(path):
+                    parser.error(f"{part_name(path, 1)} is left from an earlier flight, "
+                                 "move its parts to another folder before rotating a new log")
+    return args
+
+def output_files(args, device_id=''):
+    """The log and --records file of one modem: lte_log_att.txt(.gz) for the device att"""
+    output = compressed_name(device_file(args.output, device_id), args.compress)
+    records = compressed_name(device_file(args.records, device_id), args.compress) if args.records else None
+    return output, records
+
+async def log_device(device, args, clock, health):
+    """The telnet session of one modem, with its own logs, credentials and health counters
+
+    Returns the polling summary of its last session (None without --rate).
+    With --reconnect a lost or refused connection is tried again after that
+    many seconds, otherwise the modem is done when its session ends.
+    """
+    rotate_bytes = int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None
+    rotate_seconds = args.rotate_minutes * 60 if args.rotate_minutes else None
+    output, records_file = output_files(args, device.id)
+    summary = None
+    with contextlib.ExitStack() as files:
+        log = files.enter_context(BufferedLog(output, int(args.flush_kb * 1024), args.flush_interval,
+                                              args.fsync, rotate_bytes, rotate_seconds, args.compress))
+        records = None
+        if records_file:
+            records = files.enter_context(BufferedLog(records_file, int(args.flush_kb * 1024), args.flush_interval,
+                                                      args.fsync, rotate_bytes, rotate_seconds, args.compress))
+        name = f"Modem {device.id} ({device.host}:{device.port})" if device.id else f"Modem {device.host}:{device.port}"
+        while True:
+            scheduler = None if args.rate is None else PollScheduler(clock, args.rate, args.max_outstanding)
+            session = functools.partial(shell, log=log, quiet=args.quiet, scheduler=scheduler,
+                                        status_interval=args.status_interval, records=records, clock=clock,
+                                        username=device.username, password=device.password, device=device.id,
+                                        health=health)
+            try:
+                reader, writer = await telnetlib3.open_connection(device.host, device.port, shell=session)
+            except OSError as error:
+                health['errors'] += 1
+                if args.reconnect is None:
+                    print(f"{name} not reachable ({error})")
+                    return summary
+                print(f"{name} not reachable ({error}), retrying in {args.reconnect:g} s")
+                await asyncio.sleep(args.reconnect)
+                continue
+            health['connects'] += 1
+            await writer.protocol.waiter_closed 
+            health['disconnects'] += 1
+            if scheduler is not None:
+                summary = scheduler.summary()
+            if args.reconnect is None:
+                return summary
+            print(f"{name}: connection closed, reconnecting in {args.reconnect:g} s")
+            await asyncio.sleep(args.reconnect)
+
+async def main(args): 
     # Test after X seconds to be sure that the pMLTE is started and the connection is ready
-    await asyncio.sleep(300) # change the value between parentheses to change the time (in seconds) to start exectuting this script
-    reader, writer = await telnetlib3.open_connection('192.168.168.2', 23, shell=shell) # change the IP and port to match the device
-    await writer.protocol.waiter_closed 
+    await asyncio.sleep(args.startup_delay) # --startup-delay changes the time (in seconds) to start exectuting this script
+    clock = Clock()
+    # --modem/--port or MODEM_IP/MODEM_PORT match the device, --device for several modems
+    devices = args.device or [Device('', args.modem, args.port, USERNAME, PASSWORD)]
+    health = {device.id: new_health() for device in devices}
+    # every modem is a task of this one event loop, an extra modem only adds its socket and buffers
+    status = None
+    if len(devices) > 1 and args.status_interval > 0:
+        status = asyncio.ensure_future(report_health(devices, health, clock, args.status_interval))
+    try:
+        summaries = await asyncio.gather(*(log_device(device, args, clock, health[device.id]) for device in devices))
+    finally:
+        if status is not None:
+            status.cancel()
+    if len(devices) > 1:
+        print("Modems:\n" + format_health(devices, health, clock))
+    if args.metrics and len(devices) > 1:
+        metrics = {device.id: {'polling': summary, 'health': dict(health[device.id], last_data=None)}
+                   for device, summary in zip(devices, summaries)}
+        with open(args.metrics, 'w') as file:
+            json.dump(metrics, file, indent=2)
+    elif args.metrics and summaries[0] is not None:
+        with open(args.metrics, 'w') as file:
+            json.dump(summaries[0], file, indent=2)
 
 if __name__ == '__main__': 
     nest_asyncio.apply() 
-    asyncio.run(main()) 
-
- 
\ No newline at end of file
+    asyncio.run(main(parse_args()))
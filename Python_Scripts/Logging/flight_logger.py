@@ -0,0 +1,314 @@
+import sys
+import time
+import asyncio
+import argparse
+import telnetlib3
+
+import telemetry
+import RAN_logging
+import Delay_logging
+import throughput_logging
+from Delay_logging import Clock
+from log_writer import COMPRESSIONS, compressed_name, open_output, record_line
+
+# One process for the whole flight: modem polling, throughput and RTT probes run as tasks
+# of a single event loop, share one monotonic clock and hand their log entries to one writer
+
+STREAMS = ('ran', 'throughput', 'delay')
+
+# --records files of the streams
+RECORDS_FILES = {'ran': RAN_logging.RECORDS_FILE, 'throughput': throughput_logging.RECORDS_FILE,
+                 'delay': Delay_logging.RECORDS_FILE}
+
+# Items the writer may fall behind by before the loggers wait for it
+QUEUE_SIZE = 10000
+
+# Seconds between two attempts to reach the modem
+RECONNECT_DELAY = 5
+
+
+async def log_writer(queue, files, flush_interval=1.0, batch_size=200, compress=None):
+    """The only task writing to disk: appends the (stream, text) items of queue to the file of their stream
+
+    All files stay open for the whole flight. Items are collected and written
+    when batch_size of them wait or flush_interval seconds passed, as in
+    Delay_logging.batch_writer. A None item writes what is left and ends the writer.
+    """
+    handles = {stream: open_output(path, compress) for stream, path in files.items()}
+    batches = {stream: [] for stream in files}
+    waiting = 0
+    last = time.monotonic()
+
+    def write_all():
+        for stream, batch in batches.items():
+            if batch:
+                handles[stream].write(''.join(batch))
+                handles[stream].flush()
+                batch.clear()
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(flush_interval - (time.monotonic() - last), 0.01))
+            except asyncio.TimeoutError:
+                item = ()
+            if item is None:
+                break
+            if item:
+                stream, text = item
+                batches[stream].append(text)
+                waiting += 1
+            if waiting and (waiting >= batch_size or time.monotonic() - last >= flush_interval):
+                write_all()
+                waiting = 0
+                last = time.monotonic()
+            elif not waiting:
+                last = time.monotonic()
+        write_all()
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+
+def make_emit(queue, stream, counters, format_entry=None, to_records=None, write_records=True, rings=None):
+    """emit(record) for one logger: formats the record and queues it for the writer
+
+    With to_records the typed records made of it are queued for the records
+    file of the stream as well (--records, write_records) and appended to the
+    in-memory telemetry rings (--telemetry, rings).
+    """
+    async def emit(record):
+        text = record if format_entry is None else format_entry(record)
+        if not text:
+            return
+        if queue.full():
+            # the writer is behind (slow SD card), the logger waits for it instead of dropping data
+            counters[stream]['waits'] += 1
+        await queue.put((stream, text))
+        counters[stream]['entries'] += 1
+        counters[stream]['bytes'] += len(text)
+        if to_records is not None:
+            for typed in to_records(record):
+                if write_records:
+                    await queue.put((f"{stream}_records", record_line(typed)))
+                if rings is not None:
+                    rings.add(typed)
+    return emit
+
+
+async def poll_modem(host, port, username, password, emit, startup_delay=0, reconnect_delay=RECONNECT_DELAY,
+                     clock=None, rate=None, max_outstanding=2):
+    """The RAN_logging.py session: log in to the modem and send the AT commands at every prompt
+
+    Everything the modem prints is emitted as it arrives, so lte_log.txt keeps its
+    format. With a rate the commands are sent by a RAN_logging.PollScheduler on
+    the shared clock instead. A lost connection is opened again after
+    reconnect_delay seconds.
+    """
+    # give the pMLTE time to boot before the first attempt
+    await asyncio.sleep(startup_delay)
+    while True:
+        try:
+            reader, writer = await telnetlib3.open_connection(host, port, connect_maxwait=1.0)
+        except OSError as error:
+            print(f"Modem {host}:{port} not reachable ({error}), retrying in {reconnect_delay} s")
+            await asyncio.sleep(reconnect_delay)
+            continue
+        scheduler = None if rate is None else RAN_logging.PollScheduler(clock, rate, max_outstanding)
+        try:
+            while True:
+                outp = await reader.read(1024)
+                if not outp:
+                    break
+                if scheduler is None:
+                    await emit(outp)
+                    RAN_logging.answer_prompt(outp, writer, username, password)
+                else:
+                    await emit(scheduler.handle(outp, writer, username, password))
+        finally:
+            writer.close()
+            if scheduler is not None:
+                await emit(scheduler.stop())
+                print(RAN_logging.format_summary(scheduler.summary()))
+        print(f"Modem connection closed, reconnecting in {reconnect_delay} s")
+        await asyncio.sleep(reconnect_delay)
+
+
+def output_files(args):
+    """The log file of every stream and of its --records, named with the .gz/.zst of --compress"""
+    files = {stream: getattr(args, f"{stream}_output") for stream in args.streams}
+    if args.records:
+        files.update({f"{stream}_records": RECORDS_FILES[stream] for stream in args.streams})
+    return {key: compressed_name(path, args.compress) for key, path in files.items()}
+
+
+async def report_status(counters, queue, interval):
+    """Print the entries logged per stream every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        parts = [f"{stream} {counts['entries']}" for stream, counts in counters.items()]
+        print(f"Logged: {', '.join(parts)} (write queue {queue.qsize()}/{queue.maxsize})", flush=True)
+
+
+async def run(args, rings=None):
+    """Log the flight; rings is a telemetry.Telemetry to fill, made from --telemetry when not given"""
+    clock = Clock()
+    if rings is None and args.telemetry is not None:
+        rings = telemetry.Telemetry(args.telemetry_size)
+    typed = args.records or rings is not None
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    counters = {stream: {'entries': 0, 'bytes': 0, 'waits': 0} for stream in args.streams}
+    files = output_files(args)
+    writer = asyncio.create_task(log_writer(queue, files, args.flush_interval, args.batch, args.compress))
+
+    listener = None
+    server = None
+    ran_records = None
+    jobs = []
+    if 'ran' in args.streams:
+        if typed:
+            ran_records = RAN_logging.RanRecords(clock)
+        emit = make_emit(queue, 'ran', counters, to_records=ran_records.feed if ran_records is not None else None,
+                         write_records=args.records, rings=rings)
+        jobs.append(poll_modem(args.modem, args.modem_port, args.username, args.password, emit,
+                               args.startup_delay, clock=clock, rate=args.poll_rate,
+                               max_outstanding=args.max_outstanding))
+    if 'throughput' in args.streams:
+        emit = make_emit(queue, 'throughput', counters, lambda record: throughput_logging.format_entry(record, clock),
+                         (lambda record: [throughput_logging.structured_record(record, clock)]) if typed else None,
+                         args.records, rings)
+        if args.stand_in:
+            def cmd_for(fmt):
+                return [sys.executable, throughput_logging.__file__, '--emulate-iperf3', fmt,
+                        '--interval', str(args.interval)]
+        else:
+            def cmd_for(fmt):
+                return throughput_logging.iperf3_command(args.server, args.iperf_port, fmt, interval=args.interval)
+        jobs.append(throughput_logging.run_streaming(cmd_for, clock, emit, args.format))
+    if 'delay' in args.streams:
+        emit = make_emit(queue, 'delay', counters, lambda record: Delay_logging.format_entry(record, clock),
+                         (lambda record: [Delay_logging.structured_record(record, clock)]) if typed else None,
+                         args.records, rings)
+        host, port = args.server, args.rtt_port
+        if args.stand_in:
+            listener, port = await Delay_logging.start_local_listener()
+            host = '127.0.0.1'
+        jobs.append(Delay_logging.run_prober(host, port, clock, emit, args.rate, args.concurrency, args.timeout))
+
+    if args.telemetry is not None and rings is not None:
+        server = await telemetry.serve(rings, args.telemetry_host, args.telemetry)
+        print(f"Live telemetry on http://{args.telemetry_host}:{args.telemetry}/telemetry?last=60")
+
+    tasks = [asyncio.create_task(job) for job in jobs]
+    if args.status_interval > 0:
+        tasks.append(asyncio.create_task(report_status(counters, queue, args.status_interval)))
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=args.duration, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                print(f"A logger stopped with an error: {task.exception()!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if ran_records is not None:
+            for record in ran_records.finish():
+                if args.records:
+                    await queue.put(('ran_records', record_line(record)))
+                if rings is not None:
+                    rings.add(record)
+        await queue.put(None)
+        await writer
+        for closing in (listener, server):
+            if closing is not None:
+                closing.close()
+                await closing.wait_closed()
+
+    elapsed = clock.now() - clock.monotonic_start
+    print(f"Logged for {elapsed:.0f} s:")
+    for stream, counts in counters.items():
+        print(f"  {stream}: {counts['entries']} entries, {counts['bytes'] / 1024:.1f} KB to {files[stream]}"
+              f" (waited for the writer {counts['waits']} times)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Log the RAN parameters, throughput and RTT of a flight from one process")
+    parser.add_argument('--streams', nargs='+', choices=STREAMS, default=list(STREAMS),
+                        help="what to log (default all)")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds (default: run until Ctrl+C)")
+    parser.add_argument('--records', action='store_true',
+                        help="also write typed JSON records (lte_records.jsonl, iperf3_records.jsonl, nping_records.jsonl)")
+    parser.add_argument('--stand-in', action='store_true',
+                        help="fake iperf3 client and local RTT listener, to try the logger on the ground")
+
+    modem = parser.add_argument_group('RAN (modem polling)')
+    modem.add_argument('--modem', default=RAN_logging.MODEM_IP, help=f"modem address (default {RAN_logging.MODEM_IP})")
+    modem.add_argument('--modem-port', type=int, default=RAN_logging.MODEM_PORT, help="modem telnet port (default 23)")
+    modem.add_argument('--username', default=RAN_logging.USERNAME, help="modem login")
+    modem.add_argument('--password', default=RAN_logging.PASSWORD, help="modem password")
+    modem.add_argument('--startup-delay', type=float, default=300,
+                       help="seconds to wait for the modem to boot before connecting (default 300)")
+    modem.add_argument('--poll-rate', type=float, default=None,
+                       help="poll the modem this many times per second, 0 for as fast as it answers (default: at every prompt)")
+    modem.add_argument('--max-outstanding', type=int, default=2,
+                       help="with --poll-rate, unanswered rounds allowed before a poll is skipped (default 2)")
+    modem.add_argument('--ran-output', default=RAN_logging.filename, help=f"default {RAN_logging.filename}")
+
+    throughput = parser.add_argument_group('throughput (iperf3)')
+    throughput.add_argument('--server', default=throughput_logging.SERVER_IP,
+                            help=f"iperf3 and RTT server (default {throughput_logging.SERVER_IP})")
+    throughput.add_argument('--iperf-port', type=int, default=throughput_logging.SERVER_PORT,
+                            help=f"default {throughput_logging.SERVER_PORT}")
+    throughput.add_argument('--interval', type=float, default=1.0, help="seconds per throughput sample (default 1)")
+    throughput.add_argument('--format', choices=('json', 'text'), default='json',
+                            help="iperf3 output to read (default json, falls back to text on an old iperf3)")
+    throughput.add_argument('--throughput-output', default=throughput_logging.LOG_FILE,
+                            help=f"default {throughput_logging.LOG_FILE}")
+
+    delay = parser.add_argument_group('delay (RTT probes)')
+    delay.add_argument('--rtt-port', type=int, default=Delay_logging.SERVER_PORT,
+                       help=f"TCP port probed on the server (default {Delay_logging.SERVER_PORT})")
+    delay.add_argument('--rate', type=float, default=1.0, help="probes per second (default 1)")
+    delay.add_argument('--concurrency', type=int, default=4, help="probes allowed in flight at once (default 4)")
+    delay.add_argument('--timeout', type=float, default=2.0, help="seconds before a probe counts as lost (default 2)")
+    delay.add_argument('--delay-output', default=Delay_logging.LOG_FILE, help=f"default {Delay_logging.LOG_FILE}")
+
+    live = parser.add_argument_group('live telemetry')
+    live.add_argument('--telemetry', nargs='?', type=int, const=telemetry.PORT, default=None, metavar='PORT',
+                      help=f"keep the latest samples of every stream in memory and serve them as JSON on this port "
+                           f"(default {telemetry.PORT}), e.g. /telemetry?last=60&streams=ran,delay")
+    live.add_argument('--telemetry-host', default=telemetry.HOST, help=f"address to serve on (default {telemetry.HOST})")
+    live.add_argument('--telemetry-size', type=int, default=telemetry.CAPACITY,
+                      help=f"samples kept per stream (default {telemetry.CAPACITY}), memory stays the same for any flight length")
+
+    writer = parser.add_argument_group('writing')
+    writer.add_argument('--flush-interval', type=float, default=1.0, help="seconds between two writes (default 1)")
+    writer.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="write the logs gzip or zstd compressed (lte_log.txt.gz, ...), every write ends at a flush point")
+    writer.add_argument('--batch', type=int, default=200, help="write as soon as this many entries wait (default 200)")
+    writer.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help=f"entries the writer may fall behind by (default {QUEUE_SIZE})")
+    writer.add_argument('--status-interval', type=float, default=10,
+                        help="seconds between two status lines, 0 for none (default 10)")
+    args = parser.parse_args(argv)
+    if args.rate <= 0 or args.concurrency < 1 or args.timeout <= 0 or args.queue_size < 1 or args.telemetry_size < 1:
+        parser.error("--rate and --timeout must be positive, --concurrency, --queue-size and --telemetry-size at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # open new files for the results so the new flight won't be added to old ones
+    for output in output_files(args).values():
+        with open(output, 'w') as file:
+            file.write("")
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\nScript stopped manually.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import asyncio
+
+try:
+    import zstandard
+except ImportError:  # only needed for --compress zstd
+    zstandard = None
+
+# Buffered append-only log file for the loggers: text is collected in memory and written
+# in large pieces, the file is synced to the SD card as the fsync policy says and
+# rotated into numbered parts by size or age, optionally gzip or zstd compressed
+
+FSYNC_POLICIES = ('never', 'rotate', 'flush')
+
+# Flush once this many characters wait, or when the oldest has waited flush_interval seconds
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
+# --compress of the loggers: suffix added to the file name and compression level
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+COMPRESS_LEVELS = {'gzip': 6, 'zstd': 3}
+
+
+def record_line(record):
+    """One line of a JSONL records file (--records of the loggers)"""
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def compressed_name(filename, compress=None):
+    """lte_log.txt -> lte_log.txt.gz with compress 'gzip' (unchanged without compression)"""
+    if compress is None or filename.endswith(COMPRESSIONS[compress]):
+        return filename
+    return filename + COMPRESSIONS[compress]
+
+
+def part_name(filename, number):
+    """lte_log.txt -> lte_log.001.txt, lte_log.txt.gz -> lte_log.001.txt.gz"""
+    suffix = next((s for s in COMPRESSIONS.values() if filename.endswith(s)), '')
+    stem, ext = os.path.splitext(filename[:len(filename) - len(suffix)])
+    return f"{stem}.{number:03d}{ext}{suffix}"
+
+
+def old_parts(filename):
+    """True if rotated parts of filename (of an earlier flight) are already on disk"""
+    return os.path.exists(part_name(filename, 1))
+
+
+class CompressedLog:
+    """Append-only gzip or zstd log taking text like a file opened with 'a'
+
+    Every flush() ends a compressed block at a byte boundary (a flush point),
+    so all text written before it can be decompressed straight from the file
+    even if the logger is killed before close() writes the end of the stream.
+    A file appended to again gets a new gzip member / zstd frame, which the
+    readers of all_data_extract.py read as one stream.
+    """
+
+    def __init__(self, filename, compress, level=None):
+        if compress not in COMPRESSIONS:
+            raise ValueError(f"compress must be one of {', '.join(COMPRESSIONS)}")
+        level = level or COMPRESS_LEVELS[compress]
+        self.raw = open(filename, 'ab')
+        if compress == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='ab', compresslevel=level)
+            self.flush_mode = zlib.Z_SYNC_FLUSH
+        else:
+            if zstandard is None:
+                raise RuntimeError("--compress zstd needs the zstandard package (pip install zstandard)")
+            self.stream = zstandard.ZstdCompressor(level=level).stream_writer(self.raw, closefd=False)
+            self.flush_mode = zstandard.FLUSH_BLOCK
+
+    def write(self, text):
+        self.stream.write(text.encode())
+
+    def flush(self):
+        self.stream.flush(self.flush_mode)
+        self.raw.flush()
+
+    def tell(self):
+        """Compressed bytes on disk so far"""
+        return self.raw.tell()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def close(self):
+        self.stream.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(filename, compress=None, level=None):
+    """Open a log for appending, as plain text or as a CompressedLog (filename should have its .gz/.zst already)"""
+    if compress is None:
+        return open(filename, 'a')
+    return CompressedLog(filename, compress, level)
+
+
+class BufferedLog:
+    """Append text to a log file in buffered batches
+
+    write() only appends to a list. The buffer goes to the file when it holds
+    flush_bytes characters or flush_interval seconds after the first unwritten
+    chunk, so the file is opened once and written about once a second instead
+    of once per chunk. With fsync:
+      - 'never'  leaves syncing to the OS
+      - 'rotate' syncs every finished part and the file at close
+      - 'flush'  syncs at every flush (at most flush_interval of data at risk on power loss)
+    When rotate_bytes or rotate_seconds is reached the file is renamed to the
+    next numbered part (lte_log.001.txt, lte_log.002.txt, ...) and a new one is
+    started, all_data_extract.py reads the parts in order and then the file.
+    Rotation refuses to start next to parts left by an earlier flight, whose
+    numbering would mix with the new one.
+    With compress ('gzip' or 'zstd') the file is a CompressedLog with a flush
+    point at every flush, and rotate_bytes counts compressed bytes.
+    """
+
+    def __init__(self, filename, flush_bytes=FLUSH_BYTES, flush_interval=FLUSH_INTERVAL, fsync='rotate',
+                 rotate_bytes=None, rotate_seconds=None, compress=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.filename = filename
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        if (rotate_bytes or rotate_seconds) and old_parts(filename):
+            raise FileExistsError(f"{part_name(filename, 1)} is left from an earlier flight, move its parts away first")
+        self.parts = 0
+        self.file = open_output(filename, compress)
+        self.file_bytes = self.file.tell()
+        self.opened = time.monotonic()
+        self.buffer = []
+        self.buffered = 0
+        self.oldest = None
+        self.stats = {'chunks': 0, 'chars': 0, 'flushes': 0, 'fsyncs': 0, 'rotations': 0}
+
+    def write(self, text):
+        if not text:
+            return
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        self.buffer.append(text)
+        self.buffered += len(text)
+        self.stats['chunks'] += 1
+        self.stats['chars'] += len(text)
+        if self.buffered >= self.flush_bytes or time.monotonic() - self.oldest >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffer to the file, then sync and rotate as configured"""
+        if self.buffer:
+            data = ''.join(self.buffer)
+            self.file.write(data)
+            self.file.flush()
+            self.file_bytes = self.file.tell()
+            self.buffer = []
+            self.buffered = 0
+            self.oldest = None
+            self.stats['flushes'] += 1
+            if self.fsync == 'flush':
+                self._sync()
+        if self._rotation_due():
+            self.rotate()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.stats['fsyncs'] += 1
+
+    def _rotation_due(self):
+        if not self.file_bytes:
+            return False
+        if self.rotate_bytes and self.file_bytes >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self.opened >= self.rotate_seconds
+
+    def rotate(self):
+        """Close the current file as the next numbered part and start a new one"""
+        if self.fsync != 'never':
+            self._sync()
+        self.file.close()
+        self.parts += 1
+        os.replace(self.filename, part_name(self.filename, self.parts))
+        self.file = open_output(self.filename, self.compress)
+        self.file_bytes = 0
+        self.opened = time.monotonic()
+        self.stats['rotations'] += 1
+
+    async def autoflush(self):
+        """Task flushing the buffer on time even when no new text arrives"""
+        while True:
+            overdue = self.oldest is not None and time.monotonic() - self.oldest >= self.flush_interval
+            if overdue or self._rotation_due():
+                self.flush()
+            if self.oldest is None:
+                wait = self.flush_interval
+            else:
+                wait = self.oldest + self.flush_interval - time.monotonic()
+            await asyncio.sleep(max(wait, 0.01))
+
+    def close(self):
+        self.flush()
+        if self.fsync != 'never':
+            self._sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
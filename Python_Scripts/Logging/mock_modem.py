@@ -0,0 +1,269 @@
+import re
+import sys
+import time
+import shlex
+import bisect
+import asyncio
+import argparse
+import calendar
+import statistics
+import telnetlib3
+
+try:
+    import resource
+except ImportError:  # Windows, the CPU use of --run is not reported there
+    resource = None
+
+import RAN_logging
+
+# Stand-in for the pMLTE modem: a telnet server with the UserDevice login that answers
+# the AT commands of RAN_logging.py from a recorded lte_log.txt, at the recorded pace,
+# N times faster or as fast as possible
+
+HOST = '127.0.0.1'
+PORT = 2323
+
+PROMPT = 'UserDevice> '
+BANNER = '\r\nCommand Line Interface\r\n'
+
+# Seconds between two recorded rounds when the recording has no GPS time to tell
+DEFAULT_ROUND = 1.0
+# Longer pauses of the recording (logger restarted, no fix for minutes) are shortened to this
+MAX_GAP = 10.0
+
+RMC_TIME = re.compile(r'\$GPRMC,(\d{6})(\.\d+)?,[AV],[^,]*,[NS]?,[^,]*,[EW]?,[^,]*,[^,]*,(\d{6}),')
+
+
+def rmc_time(answer):
+    """UTC epoch seconds of the GPRMC sentence in an AT+MGPSNMEA answer, None without a fix"""
+    match = RMC_TIME.search(answer)
+    if not match:
+        return None
+    clock, fraction, date = match.groups()
+    try:
+        moment = time.strptime(date + clock, '%d%m%y%H%M%S')
+    except ValueError:
+        return None
+    return calendar.timegm(moment) + float(fraction or 0)
+
+
+def load_rounds(log_file):
+    """Split a recorded lte_log.txt into polling rounds
+
+    Returns a list of {'answers': {command: text}, 'offset': seconds since the
+    first round}. The text of an answer starts with the echoed command, exactly
+    as the modem printed it; the "Poll:" lines of RAN_logging.py --rate are left out.
+    """
+    with open(log_file, newline='', errors='replace') as f:
+        text = f.read()
+    rounds = []
+    for segment in text.split(PROMPT)[1:]:
+        command = segment.split('\n', 1)[0].strip()
+        lines = segment.splitlines(keepends=True)
+        # a command the recording stopped in the middle of has no answer to replay
+        if not command.startswith('AT') or not any(line.strip().startswith(RAN_logging.RESPONSE_END) for line in lines):
+            continue
+        if command == RAN_logging.AT_COMMANDS[0] or not rounds:
+            rounds.append({'answers': {}, 'time': None})
+        segment = ''.join(line for line in lines if not line.startswith('Poll:'))
+        rounds[-1]['answers'][command] = segment
+        if command == 'AT+MGPSNMEA':
+            rounds[-1]['time'] = rmc_time(segment)
+    assign_offsets(rounds)
+    return rounds
+
+
+def assign_offsets(rounds):
+    """Replay time of every round from its GPS time, rounds without a fix are spaced by the usual gap"""
+    known = [(index, r['time']) for index, r in enumerate(rounds) if r['time'] is not None]
+    gaps = [(t2 - t1) / (i2 - i1) for (i1, t1), (i2, t2) in zip(known, known[1:]) if t2 > t1]
+    step = min(statistics.median(gaps), MAX_GAP) if gaps else DEFAULT_ROUND
+    offset = 0.0
+    previous = None  # GPS time of the round before, estimated when it had no fix
+    for index, r in enumerate(rounds):
+        current = r.pop('time')
+        if index:
+            gap = current - previous if current is not None and previous is not None else step
+            offset += min(max(gap, 0.0), MAX_GAP)
+        r['offset'] = offset
+        if current is None and previous is not None:
+            current = previous + step
+        previous = current
+
+
+class Replay:
+    """Which recorded round a session answers with, and what the logger got of the recording
+
+    speed 0 hands out the next round at every AT+MGPSNMEA (as fast as the
+    logger polls). Otherwise the round due at the replay time is used, like a
+    modem answering with its current state, and the rounds a slow logger never
+    asked for are counted as missed.
+    """
+
+    def __init__(self, rounds, speed, loop=False):
+        self.rounds = rounds
+        self.offsets = [r['offset'] for r in rounds]
+        self.speed = speed
+        self.loop = loop
+        self.start = time.monotonic()
+        self.index = -1
+        self.passes = 0
+        self.stats = {'commands': 0, 'rounds_served': 0, 'rounds_missed': 0, 'chars_sent': 0}
+
+    def next_round(self):
+        """Advance to the round of a new poll; False once the recording is over"""
+        if self.speed:
+            position = (time.monotonic() - self.start) * self.speed
+            index = bisect.bisect_right(self.offsets, position) - 1
+            ended = position > self.offsets[-1] + DEFAULT_ROUND
+            # polled again before the next recorded round is due: same answers, as from a real modem
+            index = max(index, self.index, 0)
+        else:
+            index = self.index + 1
+            ended = index >= len(self.rounds)
+        if ended or index >= len(self.rounds):
+            self.stats['rounds_missed'] += len(self.rounds) - 1 - self.index
+            if not self.loop:
+                return False
+            self.passes += 1
+            self.start = time.monotonic()
+            self.index, index = -1, 0
+        if index != self.index:
+            self.stats['rounds_missed'] += index - self.index - 1
+            self.stats['rounds_served'] += 1
+        self.index = index
+        return True
+
+    def answer(self, command):
+        self.stats['commands'] += 1
+        if self.index < 0 or command == RAN_logging.AT_COMMANDS[0]:
+            if not self.next_round():
+                return None
+        text = self.rounds[self.index]['answers'].get(command, f"{command}\r\nERROR\r\n")
+        self.stats['chars_sent'] += len(text)
+        return text
+
+
+async def modem_session(reader, writer, rounds, args, sessions):
+    """One telnet client: the login, then an answer from the recording for every command line"""
+    replay = Replay(rounds, args.speed, args.loop)
+
+    async def readline():
+        try:
+            return await reader.readline()
+        except ConnectionError:  # the logger was killed
+            return ''
+
+    while True:
+        writer.write('\r\r\nUserDevice login: ')
+        username = await readline()
+        if not username:
+            writer.close()
+            return
+        writer.write(username.strip() + '\r\nPassword: ')
+        password = await readline()
+        writer.write('\r\n')
+        if username.strip() == args.username and password.strip() == args.password:
+            break
+        writer.write('Login incorrect\r\n')
+    writer.write(BANNER + PROMPT)
+
+    replay.start = time.monotonic()
+    while True:
+        line = await readline()
+        if not line:
+            break
+        command = line.strip()
+        if not command:
+            writer.write(PROMPT)
+            continue
+        if args.latency:
+            await asyncio.sleep(args.latency / 1000)
+        text = replay.answer(command)
+        if text is None:
+            # end of the recording, the modem goes away like at landing
+            break
+        writer.write(text + PROMPT)
+    writer.close()
+
+    elapsed = time.monotonic() - replay.start
+    stats = dict(replay.stats, elapsed_s=elapsed, passes=replay.passes)
+    sessions.append(stats)
+    print(f"Session ended after {elapsed:.1f} s: {stats['commands']} commands, {stats['rounds_served']} rounds served "
+          f"({stats['rounds_served'] / elapsed if elapsed else 0:.1f}/s), {stats['rounds_missed']} recorded rounds missed, "
+          f"{stats['chars_sent'] / 1024:.0f} KB sent", flush=True)
+
+
+async def run_logger(command):
+    """Run the logger under test and measure its wall and CPU time"""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN) if resource is not None else None
+    start = time.monotonic()
+    process = await asyncio.create_subprocess_exec(*shlex.split(command), stdout=asyncio.subprocess.DEVNULL)
+    code = await process.wait()
+    wall = time.monotonic() - start
+    print(f"Logger exited with code {code} after {wall:.1f} s")
+    if before is not None:
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+        peak = after.ru_maxrss if sys.platform == 'darwin' else after.ru_maxrss * 1024
+        print(f"Logger CPU: {cpu:.2f} s ({cpu / wall * 100 if wall else 0:.1f}% of one core), "
+              f"peak RSS {peak / (1 << 20):.1f} MB")
+
+
+async def serve(args):
+    rounds = load_rounds(args.log)
+    if not rounds:
+        raise SystemExit(f"No AT command answers found in {args.log}")
+    pace = 'as fast as possible' if not args.speed else f"{args.speed:g}x real time"
+    print(f"Replaying {len(rounds)} rounds ({rounds[-1]['offset']:.0f} s recorded) of {args.log} "
+          f"on {args.host}:{args.port}, {pace}", flush=True)
+
+    sessions = []
+    server = await telnetlib3.create_server(
+        args.host, args.port, connect_maxwait=0.5, timeout=0,
+        shell=lambda reader, writer: modem_session(reader, writer, rounds, args, sessions))
+    try:
+        if args.run:
+            await run_logger(args.run)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        server.close()
+
+
+def parse_speed(text):
+    if text in ('max', '0'):
+        return 0.0
+    speed = float(text)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive, or max")
+    return speed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Telnet stand-in for the pMLTE modem, replaying a recorded lte_log.txt")
+    parser.add_argument('log', help="recorded lte_log.txt, e.g. one under \"Data Set\"")
+    parser.add_argument('--host', default=HOST, help=f"address to listen on (default {HOST})")
+    parser.add_argument('--port', type=int, default=PORT, help=f"telnet port (default {PORT})")
+    parser.add_argument('--speed', type=parse_speed, default=1.0,
+                        help="replay pace: 1 real time (default), 10 ten times faster, max as fast as the logger polls")
+    parser.add_argument('--latency', type=float, default=0.0, help="milliseconds before every answer (default 0)")
+    parser.add_argument('--loop', action='store_true', help="start the recording again at its end instead of hanging up")
+    parser.add_argument('--username', default=RAN_logging.USERNAME, help="login accepted (default the one of RAN_logging.py)")
+    parser.add_argument('--password', default=RAN_logging.PASSWORD, help="password accepted")
+    parser.add_argument('--run', metavar='COMMAND',
+                        help="start this logger command, report its CPU use and stop when it exits, e.g. "
+                             "--run \"python RAN_logging.py --modem 127.0.0.1 --port 2323 --startup-delay 0 --quiet\"")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nScript stopped manually.")
+
+
+if __name__ == '__main__':
+    main()
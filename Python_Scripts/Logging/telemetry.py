@@ -0,0 +1,185 @@
+import json
+import math
+import asyncio
+import threading
+import urllib.parse
+import numpy as np
+
+# Latest samples of the flight kept in memory: one fixed-size ring of typed rows per stream,
+# filled from the typed records of the loggers (see --records), so a live view can read
+# them without tailing and parsing the log files. Memory does not grow with the flight.
+
+# Samples kept per stream (one hour at one sample a second)
+CAPACITY = 3600
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+NAN = float('nan')
+
+RAN_DTYPE = np.dtype([
+    ('seq', 'i8'), ('monotonic', 'f8'), ('utc', 'f8'), ('lat', 'f8'), ('lon', 'f8'), ('altitude', 'f8'),
+    ('pci', 'i4'), ('earfcn', 'i4'), ('cell_id', 'i8'),
+    ('rsrp', 'f8'), ('rsrq', 'f8'), ('rssi', 'f8'), ('sinr', 'f8'), ('neighbours', 'i2'),
+])
+THROUGHPUT_DTYPE = np.dtype([
+    ('monotonic', 'f8'), ('upload_mbps', 'f8'), ('download_mbps', 'f8'), ('retransmits', 'i4'),
+])
+DELAY_DTYPE = np.dtype([
+    ('seq', 'i8'), ('monotonic', 'f8'), ('rtt_ms', 'f8'), ('rcvd', 'i1'),
+])
+
+
+def value(number, missing=NAN):
+    """A measurement of a typed record, missing when the modem left it empty"""
+    return missing if number is None or isinstance(number, str) else number
+
+
+def ran_row(record):
+    # the first fix and serving cell of the round, like the row of lte_data.txt
+    answers = record['answers']
+    fix = next((a for a in answers if a['kind'] == 'fix'), {})
+    fix = fix if fix.get('status') == 'ok' else {}
+    serving = next((a for a in answers if a['kind'] == 'serving'), {})
+    return (record['seq'], record.get('monotonic', NAN), value(fix.get('utc')), value(fix.get('lat')),
+            value(fix.get('lon')), value(record['altitude']),
+            value(serving.get('pci'), -1), value(serving.get('earfcn'), -1), value(serving.get('cell_id'), -1),
+            value(serving.get('rsrp')), value(serving.get('rsrq')), value(serving.get('rssi')), value(serving.get('sinr')),
+            sum(a['kind'] in ('intra', 'inter') for a in answers))
+
+
+def throughput_row(record):
+    return (record['monotonic'], record['upload_mbps'], record['download_mbps'], value(record['retransmits'], -1))
+
+
+def delay_row(record):
+    return (record['seq'], record['monotonic'], value(record['rtt_ms']), record['rcvd'])
+
+
+# record type: (stream, dtype, typed record -> row)
+STREAMS = {
+    'ran': ('ran', RAN_DTYPE, ran_row),
+    'throughput': ('throughput', THROUGHPUT_DTYPE, throughput_row),
+    'delay': ('delay', DELAY_DTYPE, delay_row),
+}
+
+
+class RingBuffer:
+    """The latest capacity rows of one stream in a preallocated structured array
+
+    append() overwrites the oldest row once the ring is full. total counts
+    every row ever appended, so a reader can ask for what is new since its
+    last look with since(). Reads return copies in time order and hold the
+    lock only for the copy, so a reader in another thread never sees half a row.
+    """
+
+    def __init__(self, dtype, capacity=CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rows = np.zeros(capacity, dtype)
+        self.capacity = capacity
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, row):
+        with self.lock:
+            self.rows[self.total % self.capacity] = row
+            self.total += 1
+
+    def _copy(self, last):
+        """Copy of the last rows, oldest first (the caller holds the lock)"""
+        count = len(self) if last is None else max(min(last, len(self)), 0)
+        end = self.total % self.capacity
+        start = end - count
+        if start >= 0:
+            return self.rows[start:end].copy()
+        return np.concatenate((self.rows[start:], self.rows[:end]))
+
+    def snapshot(self, last=None):
+        """Copy of the latest rows (all of them, or the last ones), oldest first"""
+        with self.lock:
+            return self._copy(last)
+
+    def since(self, seen):
+        """Rows appended after the reader had seen seen of them, and the new total to pass next time
+
+        Rows that were overwritten before the reader came back are lost to it.
+        """
+        with self.lock:
+            total = self.total
+            return self._copy(total - seen), total
+
+    def latest(self):
+        """The newest row, None while the ring is empty"""
+        rows = self.snapshot(1)
+        return rows[0] if len(rows) else None
+
+
+class Telemetry:
+    """The ring buffers of the RAN, throughput and RTT streams of one logging process"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.buffers = {stream: RingBuffer(dtype, capacity) for stream, dtype, _ in STREAMS.values()}
+
+    def add(self, record):
+        """Append a typed record (RAN_logging.RanRecords, *.structured_record) to the ring of its stream"""
+        stream, _, to_row = STREAMS[record['type']]
+        self.buffers[stream].append(to_row(record))
+
+    def snapshot(self, last=None, streams=None):
+        return {stream: self.buffers[stream].snapshot(last) for stream in streams or self.buffers}
+
+    def status(self):
+        return {stream: {'kept': len(buffer), 'total': buffer.total, 'capacity': buffer.capacity}
+                for stream, buffer in self.buffers.items()}
+
+
+def to_columns(rows):
+    """A snapshot as {field: [values]} for JSON, NaN (missing) as null"""
+    columns = {}
+    for name in rows.dtype.names:
+        column = rows[name].tolist()
+        if rows.dtype[name].kind == 'f':
+            column = [None if math.isnan(v) else v for v in column]
+        columns[name] = column
+    return columns
+
+
+async def serve(rings, host=HOST, port=PORT):
+    """Minimal HTTP endpoint for a live view: GET /telemetry?last=N&streams=ran,delay returns JSON columns
+
+    GET /status returns the rows kept and appended per stream. Nothing is read
+    from disk, every request is answered from a snapshot of the rings.
+    """
+    async def answer(reader, writer):
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass  # headers
+            url = urllib.parse.urlsplit(request[1] if len(request) > 1 else '/')
+            query = urllib.parse.parse_qs(url.query)
+            if url.path == '/status':
+                status, body = '200 OK', rings.status()
+            elif url.path in ('/', '/telemetry'):
+                try:
+                    last = int(query['last'][0]) if 'last' in query else None
+                    streams = query['streams'][0].split(',') if 'streams' in query else None
+                    rows = rings.snapshot(last, streams)
+                    status, body = '200 OK', {stream: to_columns(r) for stream, r in rows.items()}
+                except (ValueError, KeyError) as e:
+                    status, body = '400 Bad Request', {'error': f"bad query: {e}"}
+            else:
+                status, body = '404 Not Found', {'error': f"{url.path} not found"}
+            data = json.dumps(body, separators=(',', ':')).encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                         f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(answer, host, port)
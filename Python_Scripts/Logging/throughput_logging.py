@@ -1,14 +1,241 @@
-import subprocess
+import os
+import re
+import sys
+import json
 import time
+import random
+import asyncio
+import argparse
+import subprocess
 from datetime import datetime
 
-# open a new file for the results so the new test won't be added to old ones
-with open("iperf3_log.txt", "w") as outfile:
-    outfile.write("")
+from Delay_logging import Clock
+
+from log_writer import COMPRESSIONS, compressed_name, open_output, record_line
+
+# iperf3 server (a PC in Nichols Hall) and its port
+SERVER_IP = "129.237.161.212"
+SERVER_PORT = 5201
+
+LOG_FILE = "iperf3_log.txt"
+
+# typed record of every interval (--records), next to the text log
+RECORDS_FILE = "iperf3_records.jsonl"
+
+# Seconds to wait before restarting a session that ended (link lost, server busy, ...)
+RESTART_DELAY = 1
+
+# Interval lines of `iperf3 -i 1 --bidir -f m` text output (the summary lines end with sender/receiver)
+TEXT_INTERVAL = re.compile(r'^\[\s*(\d+|SUM)\]\[(TX|RX)-C\]\s+([\d.]+)-([\d.]+)\s+sec\s+([\d.]+)\s+(\w?Bytes)\s+([\d.]+)\s+Mbits/sec(.*)$')
+BYTE_UNITS = {'Bytes': 1, 'KBytes': 1024, 'MBytes': 1024 ** 2, 'GBytes': 1024 ** 3}
+
+
+def iperf3_command(server_ip, port, fmt, session_time=0, interval=1.0):
+    """One long iperf3 --bidir session reporting every interval seconds (-t 0 runs until stopped)"""
+    cmd = ["iperf3", "-c", server_ip, "-p", str(port), "-f", "m", "--bidir",
+           "-t", str(session_time), "-i", str(interval), "--forceflush"]
+    if fmt == 'json':
+        cmd.append("--json-stream")
+    return cmd
+
+
+def json_interval(line):
+    """(start, end, upload sum, download sum) of one --json-stream interval event, None for other events"""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if event.get('event') == 'error':
+        raise RuntimeError(event.get('data'))
+    if event.get('event') != 'interval':
+        return None
+    data = event['data']
+    upload, download = data.get('sum'), data.get('sum_bidir_reverse')
+    if upload is None or download is None or upload.get('omitted'):
+        return None
+    return upload['start'], upload['end'], upload, download
+
+
+class TextIntervals:
+    """Pairs the TX-C and RX-C lines of `iperf3 -i` text output into intervals
+
+    With several parallel streams only the [SUM] lines are used.
+    """
+
+    def __init__(self):
+        self.use_sum = False
+        self.pending = {}
+
+    def feed(self, line):
+        match = TEXT_INTERVAL.match(line.strip())
+        if not match or match.group(8).rstrip().endswith(('sender', 'receiver')):
+            return None
+        stream, direction, start, end, amount, unit, mbps, rest = match.groups()
+        if stream == 'SUM':
+            self.use_sum = True
+        elif self.use_sum:
+            return None
+        retransmits = rest.split()[0] if direction == 'TX' and rest.split() else '0'
+        total = {'start': float(start), 'end': float(end), 'bytes': float(amount) * BYTE_UNITS.get(unit, 1),
+                 'bits_per_second': float(mbps) * 1e6, 'retransmits': int(retransmits) if retransmits.isdigit() else 0}
+        key = (start, end)
+        self.pending.setdefault(key, {})[direction] = total
+        if len(self.pending[key]) < 2:
+            return None
+        pair = self.pending.pop(key)
+        return pair['TX']['start'], pair['TX']['end'], pair['TX'], pair['RX']
+
+
+def make_record(session_start, start, end, upload, download):
+    """Timestamped throughput record of one interval, timed on the shared monotonic clock"""
+    return {
+        'monotonic': session_start + end,
+        'interval': (start, end),
+        'upload_mbps': upload['bits_per_second'] / 1e6,
+        'download_mbps': download['bits_per_second'] / 1e6,
+        'upload_bytes': upload['bytes'],
+        'download_bytes': download['bytes'],
+        'retransmits': upload.get('retransmits', 0),
+    }
+
+
+def format_entry(record, clock):
+    """An interval in the layout of iperf3_log.txt, so all_data_extract.py reads it like a short test"""
+    stamp = clock.wall(record['monotonic']).strftime("%Y/%b/%d %H:%M:%S")
+    start, end = record['interval']
+    return (f"{stamp}\n"
+            f"[  5][TX-C] {start:7.2f}-{end:<7.2f} sec  {record['upload_bytes'] / 1024 ** 2:.2f} MBytes  "
+            f"{record['upload_mbps']:.2f} Mbits/sec  {record['retransmits']}  sender (interval)\n"
+            f"[  7][RX-C] {start:7.2f}-{end:<7.2f} sec  {record['download_bytes'] / 1024 ** 2:.2f} MBytes  "
+            f"{record['download_mbps']:.2f} Mbits/sec     sender (interval)\n\n")
+
+
+def structured_record(record, clock):
+    """The typed --records form of an interval, read by all_data_extract.py instead of the text"""
+    date, time_of_day = clock.wall(record['monotonic']).strftime("%Y/%b/%d %H:%M:%S").split()
+    return {'type': 'throughput', 'date': date, 'time': time_of_day, 'monotonic': round(record['monotonic'], 6),
+            'interval': list(record['interval']), 'upload_mbps': record['upload_mbps'],
+            'download_mbps': record['download_mbps'], 'upload_bytes': record['upload_bytes'],
+            'download_bytes': record['download_bytes'], 'retransmits': record['retransmits']}
+
 
-def run_iperf3(server_ip, port):
+async def stream_session(cmd, fmt, clock, emit):
+    """Run one iperf3 session and emit a record for every interval as its line arrives
+
+    Returns (return code, stderr text) once the session ends.
+    """
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE)
+    session_start = clock.now()
+    text = TextIntervals()
+    try:
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            line = line.decode(errors='replace')
+            try:
+                interval = json_interval(line) if fmt == 'json' else text.feed(line)
+            except RuntimeError as error:
+                print("Error:", error)
+                continue
+            if interval is not None:
+                await emit(make_record(session_start, *interval))
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        stderr = (await process.stderr.read()).decode(errors='replace')
+        await process.wait()
+    return process.returncode, stderr
+
+
+async def run_streaming(cmd_for, clock, emit, fmt='json', duration=None):
+    """Keep one iperf3 session running, restarting it when it ends, for duration seconds (None: forever)
+
+    An iperf3 older than 3.17 does not know --json-stream; the first session
+    then fails and the text interval output is used from then on.
+    """
+    start = clock.now()
+
+    async def sessions():
+        nonlocal fmt
+        while True:
+            code, stderr = await stream_session(cmd_for(fmt), fmt, clock, emit)
+            if fmt == 'json' and 'json-stream' in stderr:
+                print("This iperf3 has no --json-stream, reading its text interval output instead")
+                fmt = 'text'
+                continue
+            if stderr:
+                print("Error:", stderr.strip())
+            print(f"iperf3 session ended (code {code}), restarting it...")
+            await asyncio.sleep(RESTART_DELAY)
+
+    try:
+        await asyncio.wait_for(sessions(), duration)
+    except asyncio.TimeoutError:
+        pass
+    return clock.now() - start
+
+
+async def stream_to_file(args):
+    clock = Clock()
+    if args.stand_in:
+        # this script playing the iperf3 client, to try the logger without a server
+        def cmd_for(fmt):
+            return [sys.executable, __file__, '--emulate-iperf3', fmt, '--interval', str(args.interval)]
+    else:
+        def cmd_for(fmt):
+            return iperf3_command(args.server, args.port, fmt, interval=args.interval)
+
+    count = 0
+    # with --compress every interval ends at a flush point of the gzip/zstd stream
+    records_file, records_compress = (args.records, args.compress) if args.records else (os.devnull, None)
+    with open_output(args.output, args.compress) as outfile, open_output(records_file, records_compress) as records:
+        async def emit(record):
+            nonlocal count
+            count += 1
+            outfile.write(format_entry(record, clock))
+            outfile.flush()
+            if args.records:
+                records.write(record_line(structured_record(record, clock)))
+                records.flush()
+            if not args.quiet:
+                print(f"UL {record['upload_mbps']:.2f} Mbps, DL {record['download_mbps']:.2f} Mbps "
+                      f"(interval {record['interval'][0]:g}-{record['interval'][1]:g} s)")
+
+        await run_streaming(cmd_for, clock, emit, args.format, args.duration)
+    print(f"{count} throughput intervals logged")
+
+
+def emulate_iperf3(fmt, interval):
+    """Print what `iperf3 --bidir -i interval` prints, with made-up rates, until killed"""
+    rng = random.Random()
+    if fmt == 'json':
+        print(json.dumps({'event': 'start', 'data': {'test_start': {'protocol': 'TCP', 'num_streams': 1, 'bidir': 1}}}), flush=True)
+    else:
+        print(f"Connecting to host 127.0.0.1, port {SERVER_PORT}", flush=True)
+    start = time.monotonic()
+    step = 0
+    while True:
+        step += 1
+        time.sleep(max(start + step * interval - time.monotonic(), 0))
+        begin, end = (step - 1) * interval, step * interval
+        up, down = rng.uniform(1, 40) * 1e6, rng.uniform(1, 40) * 1e6
+        sums = [{'start': begin, 'end': end, 'seconds': interval, 'bytes': rate * interval / 8,
+                 'bits_per_second': rate, 'retransmits': rng.randint(0, 3), 'omitted': False, 'sender': sender}
+                for rate, sender in ((up, True), (down, False))]
+        if fmt == 'json':
+            print(json.dumps({'event': 'interval', 'data': {'streams': [], 'sum': sums[0], 'sum_bidir_reverse': sums[1]}}), flush=True)
+        else:
+            print(f"[  5][TX-C] {begin:6.2f}-{end:<6.2f} sec  {sums[0]['bytes'] / 1024 ** 2:.2f} MBytes  "
+                  f"{up / 1e6:.2f} Mbits/sec    {sums[0]['retransmits']}   70.7 KBytes", flush=True)
+            print(f"[  7][RX-C] {begin:6.2f}-{end:<6.2f} sec  {sums[1]['bytes'] / 1024 ** 2:.2f} MBytes  "
+                  f"{down / 1e6:.2f} Mbits/sec", flush=True)
+
+
+def run_iperf3(server_ip, port, log_file=LOG_FILE):
     # Iperf3 command to run on pMLTE side with mbps format
-    cmd = ["iperf3", "-c", server_ip, "-f", "m", "-t", "1", "--bidir"]
+    cmd = ["iperf3", "-c", server_ip, "-p", str(port), "-f", "m", "-t", "1", "--bidir"]
 
     while True:
         # Get the current date and time
@@ -16,7 +243,7 @@ def run_iperf3(server_ip, port):
         date_time = now.strftime("%Y/%b/%d %H:%M:%S")
 
         # Run the iperf test
-        with open("iperf3_log.txt", "a") as outfile:
+        with open(log_file, "a") as outfile:
             outfile.write(f"{date_time}\n")  # Add newline for clarity
             process = subprocess.Popen(cmd, stdout=outfile, stderr=subprocess.PIPE)
 
@@ -33,7 +260,58 @@ def run_iperf3(server_ip, port):
             # If no error, the test ran successfully, so wait for the next one
             print("Iperf3 test completed successfully.")
             # If time delay needed uncomment below line and enter delay in seconds
-            time.sleep(1)  
+            time.sleep(1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Log the bidirectional throughput to the iperf3 server into iperf3_log.txt")
+    parser.add_argument('--server', default=SERVER_IP, help=f"iperf3 server (default {SERVER_IP})")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help=f"iperf3 server port (default {SERVER_PORT})")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds per throughput sample (default 1)")
+    parser.add_argument('--format', choices=('json', 'text'), default='json',
+                        help="read iperf3 --json-stream (3.17 and newer) or its text interval lines (default json)")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds (default: run until Ctrl+C)")
+    parser.add_argument('--output', default=LOG_FILE, help=f"log file (default {LOG_FILE})")
+    parser.add_argument('--records', nargs='?', const=RECORDS_FILE, default=None, metavar='FILE',
+                        help=f"also write one typed JSON record per interval (default file {RECORDS_FILE})")
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="write the logs gzip or zstd compressed (iperf3_log.txt.gz, ...), all_data_extract.py reads them as they are")
+    parser.add_argument('--stand-in', action='store_true',
+                        help="run this script as a fake iperf3 client instead of iperf3, to try the logger without a server")
+    parser.add_argument('--quiet', action='store_true', help="do not print every interval")
+    parser.add_argument('--short-tests', action='store_true',
+                        help="use the old logger: a new 1 second iperf3 test every 2 seconds")
+    parser.add_argument('--emulate-iperf3', choices=('json', 'text'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.compress and args.short_tests:
+        parser.error("--compress works with the streaming logger, not with --short-tests")
+    args.output = compressed_name(args.output, args.compress)
+    if args.records:
+        args.records = compressed_name(args.records, args.compress)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.emulate_iperf3:
+        emulate_iperf3(args.emulate_iperf3, args.interval)
+        return
+
+    # open a new file for the results so the new test won't be added to old ones
+    for output in (args.output, args.records):
+        if output:
+            with open(output, "w") as outfile:
+                outfile.write("")
+
+    try:
+        if args.short_tests:
+            # Replace with iperf3 server IP and port (which is in our case a PC in Nichols Hall)
+            run_iperf3(args.server, args.port, args.output)
+        else:
+            asyncio.run(stream_to_file(args))
+    except KeyboardInterrupt:
+        print("\nScript stopped manually.")
+
 
-# Replace with iperf3 server IP and port (which is in our case a PC in Nichols Hall)
-run_iperf3("129.237.161.212", 5201)
+if __name__ == "__main__":
+    main()
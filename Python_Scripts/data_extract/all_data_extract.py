@@ -1,308 +1,1293 @@
-import re
-import csv
-from datetime import datetime
-import pytz
-from timezonefinder import TimezoneFinder
-
-def parse_iperf_log(filename):
-    """Parse iperf3_log.txt and extract test data"""
-    
-    results = []
-    
-    try:
-        with open(filename, 'r') as file:
-            content = file.read()
-            
-        lines = content.strip().split('\n')
-        
-        current_datetime = None
-        upload_speed = None
-        download_speed = None
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Match datetime pattern (2025/Sep/04 22:47:45)
-            datetime_match = re.match(r'(\d{4}/\w{3}/\d{2}\s+\d{2}:\d{2}:\d{2})', line)
-            if datetime_match:
-                # If we have a complete test, save it before starting new one
-                if current_datetime and upload_speed and download_speed:
-                    # Split datetime into separate Date and Time
-                    date_part, time_part = current_datetime.split(' ', 1)
-                    results.append({
-                        'date': date_part, # Stored separately
-                        'time': time_part, # Stored separately
-                        'upload_mbps': upload_speed,
-                        'download_mbps': download_speed
-                    })
-                
-                # Start new test
-                current_datetime = datetime_match.group(1)
-                upload_speed = None
-                download_speed = None
-                continue
-            
-            # Extract TX-C (upload) sender speed
-            tx_match = re.search(r'\[\s*\d+\]\[TX-C\].*?([\d.]+)\s+Mbits/sec.*?sender', line)
-            if tx_match and current_datetime:
-                upload_speed = float(tx_match.group(1))
-            
-            # Extract RX-C (download) sender speed  
-            rx_match = re.search(r'\[\s*\d+\]\[RX-C\].*?([\d.]+)\s+Mbits/sec.*?sender', line)
-            if rx_match and current_datetime:
-                download_speed = float(rx_match.group(1))
-        
-        # Don't forget the last test if file doesn't end with timestamp
-        if current_datetime and upload_speed and download_speed:
-            # Split datetime into separate Date and Time
-            date_part, time_part = current_datetime.split(' ', 1)
-            results.append({
-                'date': date_part, # Stored separately
-                'time': time_part, # Stored separately
-                'upload_mbps': upload_speed,
-                'download_mbps': download_speed
-            })
-                
-    except FileNotFoundError:
-        print(f"Warning: {filename} not found! Skipping throughput data.")
-        return []
-    except Exception as e:
-        print(f"Error reading {filename}: {e}")
-        return []
-    
-    return results
-
-def extract_ran_data(lte_log, lte_data):
-    """Extract and combine RAN data from LTE log"""
-    
-    try:
-        tf = TimezoneFinder()
-
-        # Header: "Date,Time" is now split into "Date" and "Time" columns
-        with open(lte_log, 'r') as infile, open(lte_data, 'w') as outfile:
-            outfile.write("Altitude,latitude,longitude,Date,Time") 
-            outfile.write(",MCC,MNC,PCI,EARFCN,CellID,LAC,RSRP,RSRQ,RSSI,SINR")
-            outfile.write(",NB1_EARFCN,NB1_PCI,NB1_RSRQ,NB1_RSRP,NB1_RSSI")
-            outfile.write(",NB2_EARFCN,NB2_PCI,NB2_RSRQ,NB2_RSRP,NB2_RSSI")
-            outfile.write(",NB3_EARFCN,NB3_PCI,NB3_RSRQ,NB3_RSRP,NB3_RSSI")
-            outfile.write(",NB4_EARFCN,NB4_PCI,NB4_RSRQ,NB4_RSRP,NB4_RSSI")
-            outfile.write(",NB5_EARFCN,NB5_PCI,NB5_RSRQ,NB5_RSRP,NB5_RSSI")
-            outfile.write(",NB6_EARFCN,NB6_PCI,NB6_RSRQ,NB6_RSRP,NB6_RSSI")
-            outfile.write(",NB7_EARFCN,NB7_PCI,NB7_RSRQ,NB7_RSRP,NB7_RSSI")
-            outfile.write(",NB8_EARFCN,NB8_PCI,NB8_RSRQ,NB8_RSRP,NB8_RSSI")
-            outfile.write(",NB9_EARFCN,NB9_PCI,NB9_RSRQ,NB9_RSRP,NB9_RSSI")
-            outfile.write(",NB10_EARFCN,NB10_PCI,NB10_RSRQ,NB10_RSRP,NB10_RSSI")
-
-            for line in infile:
-                if line.startswith(' $GPGGA'):
-                    fields = line.split(',')
-                    if len(fields) >= 10:
-                        alt_text = fields[9]
-                        if alt_text:
-                            altitude = int(float(alt_text) / 10) * 10
-                            outfile.write(f"\n{altitude},")
-                        else:
-                            outfile.write("\naltitude,")
-
-                if line.startswith(' $GPRMC'):
-                    fields = line.split(',')
-                    if len(fields) >= 10:
-                        lat_text = fields[3]
-                        lat_dir = fields[4]
-                        lon_text = fields[5]
-                        lon_dir = fields[6]
-                        utc_time = fields[1]
-                        utc_date = fields[9]
-
-                        if lat_text and lon_text and utc_time and utc_date:
-                            try:
-                                # Latitude
-                                lat_deg = float(lat_text[:2]) + float(lat_text[2:]) / 60
-                                if lat_dir == 'S':
-                                    lat_deg *= -1
-
-                                # Longitude
-                                lon_deg = float(lon_text[:3]) + float(lon_text[3:]) / 60
-                                if lon_dir == 'W':
-                                    lon_deg *= -1
-
-                                # UTC datetime object
-                                dt_utc = datetime.strptime(utc_date + utc_time.split('.')[0], "%d%m%y%H%M%S")
-                                dt_utc = pytz.utc.localize(dt_utc)
-
-                                # Timezone lookup
-                                tz_name = tf.timezone_at(lat=lat_deg, lng=lon_deg)
-                                if tz_name:
-                                    tz = pytz.timezone(tz_name)
-                                    dt_local = dt_utc.astimezone(tz)
-                                    # Data is now split into Date and Time fields
-                                    date_str = dt_local.strftime("%Y/%b/%d")
-                                    time_str = dt_local.strftime("%H:%M:%S")
-                                else:
-                                    date_str = dt_utc.strftime("%Y/%b/%d")
-                                    time_str = dt_utc.strftime("%H:%M:%S")
-
-                                # Write two separate fields: lat, lon, Date, Time
-                                outfile.write(f"{lat_deg},{lon_deg},{date_str},{time_str},")
-                            except Exception as e:
-                                print("Error parsing GPRMC:", e)
-                                # Write 4 placeholder fields
-                                outfile.write("invalid_lat,invalid_lon,invalid_date,invalid_time,")
-                        else:
-                            # Write 4 placeholder fields
-                            outfile.write("LAT,LON,Dat,Time,") 
-                
-                if line.startswith(' "servingcell"'):
-                    fields = line.split(',')
-                    if len(fields) >= 17:
-                        MCC = fields[4]
-                        MNC = fields[5]
-                        PCI = fields[7]
-                        EARFCN = fields[8]
-                        CellID = str(int(fields[6], 16) // 256) + "." + str(int(fields[6], 16) % 256)
-                        LAC = int(fields[12], 16)
-                        RSRP = fields[13]
-                        RSRQ = fields[14]
-                        RSSI = fields[15]
-                        SINR = fields[16]
-                        outfile.write(f"{MCC},{MNC},{PCI},{EARFCN},{CellID},{LAC},{RSRP},{RSRQ},{RSSI},{SINR},")
-                
-                if line.startswith(' "neighbourcell intra"'):
-                    fields = line.split(',')
-                    if len(fields) >= 8:
-                        NB_EARFCN = fields[2]
-                        NB_PCI = fields[3]
-                        NB_RSRQ = fields[4]
-                        NB_RSRP = fields[5]
-                        NB_RSSI = fields[6]
-                        outfile.write(f"{NB_EARFCN},{NB_PCI},{NB_RSRQ},{NB_RSRP},{NB_RSSI},")
-        
-        print(f"✅ RAN data extracted to {lte_data}")
-        
-    except FileNotFoundError:
-        print(f"Warning: {lte_log} not found! Skipping RAN data.")
-    except Exception as e:
-        print(f"Error processing RAN data: {e}")
-
-def parse_nping_log(input_file):
-    """Parse nping log and extract delay data"""
-    
-    try:
-        # Read file content
-        with open(input_file, "r") as file:
-            content = file.read()
-
-        # Split entries based on Date and Time
-        entries = re.split(r"(Date and Time: \d{4}/\w{3}/\d{2} \d{2}:\d{2}:\d{2})", content)
-        entries = [e.strip() for e in entries if e.strip()]
-        grouped = [(entries[i], entries[i+1]) for i in range(0, len(entries)-1, 2)]
-
-        # Extract and store info
-        summary = []
-        for timestamp, block in grouped:
-            dt_with_space = timestamp.replace("Date and Time: ", "")
-            
-            # Split datetime into separate Date and Time
-            date_part, time_part = dt_with_space.split(' ', 1)
-
-            # Extract Max RTT (or N/A)
-            rtt_match = re.search(r"Max rtt: ([\d.]+|N/A)", block)
-            max_rtt = rtt_match.group(1) if rtt_match else "N/A"
-
-            # Sent packets
-            sent_match = re.search(r"Raw packets sent: (\d+)", block)
-            sent = sent_match.group(1) if sent_match else "0"
-
-            # Received packets
-            rcvd_match = re.search(r"Rcvd: (\d+)", block)
-            rcvd = rcvd_match.group(1) if rcvd_match else "0"
-
-            # Save as separate Date and Time fields
-            summary.append((date_part, time_part, max_rtt, sent, rcvd)) 
-        
-        return summary
-        
-    except FileNotFoundError:
-        print(f"Warning: {input_file} not found! Skipping delay data.")
-        return []
-    except Exception as e:
-        print(f"Error reading {input_file}: {e}")
-        return []
-
-def save_to_csv(data, output_filename, headers):
-    """Save data to CSV file"""
-    
-    if not data:
-        print(f"No data to save to {output_filename}!")
-        return
-    
-    try:
-        with open(output_filename, 'w', newline='') as file:
-            # Writing headers now works without quoting because fields contain no comma
-            writer = csv.writer(file)
-            writer.writerow(headers) 
-            
-            if isinstance(data[0], dict):
-                # For throughput data (iperf) - uses 'date' and 'time' keys
-                for row in data:
-                    writer.writerow([row['date'], row['time'], row['upload_mbps'], row['download_mbps']])
-            else:
-                # For delay data (nping) (tuples) - starts with (date, time, ...)
-                writer.writerows(data)
-        
-        print(f"✅ Successfully saved {len(data)} records to {output_filename}")
-            
-    except Exception as e:
-        print(f"Error saving {output_filename}: {e}")
-
-def main():
-    """Main function to process all data types"""
-    
-    print("🚀 Starting Unified Network Data Extraction...")
-    print("=" * 50)
-    
-    # File mappings
-    files = {
-        'throughput': {
-            'input': 'iperf3_log.txt',
-            'output': 'iperf3_data.txt',
-            # Split 'Date,Time' into 'Date', 'Time'
-            'headers': ['Date', 'Time', 'UL', 'DL'] 
-        },
-        'ran': {
-            'input': 'lte_log.txt',
-            'output': 'lte_data.txt'
-        },
-        'delay': {
-            'input': 'nping_log.txt',
-            'output': 'nping_data.txt',
-            # Split 'Date,Time' into 'Date', 'Time'
-            'headers': ['Date', 'Time', 'Max_RTT_ms', 'Sent_Packets', 'Received_Packets']
-        }
-    }
-    
-    # Process throughput data
-    print("📊 Processing throughput data...")
-    throughput_data = parse_iperf_log(files['throughput']['input'])
-    if throughput_data:
-        save_to_csv(throughput_data, files['throughput']['output'], files['throughput']['headers'])
-    
-    # Process RAN data
-    print("📡 Processing RAN data...")
-    extract_ran_data(files['ran']['input'], files['ran']['output'])
-    
-    # Process delay data
-    print("⏱️  Processing delay data...")
-    delay_data = parse_nping_log(files['delay']['input'])
-    if delay_data:
-        save_to_csv(delay_data, files['delay']['output'], files['delay']['headers'])
-    
-    print("=" * 50)
-    print("🎉 Network data extraction complete!")
-    print("\nOutput files:")
-    print(f"  • {files['throughput']['output']} - Throughput data")
-    print(f"  • {files['ran']['output']} - RAN data")  
-    print(f"  • {files['delay']['output']} - Delay data")
-
-if __name__ == "__main__":
-    main()
+import io
+import os
+import re
+import csv
+import gzip
+import time
+import argparse
+import itertools
+import json
+import locale
+import hashlib
+import contextlib
+from collections import namedtuple, OrderedDict, Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+import pytz
+from timezonefinder import TimezoneFinder
+from pipeline import Manifest, script_params, Instruments, diagnostics, NB_CAPACITY, THROUGHPUT_DTYPE, DELAY_DTYPE, RAN_DTYPE, columnar_path
+
+try:
+    import zstandard
+except ImportError:  # only needed for the .zst logs of --compress zstd
+    zstandard = None
+
+# Typed records yielded by the streaming parsers
+ThroughputRecord = namedtuple('ThroughputRecord', 'date time upload_mbps download_mbps')
+DelayRecord = namedtuple('DelayRecord', 'date time max_rtt sent rcvd')
+GgaFix = namedtuple('GgaFix', 'altitude')
+RmcFix = namedtuple('RmcFix', 'lat lon utc tz_name status')
+ServingCell = namedtuple('ServingCell', 'mcc mnc pci earfcn cellid lac rsrp rsrq rssi sinr')
+NeighbourCell = namedtuple('NeighbourCell', 'earfcn pci rsrq rsrp rssi')
+
+# Read buffer for the log files, large enough to keep the scan disk-bound
+READ_BUFFER = 1 << 20
+
+# Suffixes of the compressed logs the loggers write with --compress
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+# What a decompressor raises at a stream cut off after its last flush point
+CUT_OFF_ERRORS = (EOFError,) if zstandard is None else (EOFError, zstandard.ZstdError)
+
+# Records buffered per batch of local-time conversion in the RAN writer
+RAN_BATCH = 4096
+
+# Timezone offsets only change on quarter-hour boundaries
+OFFSET_BUCKET = 900
+
+MONTH_ABBR = ('', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# Precompiled patterns (2025/Sep/04 22:47:45 style timestamps)
+IPERF_DATETIME = re.compile(r'(\d{4}/\w{3}/\d{2}\s+\d{2}:\d{2}:\d{2})')
+IPERF_TX = re.compile(r'\[\s*\d+\]\[TX-C\].*?([\d.]+)\s+Mbits/sec.*?sender')
+IPERF_RX = re.compile(r'\[\s*\d+\]\[RX-C\].*?([\d.]+)\s+Mbits/sec.*?sender')
+NPING_DATETIME = re.compile(r"Date and Time: (\d{4}/\w{3}/\d{2} \d{2}:\d{2}:\d{2})")
+NPING_RTT = re.compile(r"Max rtt: ([\d.]+|N/A)")
+NPING_SENT = re.compile(r"Raw packets sent: (\d+)")
+NPING_RCVD = re.compile(r"Rcvd: (\d+)")
+
+class CutOffStream(io.RawIOBase):
+    """A decompressing stream that ends quietly where the file ends
+
+    A log still being written, or left by a logger that lost power, stops at
+    its last flush point without the end-of-stream marker; everything up to
+    there is read instead of raising EOFError at the end.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            # read1: one step of the decompressor, so the text before the cut is not lost with the error
+            data = self.stream.read1(len(buffer))
+        except CUT_OFF_ERRORS:
+            data = b''
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+class JoinedStream(io.RawIOBase):
+    """The bytes of several files read one after the other, as if they were one file
+
+    Parts are opened as they are reached, a line cut in two by a rotation is
+    read whole again.
+    """
+
+    def __init__(self, filenames):
+        self.filenames = list(filenames)
+        self.stream = open_binary(self.filenames.pop(0))
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            count = self.stream.readinto(buffer)
+            if count or not self.filenames:
+                return count
+            self.stream.close()
+            self.stream = open_binary(self.filenames.pop(0))
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+def open_binary(filename):
+    """Raw bytes of one log file, .gz and .zst decompressed on the fly"""
+    if filename.endswith('.gz'):
+        stream = gzip.open(filename, 'rb')
+    elif filename.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"reading {filename} needs the zstandard package (pip install zstandard)")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True)
+    else:
+        return open(filename, 'rb', buffering=0)
+    return CutOffStream(stream)
+
+def open_log(filename):
+    """Open a log file for streaming (raises FileNotFoundError straight away)
+
+    .gz and .zst logs are decompressed on the fly as they are read, there is no
+    temporary decompressed copy. The numbered parts a rotating logger left
+    (lte_log.001.txt, ...) are read first, in order, so filename is the whole log.
+    """
+    parts = log_parts(filename)
+    if len(parts) == 1 and not filename.endswith(COMPRESSED_SUFFIXES):
+        return open(filename, 'r', buffering=READ_BUFFER)
+    return io.TextIOWrapper(io.BufferedReader(JoinedStream(parts), READ_BUFFER))
+
+def find_log(path):
+    """path, or its .gz/.zst form written by the loggers with --compress if only that exists"""
+    for candidate in (path,) + tuple(path + suffix for suffix in COMPRESSED_SUFFIXES):
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+def part_name(filename, number):
+    """lte_log.txt -> lte_log.001.txt, lte_log.txt.gz -> lte_log.001.txt.gz (as log_writer.py rotates them)"""
+    suffix = next((s for s in COMPRESSED_SUFFIXES if filename.endswith(s)), '')
+    stem, ext = os.path.splitext(filename[:len(filename) - len(suffix)])
+    return f"{stem}.{number:03d}{ext}{suffix}"
+
+def log_parts(filename):
+    """The rotated parts of a log (RAN_logging.py --rotate-mb/--rotate-minutes) in order, then the log itself"""
+    parts = []
+    while os.path.exists(part_name(filename, len(parts) + 1)):
+        parts.append(part_name(filename, len(parts) + 1))
+    return parts + [filename]
+
+def log_size(filename):
+    """Bytes on disk of a log and its rotated parts"""
+    return sum(os.path.getsize(part) for part in log_parts(filename) if os.path.exists(part))
+
+def run_machine(lines, dispatch, state, prefix_len=1, default=None, strip=False):
+    """Feed lines through a prefix-dispatched state machine and yield typed records
+
+    Every line is routed by its first prefix_len characters to a single handler,
+    so a line costs one dict lookup no matter how many line types a log has.
+    Handlers keep their progress in the state dict and return a record once one
+    is complete.
+    """
+    get = dispatch.get
+    for line in lines:
+        if strip:
+            line = line.strip()
+        handler = get(line[:prefix_len], default)
+        if handler is not None:
+            record = handler(line, state)
+            if record is not None:
+                yield record
+
+def scan_log(infile, dispatch, state, prefix_len=1, default=None, finish=None, strip=False):
+    """Stream a whole log through run_machine; finish(state) flushes what is left at the end"""
+    with infile:
+        yield from run_machine(infile, dispatch, state, prefix_len, default, strip)
+    if finish is not None:
+        record = finish(state)
+        if record is not None:
+            yield record
+
+# ---- instrumentation ----
+
+# JSON report of the last run, written next to the outputs
+REPORT_FILE = 'extract_report.json'
+PROFILE_FILE = 'extract_profile.prof'
+
+INSTRUMENTS = Instruments(__file__)
+
+# ---- timezones ----
+
+class TimezoneCache:
+    """Resolve GPS fixes to timezone names through a quantized lat/lon grid
+
+    Grid cells (resolution in degrees, 0.01 is about 1 km) are kept in an LRU of
+    max_cells entries, and the last cell is checked first: a flight stays in a
+    handful of cells, so TimezoneFinder is only asked once per new cell.
+    """
+
+    def __init__(self, finder=None, resolution=0.01, max_cells=4096):
+        self.finder = finder or TimezoneFinder()
+        self.resolution = resolution
+        self.max_cells = max_cells
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        self._cells = OrderedDict()
+        self._zones = {}
+        self._last_key = None
+        self._last_name = None
+
+    def timezone_at(self, lat, lng):
+        key = (round(lat / self.resolution), round(lng / self.resolution))
+        if key == self._last_key:
+            self.hits += 1
+            return self._last_name
+
+        if key in self._cells:
+            self.hits += 1
+            self._cells.move_to_end(key)
+            name = self._cells[key]
+        else:
+            self.misses += 1
+            start = time.perf_counter()
+            name = self.finder.timezone_at(lat=lat, lng=lng)
+            self.miss_seconds += time.perf_counter() - start
+            self._cells[key] = name
+            if len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+
+        self._last_key = key
+        self._last_name = name
+        return name
+
+    def zone(self, name):
+        """Return the (cached) pytz timezone for a name"""
+        tz = self._zones.get(name)
+        if tz is None:
+            tz = self._zones[name] = pytz.timezone(name)
+        return tz
+
+def parse_nmea_utc(utc_date, utc_time):
+    """Turn NMEA ddmmyy + hhmmss[.ss] fields into UTC epoch seconds"""
+    stamp = utc_date + utc_time.split('.')[0]
+    if len(stamp) != 12 or not stamp.isdigit():
+        raise ValueError(f"bad NMEA date/time {utc_date!r} {utc_time!r}")
+    year = int(stamp[4:6])
+    # Same century pivot as strptime's %y
+    year += 2000 if year < 69 else 1900
+    dt_utc = datetime(year, int(stamp[2:4]), int(stamp[0:2]),
+                      int(stamp[6:8]), int(stamp[8:10]), int(stamp[10:12]))
+    return int((dt_utc - UNIX_EPOCH).total_seconds())
+
+def _utc_offsets(utc, tz):
+    """UTC offsets (seconds) of tz at each epoch second, one lookup per quarter hour"""
+    buckets, inverse = np.unique(utc // OFFSET_BUCKET, return_inverse=True)
+    table = np.array([datetime.fromtimestamp(int(b) * OFFSET_BUCKET, tz).utcoffset().total_seconds()
+                      for b in buckets], dtype=np.int64)
+    return table[inverse]
+
+def localize_timestamps(utc_seconds, tz_names, tz_cache):
+    """Convert a column of UTC epoch seconds into local (Date, Time) strings in one batch
+
+    Rows without a timezone name stay in UTC.
+    """
+    utc = np.asarray(utc_seconds, dtype=np.int64)
+    if not len(utc):
+        return []
+    names = np.asarray(tz_names, dtype=object)
+    offsets = np.zeros(len(utc), dtype=np.int64)
+    for name in set(tz_names):
+        if name:
+            mask = names == name
+            offsets[mask] = _utc_offsets(utc[mask], tz_cache.zone(name))
+
+    # 'YYYY-MM-DDTHH:MM:SS' -> ('YYYY/Mon/DD', 'HH:MM:SS')
+    text = np.datetime_as_string((utc + offsets).astype('datetime64[s]'), unit='s')
+    return [(f"{s[:4]}/{MONTH_ABBR[int(s[5:7])]}/{s[8:10]}", s[11:]) for s in text.tolist()]
+
+# ---- columnar output ----
+
+# The schemas of the tables (RAN_DTYPE, ...) are in pipeline.py, the charts and maps read the same layout
+
+def _blank_row(dtype):
+    """A row of dtype with every field missing (NaN / NaT / '' / 0 / False)"""
+    row = np.zeros(1, dtype)
+    for name in dtype.names:
+        kind = dtype[name].base.kind
+        if kind == 'f':
+            row[name] = np.nan
+        elif kind == 'M':
+            row[name] = np.datetime64('NaT')
+    return row[0]
+
+def to_float(text):
+    """Parse a CSV field, NaN if it is not a number"""
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan
+
+def to_int(text):
+    """Parse an integer field, None if it is not one"""
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+def local_timestamp(date_str, time_str):
+    """'2025/Sep/04', '22:47:45' -> numpy datetime64 (NaT if malformed)"""
+    try:
+        month = MONTH_ABBR.index(date_str[5:8])
+        return np.datetime64(f"{date_str[:4]}-{month:02d}-{date_str[9:11]}T{time_str.strip()}", 's')
+    except ValueError:
+        return np.datetime64('NaT')
+
+class ColumnarTable:
+    """Rows of a structured dtype collected in fixed-size chunks, saved as one .npy file
+
+    The .npy layout can be opened with np.load(path, mmap_mode='r'), so readers
+    get typed column views without parsing any text.
+    """
+
+    def __init__(self, dtype, chunk_rows=RAN_BATCH):
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._blank = _blank_row(self.dtype)
+        self._chunks = []
+        self._chunk = None
+        self._used = chunk_rows
+
+    def new_row(self):
+        """Append a blank row and return it as a writable view"""
+        if self._used == self.chunk_rows:
+            self._chunk = np.empty(self.chunk_rows, self.dtype)
+            self._chunk[:] = self._blank
+            self._chunks.append(self._chunk)
+            self._used = 0
+        row = self._chunk[self._used]
+        self._used += 1
+        self.rows += 1
+        return row
+
+    def append(self, values):
+        """Append a row given as a tuple in dtype field order"""
+        self.new_row()
+        self._chunk[self._used - 1] = values
+
+    def to_array(self):
+        if not self._chunks:
+            return np.empty(0, self.dtype)
+        return np.concatenate(self._chunks[:-1] + [self._chunk[:self._used]])
+
+    def save(self, path):
+        np.save(path, self.to_array())
+        print(f"✅ Saved {self.rows} typed rows to {path}")
+
+def throughput_row(record):
+    return (local_timestamp(record.date, record.time), record.date, record.time,
+            record.upload_mbps, record.download_mbps)
+
+def delay_row(record):
+    return (local_timestamp(record.date, record.time), record.date, record.time,
+            to_float(record.max_rtt), int(record.sent), int(record.rcvd))
+
+def tee_rows(records, table, to_row):
+    """Pass a record stream through while appending each record to a ColumnarTable"""
+    for record in records:
+        table.append(to_row(record))
+        yield record
+
+# ServingCell / NeighbourCell fields and how they are stored in a RAN sample
+SERVING_INTS = ('MCC', 'MNC', 'PCI', 'EARFCN')
+SERVING_FLOATS = ('CellID', 'RSRP', 'RSRQ', 'RSSI', 'SINR')
+NEIGHBOUR_INTS = ('EARFCN', 'PCI')
+NEIGHBOUR_FLOATS = ('RSRQ', 'RSRP', 'RSSI')
+
+def add_ran_record(table, cursor, record, stamp=None):
+    """Place one RAN record into the RAN sample table
+
+    A $GPGGA fix opens a new sample; cursor tracks that sample and how many of
+    its neighbour slots are used. stamp is the local (Date, Time) of a valid
+    GPRMC fix. A serving cell or neighbour whose identifiers do not parse is
+    left out (its mask stays False) instead of being stored half-filled.
+    """
+    kind = type(record)
+    if kind is GgaFix:
+        row = cursor['row'] = table.new_row()
+        cursor['neighbours'] = 0
+        if record.altitude is not None:
+            row['Altitude'] = record.altitude
+        return
+
+    row = cursor['row']
+    if row is None:
+        # Records before the first $GPGGA have no row to go to
+        return
+    if kind is RmcFix:
+        if stamp is not None:
+            row['latitude'] = record.lat
+            row['longitude'] = record.lon
+            row['Timestamp'] = local_timestamp(*stamp)
+            row['has_fix'] = True
+    elif kind is ServingCell:
+        ints = [to_int(getattr(record, name.lower())) for name in SERVING_INTS]
+        if None in ints:
+            return
+        for name, value in zip(SERVING_INTS, ints):
+            row[name] = value
+        for name in SERVING_FLOATS:
+            row[name] = to_float(getattr(record, name.lower()))
+        row['LAC'] = record.lac
+        row['has_serving'] = True
+    elif kind is NeighbourCell:
+        # Neighbours beyond NB_CAPACITY are dropped, as in the CSV header
+        slot = cursor['neighbours']
+        ints = [to_int(getattr(record, name.lower())) for name in NEIGHBOUR_INTS]
+        if slot < NB_CAPACITY and None not in ints:
+            for name, value in zip(NEIGHBOUR_INTS, ints):
+                row[f'NB_{name}'][slot] = value
+            for name in NEIGHBOUR_FLOATS:
+                row[f'NB_{name}'][slot] = to_float(getattr(record, name.lower()))
+            cursor['neighbours'] = row['NB_count'] = slot + 1
+
+# ---- iperf3 ----
+
+def _iperf_record(state):
+    """Build the throughput record of the current test if it is complete"""
+    if state['datetime'] and state['upload'] and state['download']:
+        # Split datetime into separate Date and Time
+        date_part, time_part = state['datetime'].split(' ', 1)
+        return ThroughputRecord(date_part, time_part, state['upload'], state['download'])
+    return None
+
+def _iperf_timestamp(line, state):
+    # Match datetime pattern (2025/Sep/04 22:47:45)
+    datetime_match = IPERF_DATETIME.match(line)
+    if not datetime_match:
+        return None
+
+    # If we have a complete test, save it before starting new one
+    record = _iperf_record(state)
+    if record is None and state['datetime']:
+        INSTRUMENTS.count('rows_rejected')
+    state['datetime'] = datetime_match.group(1)
+    state['upload'] = None
+    state['download'] = None
+    return record
+
+def _iperf_speed(line, state):
+    if not state['datetime']:
+        return None
+
+    # Extract TX-C (upload) sender speed
+    tx_match = IPERF_TX.search(line)
+    if tx_match:
+        state['upload'] = float(tx_match.group(1))
+
+    # Extract RX-C (download) sender speed
+    rx_match = IPERF_RX.search(line)
+    if rx_match:
+        state['download'] = float(rx_match.group(1))
+    return None
+
+IPERF_DISPATCH = dict.fromkeys('0123456789', _iperf_timestamp)
+IPERF_DISPATCH['['] = _iperf_speed
+
+def _iperf_state():
+    return {'datetime': None, 'upload': None, 'download': None}
+
+def iter_iperf_records(filename):
+    """Stream ThroughputRecords out of iperf3_log.txt"""
+    return scan_log(open_log(filename), IPERF_DISPATCH, _iperf_state(),
+                    finish=_iperf_record, strip=True)
+
+def parse_iperf_log(filename):
+    """Parse iperf3_log.txt and extract test data"""
+    
+    try:
+        return [record._asdict() for record in iter_iperf_records(filename)]
+    except FileNotFoundError:
+        print(f"Warning: {filename} not found! Skipping throughput data.")
+        return []
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return []
+
+# ---- LTE modem (NMEA + serving/neighbour cells) ----
+
+def _ran_gpgga(line, state):
+    if not line.startswith(' $GPGGA'):
+        return None
+    fields = line.split(',')
+    if len(fields) >= 10:
+        alt_text = fields[9]
+        if alt_text:
+            return GgaFix(int(float(alt_text) / 10) * 10)
+        return GgaFix(None)
+    return None
+
+def _ran_gprmc(line, state):
+    if not line.startswith(' $GPRMC'):
+        return None
+    fields = line.split(',')
+    if len(fields) < 10:
+        return None
+    lat_text = fields[3]
+    lat_dir = fields[4]
+    lon_text = fields[5]
+    lon_dir = fields[6]
+    utc_time = fields[1]
+    utc_date = fields[9]
+
+    if not (lat_text and lon_text and utc_time and utc_date):
+        return RmcFix(None, None, None, None, 'empty')
+    try:
+        # Latitude
+        lat_deg = float(lat_text[:2]) + float(lat_text[2:]) / 60
+        if lat_dir == 'S':
+            lat_deg *= -1
+
+        # Longitude
+        lon_deg = float(lon_text[:3]) + float(lon_text[3:]) / 60
+        if lon_dir == 'W':
+            lon_deg *= -1
+
+        # UTC epoch seconds, turned into local Date/Time in batches by the writer
+        utc = parse_nmea_utc(utc_date, utc_time)
+
+        # Timezone lookup
+        tz_name = state['tz_cache'].timezone_at(lat=lat_deg, lng=lon_deg)
+        return RmcFix(lat_deg, lon_deg, utc, tz_name, 'ok')
+    except Exception as e:
+        print("Error parsing GPRMC:", e)
+        return RmcFix(None, None, None, None, 'invalid')
+
+def _ran_servingcell(line, state):
+    if not line.startswith(' "servingcell"'):
+        return None
+    fields = line.split(',')
+    if len(fields) >= 17:
+        cell = int(fields[6], 16)
+        return ServingCell(fields[4], fields[5], fields[7], fields[8],
+                           f"{cell // 256}.{cell % 256}", int(fields[12], 16),
+                           fields[13], fields[14], fields[15], fields[16])
+    return None
+
+def _ran_neighbourcell(line, state):
+    if not line.startswith(' "neighbourcell intra"'):
+        return None
+    fields = line.split(',')
+    if len(fields) >= 8:
+        return NeighbourCell(fields[2], fields[3], fields[4], fields[5], fields[6])
+    return None
+
+# The four line types differ in their first 7 characters
+RAN_PREFIX_LEN = 7
+RAN_DISPATCH = {
+    ' $GPGGA': _ran_gpgga,
+    ' $GPRMC': _ran_gprmc,
+    ' "servi': _ran_servingcell,
+    ' "neigh': _ran_neighbourcell,
+}
+
+def iter_ran_records(lte_log, tz_cache):
+    """Stream GgaFix/RmcFix/ServingCell/NeighbourCell records out of lte_log.txt"""
+    return scan_log(open_log(lte_log), RAN_DISPATCH, {'tz_cache': tz_cache},
+                    prefix_len=RAN_PREFIX_LEN)
+
+def _format_gga(record):
+    if record.altitude is None:
+        return "\naltitude,"
+    return f"\n{record.altitude},"
+
+def _format_rmc(record):
+    # Valid fixes are written by write_ran_records once their local time is known
+    if record.status == 'invalid':
+        return "invalid_lat,invalid_lon,invalid_date,invalid_time,"
+    return "LAT,LON,Dat,Time,"
+
+def _format_fields(record):
+    return ",".join(map(str, record)) + ","
+
+# Each record appends its own fragment to the current lte_data.txt row
+RAN_FORMATTERS = {
+    GgaFix: _format_gga,
+    RmcFix: _format_rmc,
+    ServingCell: _format_fields,
+    NeighbourCell: _format_fields,
+}
+
+def count_ran_batch(batch, fixes):
+    """Add a batch of RAN records to the rows/fixes counters of the running stage"""
+    kinds = Counter(map(type, batch))
+    INSTRUMENTS.count('rows_parsed', kinds[GgaFix])
+    INSTRUMENTS.count('gps_fixes', fixes)
+    INSTRUMENTS.count('rows_without_fix', kinds[RmcFix] - fixes)
+    INSTRUMENTS.count('neighbour_cells', kinds[NeighbourCell])
+
+def write_ran_records(records, outfile, tz_cache, table=None):
+    """Write RAN records as lte_data.txt fragments, localizing GPRMC times per batch
+
+    If a ColumnarTable is given, the same records also fill its rows.
+    """
+    write = outfile.write
+    cursor = {'row': None, 'neighbours': 0}
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, RAN_BATCH))
+        if not batch:
+            break
+        fixes = [r for r in batch if type(r) is RmcFix and r.status == 'ok']
+        with INSTRUMENTS.timer('localize'):
+            stamps = iter(localize_timestamps([r.utc for r in fixes], [r.tz_name for r in fixes], tz_cache))
+        count_ran_batch(batch, len(fixes))
+        for record in batch:
+            if type(record) is RmcFix and record.status == 'ok':
+                # Write two separate fields: lat, lon, Date, Time
+                stamp = next(stamps)
+                write(f"{record.lat},{record.lon},{stamp[0]},{stamp[1]},")
+            else:
+                stamp = None
+                write(RAN_FORMATTERS[type(record)](record))
+            if table is not None:
+                add_ran_record(table, cursor, record, stamp)
+
+def write_ran_header(outfile):
+    # Header: "Date,Time" is now split into "Date" and "Time" columns
+    outfile.write("Altitude,latitude,longitude,Date,Time") 
+    outfile.write(",MCC,MNC,PCI,EARFCN,CellID,LAC,RSRP,RSRQ,RSSI,SINR")
+    outfile.write(",NB1_EARFCN,NB1_PCI,NB1_RSRQ,NB1_RSRP,NB1_RSSI")
+    outfile.write(",NB2_EARFCN,NB2_PCI,NB2_RSRQ,NB2_RSRP,NB2_RSSI")
+    outfile.write(",NB3_EARFCN,NB3_PCI,NB3_RSRQ,NB3_RSRP,NB3_RSSI")
+    outfile.write(",NB4_EARFCN,NB4_PCI,NB4_RSRQ,NB4_RSRP,NB4_RSSI")
+    outfile.write(",NB5_EARFCN,NB5_PCI,NB5_RSRQ,NB5_RSRP,NB5_RSSI")
+    outfile.write(",NB6_EARFCN,NB6_PCI,NB6_RSRQ,NB6_RSRP,NB6_RSSI")
+    outfile.write(",NB7_EARFCN,NB7_PCI,NB7_RSRQ,NB7_RSRP,NB7_RSSI")
+    outfile.write(",NB8_EARFCN,NB8_PCI,NB8_RSRQ,NB8_RSRP,NB8_RSSI")
+    outfile.write(",NB9_EARFCN,NB9_PCI,NB9_RSRQ,NB9_RSRP,NB9_RSSI")
+    outfile.write(",NB10_EARFCN,NB10_PCI,NB10_RSRQ,NB10_RSRP,NB10_RSSI")
+
+def count_timezone_lookups(tz_cache):
+    INSTRUMENTS.count('timezone_hits', tz_cache.hits)
+    INSTRUMENTS.count('timezone_misses', tz_cache.misses)
+    INSTRUMENTS.add_time('timezone_lookup', tz_cache.miss_seconds)
+
+def extract_ran_data(lte_log, lte_data, columnar=False, iter_records=iter_ran_records):
+    """Extract and combine RAN data from LTE log (and its typed .npy table if columnar)
+
+    iter_records is iter_ran_jsonl when lte_log is the lte_records.jsonl of the logger.
+    """
+    
+    try:
+        table = ColumnarTable(RAN_DTYPE) if columnar else None
+        tz_cache = TimezoneCache()
+        records = iter_records(lte_log, tz_cache)
+
+        with open(lte_data, 'w') as outfile:
+            write_ran_header(outfile)
+            write_ran_records(records, outfile, tz_cache, table)
+        count_timezone_lookups(tz_cache)
+        
+        print(f"✅ RAN data extracted to {lte_data}")
+        if table is not None:
+            with INSTRUMENTS.timer('save_columnar'):
+                table.save(columnar_path(lte_data))
+        
+    except FileNotFoundError:
+        print(f"Warning: {lte_log} not found! Skipping RAN data.")
+    except Exception as e:
+        print(f"Error processing RAN data: {e}")
+
+# ---- nping ----
+
+def _nping_record(state):
+    """Build the delay record of the current entry if it has any output"""
+    if not (state['datetime'] and state['has_output']):
+        return None
+    # Split datetime into separate Date and Time
+    date_part, time_part = state['datetime'].split(' ', 1)
+    return DelayRecord(date_part, time_part,
+                       state['max_rtt'] or "N/A", state['sent'] or "0", state['rcvd'] or "0")
+
+def _nping_reset(state, timestamp):
+    state['datetime'] = timestamp
+    state['has_output'] = False
+    state['max_rtt'] = None
+    state['sent'] = None
+    state['rcvd'] = None
+
+def _nping_line(line, state):
+    if line.strip():
+        state['has_output'] = True
+    return None
+
+def _nping_timestamp(line, state):
+    # Entries are split on their "Date and Time: ..." header
+    datetime_match = NPING_DATETIME.match(line)
+    if not datetime_match:
+        return _nping_line(line, state)
+    record = _nping_record(state)
+    if record is None and state['datetime']:
+        INSTRUMENTS.count('rows_rejected')
+    _nping_reset(state, datetime_match.group(1))
+    _nping_line(line[datetime_match.end():], state)
+    return record
+
+def _nping_rtt(line, state):
+    # Extract Max RTT (or N/A)
+    if state['max_rtt'] is None:
+        rtt_match = NPING_RTT.match(line)
+        if rtt_match:
+            state['max_rtt'] = rtt_match.group(1)
+    return _nping_line(line, state)
+
+def _nping_packets(line, state):
+    # Sent and received packets
+    if state['sent'] is None:
+        sent_match = NPING_SENT.match(line)
+        if sent_match:
+            state['sent'] = sent_match.group(1)
+    if state['rcvd'] is None:
+        rcvd_match = NPING_RCVD.search(line)
+        if rcvd_match:
+            state['rcvd'] = rcvd_match.group(1)
+    return _nping_line(line, state)
+
+NPING_DISPATCH = {'D': _nping_timestamp, 'M': _nping_rtt, 'R': _nping_packets}
+
+def _nping_state():
+    state = {}
+    _nping_reset(state, None)
+    return state
+
+def iter_nping_records(input_file):
+    """Stream DelayRecords out of nping_log.txt"""
+    return scan_log(open_log(input_file), NPING_DISPATCH, _nping_state(),
+                    default=_nping_line, finish=_nping_record)
+
+def parse_nping_log(input_file):
+    """Parse nping log and extract delay data"""
+    
+    try:
+        return list(iter_nping_records(input_file))
+    except FileNotFoundError:
+        print(f"Warning: {input_file} not found! Skipping delay data.")
+        return []
+    except Exception as e:
+        print(f"Error reading {input_file}: {e}")
+        return []
+
+# ---- structured records (--records of the loggers) ----
+
+def read_jsonl(filename):
+    """Stream the records of a JSONL file; a line cut short when the logger was stopped is skipped"""
+    with open_log(filename) as infile:
+        for line in infile:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                INSTRUMENTS.count('rows_rejected')
+
+def iter_iperf_jsonl(filename):
+    """ThroughputRecords of iperf3_records.jsonl, rounded like the text log"""
+    for record in read_jsonl(filename):
+        yield ThroughputRecord(record['date'], record['time'],
+                               round(record['upload_mbps'], 2), round(record['download_mbps'], 2))
+
+def iter_nping_jsonl(filename):
+    """DelayRecords of nping_records.jsonl"""
+    for record in read_jsonl(filename):
+        rtt = record['rtt_ms']
+        yield DelayRecord(record['date'], record['time'], "N/A" if rtt is None else f"{rtt:.3f}",
+                          str(record['sent']), str(record['rcvd']))
+
+def iter_ran_jsonl(filename, tz_cache):
+    """The GgaFix/RmcFix/ServingCell/NeighbourCell stream of lte_records.jsonl, one round after the other
+
+    The records were decoded by the logger already, only the timezone of each
+    fix is looked up here, so lte_data.txt comes out as from the raw log.
+    """
+    for record in read_jsonl(filename):
+        altitude = record['altitude']
+        yield GgaFix(None if altitude is None else int(altitude / 10) * 10)
+        # the answers of the round in the order the modem gave them, as in the raw log
+        for answer in record['answers']:
+            kind = answer['kind']
+            if kind == 'fix':
+                if answer['status'] == 'ok':
+                    tz_name = tz_cache.timezone_at(lat=answer['lat'], lng=answer['lon'])
+                    yield RmcFix(answer['lat'], answer['lon'], answer['utc'], tz_name, 'ok')
+                else:
+                    yield RmcFix(None, None, None, None, answer['status'])
+            elif kind == 'serving':
+                cell = answer['cell_id']
+                yield ServingCell(answer['mcc'], answer['mnc'], answer['pci'], answer['earfcn'],
+                                  f"{cell // 256}.{cell % 256}", answer['lac'],
+                                  answer['rsrp'], answer['rsrq'], answer['rssi'], answer['sinr'])
+            elif kind == 'intra':
+                # lte_data.txt only has the intra-frequency neighbours
+                yield NeighbourCell(answer['earfcn'], answer['pci'], answer['rsrq'], answer['rsrp'], answer['rssi'])
+
+# The record streams of each log type, from the raw text or from the JSONL records
+TEXT_READERS = {'throughput': iter_iperf_records, 'delay': iter_nping_records}
+RECORD_READERS = {'throughput': iter_iperf_jsonl, 'delay': iter_nping_jsonl}
+
+def open_records(iter_records, filename, label):
+    """Open a record stream, or warn and return None if the log file is missing"""
+    
+    try:
+        return iter_records(filename)
+    except FileNotFoundError:
+        print(f"Warning: {filename} not found! Skipping {label} data.")
+        return None
+
+def save_to_csv(data, output_filename, headers):
+    """Save data (a list or a stream of records) to CSV file"""
+    
+    try:
+        rows = iter(data)
+        first = next(rows, None)
+        if first is None:
+            print(f"No data to save to {output_filename}!")
+            return
+
+        count = 0
+        with open(output_filename, 'w', newline='') as file:
+            # Writing headers now works without quoting because fields contain no comma
+            writer = csv.writer(file)
+            writer.writerow(headers) 
+            
+            for row in itertools.chain((first,), rows):
+                if isinstance(row, dict):
+                    # For throughput data (iperf) - uses 'date' and 'time' keys
+                    row = [row['date'], row['time'], row['upload_mbps'], row['download_mbps']]
+                # Typed records and delay tuples start with (date, time, ...)
+                writer.writerow(row)
+                count += 1
+        
+        INSTRUMENTS.count('rows_parsed', count)
+        print(f"✅ Successfully saved {count} records to {output_filename}")
+            
+    except Exception as e:
+        print(f"Error saving {output_filename}: {e}")
+
+# File mappings
+FILES = {
+    'throughput': {
+        'input': 'iperf3_log.txt',
+        'records': 'iperf3_records.jsonl',
+        'output': 'iperf3_data.txt',
+        # Split 'Date,Time' into 'Date', 'Time'
+        'headers': ['Date', 'Time', 'UL', 'DL'],
+        'dtype': THROUGHPUT_DTYPE,
+    },
+    'ran': {
+        'input': 'lte_log.txt',
+        'records': 'lte_records.jsonl',
+        'output': 'lte_data.txt',
+        'dtype': RAN_DTYPE,
+    },
+    'delay': {
+        'input': 'nping_log.txt',
+        'records': 'nping_records.jsonl',
+        'output': 'nping_data.txt',
+        # Split 'Date,Time' into 'Date', 'Time'
+        'headers': ['Date', 'Time', 'Max_RTT_ms', 'Sent_Packets', 'Received_Packets'],
+        'dtype': DELAY_DTYPE,
+    },
+}
+
+# Names of the raw logs and records files the inputs are picked from, the WebGUI rescans them to notice a new log
+LOG_NAMES = r'^(?:iperf3|lte|nping)_(?:log|records)'
+
+def extract_table_data(iter_records, spec, label, to_row, columnar=False):
+    """Stream one log into its CSV file, and into its typed .npy table if columnar"""
+    
+    records = open_records(iter_records, spec['input'], label)
+    if records is None:
+        return
+    table = None
+    if columnar:
+        table = ColumnarTable(spec['dtype'])
+        records = tee_rows(records, table, to_row)
+    save_to_csv(records, spec['output'], spec['headers'])
+    if table is not None and table.rows:
+        with INSTRUMENTS.timer('save_columnar'):
+            table.save(columnar_path(spec['output']))
+
+# ---- several modems (RAN_logging.py --device ID=...) ----
+
+# lte_log_att.txt, lte_records_vz.jsonl.gz, lte_log_att.001.txt ... of the modem with that ID
+DEVICE_LOG = re.compile(r'^lte_(?:log|records)_([A-Za-z0-9-]+)(?:\.\d{3})?\.(?:txt|jsonl)(?:\.gz|\.zst)?$')
+
+# Every RAN sample of all modems, tagged with its device ID in a first column
+DEVICES_OUTPUT = 'lte_data_devices.txt'
+
+def device_file(filename, device):
+    """lte_log.txt -> lte_log_att.txt for the device att (unchanged without a device)"""
+    if not device:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{device}{ext}"
+
+def file_spec(kind, device=None):
+    """FILES[kind], with the file names of one modem for a RAN device"""
+    spec = dict(FILES[kind])
+    for key in ('input', 'records', 'output'):
+        spec[key] = device_file(spec[key], device)
+    return spec
+
+def find_devices(folder=''):
+    """IDs of the modems logged side by side in folder, sorted"""
+    matches = (DEVICE_LOG.match(name) for name in os.listdir(folder or '.'))
+    return sorted({match.group(1) for match in matches if match})
+
+def write_device_table(folder, devices):
+    """Stack the lte_data_ID.txt of every modem into lte_data_devices.txt, each row starting with its device ID"""
+    output = os.path.join(folder, DEVICES_OUTPUT)
+    count = 0
+    with open(output, 'w') as outfile:
+        outfile.write('Device,')
+        write_ran_header(outfile)
+        for device in devices:
+            data = os.path.join(folder, device_file(FILES['ran']['output'], device))
+            if not os.path.exists(data):
+                continue
+            with open(data) as infile:
+                next(infile, None)  # header
+                for line in infile:
+                    line = line.rstrip('\n')
+                    if line:
+                        # rows start with their newline, as in lte_data.txt
+                        outfile.write(f"\n{device},{line}")
+                        count += 1
+    print(f"✅ {count} RAN samples of {len(devices)} modems tagged with their device in {output}")
+
+def log_source(kind, folder='', from_text=False, device=None):
+    """The file a log type is extracted from: the JSONL records of the logger if it wrote them, else the raw log"""
+    spec = file_spec(kind, device)
+    records = find_log(os.path.join(folder, spec['records']))
+    if not from_text and os.path.exists(records):
+        return records
+    return find_log(os.path.join(folder, spec['input']))
+
+def extract_kind(kind, folder='', columnar=False, incremental=False, from_text=False, device=None):
+    """Extract one log type ('throughput', 'ran' or 'delay') found in folder, writing outputs in place
+
+    device picks the logs of one of several modems (lte_log_ID.txt -> lte_data_ID.txt).
+    """
+    
+    spec = file_spec(kind, device)
+    spec['input'] = os.path.join(folder, spec['input'])
+    spec['output'] = os.path.join(folder, spec['output'])
+    if incremental and len(log_parts(spec['input'])) > 1:
+        # a rotation moves the checkpointed bytes into a part, the whole log is parsed again
+        print(f"🔄 {spec['input']} was rotated into parts, extracting it in full")
+        if os.path.exists(checkpoint_path(spec['output'])):
+            os.remove(checkpoint_path(spec['output']))
+        incremental = False
+    if incremental:
+        # checkpoints are byte offsets into the plain raw log, records and compressed logs are not used here
+        extract_incremental(kind, spec)
+        return
+    source = log_source(kind, folder, from_text, device)
+    structured = os.path.basename(source).startswith(file_spec(kind, device)['records'])
+    if structured:
+        print(f"📄 Reading the typed records of {source}")
+    spec['input'] = source
+    if os.path.exists(source):
+        INSTRUMENTS.count('bytes_read', log_size(source))
+    if kind == 'ran':
+        extract_ran_data(source, spec['output'], columnar, iter_ran_jsonl if structured else iter_ran_records)
+    else:
+        readers = RECORD_READERS if structured else TEXT_READERS
+        to_row = throughput_row if kind == 'throughput' else delay_row
+        extract_table_data(readers[kind], spec, kind, to_row, columnar)
+
+# ---- incremental mode ----
+
+# How the state machine of each log type is driven line by line
+MACHINES = {
+    'throughput': {'dispatch': IPERF_DISPATCH, 'prefix_len': 1, 'default': None, 'strip': True,
+                   'new_state': _iperf_state, 'finish': _iperf_record},
+    'ran': {'dispatch': RAN_DISPATCH, 'prefix_len': RAN_PREFIX_LEN, 'default': None, 'strip': False,
+            'new_state': dict, 'finish': None},
+    'delay': {'dispatch': NPING_DISPATCH, 'prefix_len': 1, 'default': _nping_line, 'strip': False,
+              'new_state': _nping_state, 'finish': _nping_record},
+}
+
+# Bytes of the log start hashed to notice that a logger restarted the file
+FINGERPRINT_BYTES = 4096
+UNIVERSAL_NEWLINES = re.compile(r'\r\n?')
+
+def checkpoint_path(data_file):
+    return data_file + '.checkpoint.json'
+
+def _fingerprint(log_file, offset):
+    with open(log_file, 'rb') as infile:
+        return hashlib.sha1(infile.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+def load_checkpoint(log_file, data_file):
+    """Checkpoint of the last incremental run, or None if the log has to be read from the start"""
+    try:
+        with open(checkpoint_path(data_file)) as infile:
+            checkpoint = json.load(infile)
+        if (checkpoint['log'] != os.path.basename(log_file)
+                or os.path.getsize(log_file) < checkpoint['offset']
+                or os.path.getsize(data_file) < checkpoint['data_size']
+                or _fingerprint(log_file, checkpoint['offset']) != checkpoint['fingerprint']):
+            return None
+        return checkpoint
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_checkpoint(log_file, data_file, offset, state, data_size):
+    """Atomically record how far log_file has been parsed and the parser state at that point"""
+    checkpoint = {
+        'log': os.path.basename(log_file),
+        'offset': offset,
+        'fingerprint': _fingerprint(log_file, offset),
+        'state': state,
+        # Size of data_file without the provisional last record (see extract_incremental)
+        'data_size': data_size,
+    }
+    path = checkpoint_path(data_file)
+    with open(path + '.tmp', 'w') as outfile:
+        json.dump(checkpoint, outfile)
+    os.replace(path + '.tmp', path)
+
+def read_new_lines(log_file, progress):
+    """Yield the complete lines written to log_file after byte offset progress['offset']
+
+    progress['offset'] follows the end of the last line handed out, so a line the
+    logger is still writing is left for the next run. Line endings are
+    normalised the way a text-mode read of the whole file would.
+    """
+    encoding = locale.getpreferredencoding(False)
+    offset = progress['offset']
+    with open(log_file, 'rb', buffering=READ_BUFFER) as infile:
+        infile.seek(offset)
+        for raw in infile:
+            if not raw.endswith(b'\n'):
+                break
+            offset += len(raw)
+            progress['offset'] = offset
+            line = raw.decode(encoding)
+            if '\r' in line:
+                for part in UNIVERSAL_NEWLINES.sub('\n', line).split('\n')[:-1]:
+                    yield part + '\n'
+            else:
+                yield line
+
+def extract_incremental(kind, spec):
+    """Parse only what was appended to a log since the last run and append it to the data file
+
+    The checkpoint next to the data file stores the byte offset, the parser
+    state (including a half-finished entry) and the size of the data file.
+    The entry still open at the end of the log is written as a provisional last
+    record and cut off again by the next run, so the data file always matches
+    a full extraction.
+    """
+    log_file, data_file = spec['input'], spec['output']
+    if not os.path.exists(log_file):
+        print(f"Warning: {log_file} not found! Skipping {kind} data.")
+        return
+    machine = MACHINES[kind]
+
+    checkpoint = load_checkpoint(log_file, data_file)
+    if checkpoint is None:
+        progress = {'offset': 0}
+        state = machine['new_state']()
+        with open(data_file, 'w', newline='') as outfile:
+            if kind == 'ran':
+                write_ran_header(outfile)
+            else:
+                csv.writer(outfile).writerow(spec['headers'])
+    else:
+        progress = {'offset': checkpoint['offset']}
+        state = checkpoint['state']
+        os.truncate(data_file, checkpoint['data_size'])
+    start = progress['offset']
+
+    context = {'tz_cache': TimezoneCache()} if kind == 'ran' else {}
+    state.update(context)
+    records = run_machine(read_new_lines(log_file, progress), machine['dispatch'], state,
+                          machine['prefix_len'], machine['default'], machine['strip'])
+    count = 0
+    with open(data_file, 'a', newline='') as outfile:
+        if kind == 'ran':
+            write_ran_records(records, outfile, context['tz_cache'])
+            count_timezone_lookups(context['tz_cache'])
+        else:
+            writer = csv.writer(outfile)
+            for record in records:
+                writer.writerow(record)
+                count += 1
+            INSTRUMENTS.count('rows_parsed', count)
+        outfile.flush()
+        data_size = outfile.tell()
+        for name in context:
+            del state[name]
+
+        # The open entry goes out as a provisional record; the parser state keeps it open
+        if machine['finish'] is not None:
+            pending = machine['finish'](dict(state))
+            if pending is not None:
+                writer.writerow(pending)
+
+    save_checkpoint(log_file, data_file, progress['offset'], state, data_size)
+    new_bytes = progress['offset'] - start
+    INSTRUMENTS.count('bytes_read', new_bytes)
+    if kind == 'ran':
+        print(f"✅ RAN data updated in {data_file} ({new_bytes} new log bytes)")
+    else:
+        print(f"✅ Appended {count} records to {data_file} ({new_bytes} new log bytes)")
+
+# ---- batch mode ----
+
+def find_log_folders(root):
+    """Every folder under root (e.g. 'Data Set/*/LTE logs') holding at least one raw log or records file"""
+    inputs = {spec[key] + suffix for spec in FILES.values() for key in ('input', 'records')
+              for suffix in ('',) + COMPRESSED_SUFFIXES}
+    folders = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        if inputs.intersection(filenames) or any(DEVICE_LOG.match(name) for name in filenames):
+            folders.append(dirpath)
+    return folders
+
+def _timed_extract(folder, kind, device, columnar, incremental, from_text):
+    """Process pool job: extract one log, returning its timing, instruments and captured console output"""
+    start = time.perf_counter()
+    output = io.StringIO()
+    INSTRUMENTS.reset()
+    stage = f'extract:{kind}:{device}' if device else f'extract:{kind}'
+    with contextlib.redirect_stdout(output), INSTRUMENTS.stage(stage):
+        extract_kind(kind, folder, columnar, incremental, from_text, device)
+    return folder, kind, time.perf_counter() - start, output.getvalue(), INSTRUMENTS.stages
+
+def run_batch(root, columnar=False, workers=None, incremental=False, from_text=False):
+    """Re-extract every log folder under root, fanning the logs out to a process pool"""
+    
+    folders = find_log_folders(root)
+    if not folders:
+        print(f"No log files found under {root}")
+        return
+
+    # One job per (folder, log, modem); the biggest logs go first so no core idles at the end
+    from_text = from_text or incremental
+    devices = {folder: find_devices(folder) for folder in folders}
+    jobs = [(folder, kind, device) for folder in folders for kind in FILES
+            for device in [None] + (devices[folder] if kind == 'ran' else [])
+            if os.path.exists(log_source(kind, folder, from_text, device))]
+    jobs.sort(key=lambda job: log_size(log_source(job[1], job[0], from_text, job[2])), reverse=True)
+
+    print(f"🚀 Batch extraction of {len(jobs)} logs in {len(folders)} folders...")
+    print("=" * 50)
+    timings = {folder: {} for folder in folders}
+    stages = {folder: {} for folder in folders}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_timed_extract, folder, kind, device, columnar, incremental, from_text)
+                   for folder, kind, device in jobs]
+        for future in as_completed(futures):
+            folder, kind, seconds, output, instruments = future.result()
+            # the modems of a folder add up in its ran column
+            timings[folder][kind] = timings[folder].get(kind, 0.0) + seconds
+            stages[folder].update(instruments)
+            print(f"[{folder}]")
+            print(output, end='')
+    for folder in folders:
+        if devices[folder]:
+            write_device_table(folder, devices[folder])
+    wall = time.perf_counter() - start
+
+    # One report per folder, next to its outputs, stages in the usual order
+    order = list(FILES)
+    for folder in folders:
+        INSTRUMENTS.reset()
+        for stage in sorted(stages[folder], key=lambda stage: (order.index(stage.split(':')[1]), stage)):
+            INSTRUMENTS.stages[stage] = stages[folder][stage]
+        INSTRUMENTS.report(os.path.join(folder, REPORT_FILE))
+
+    print("=" * 50)
+    print(f"{'folder':<60} {'throughput':>10} {'ran':>8} {'delay':>8} {'total':>8}")
+    for folder in folders:
+        row = timings[folder]
+        cells = [f"{row[kind]:.2f}s" if kind in row else "-" for kind in ('throughput', 'ran', 'delay')]
+        print(f"{folder:<60} {cells[0]:>10} {cells[1]:>8} {cells[2]:>8} {sum(row.values()):>7.2f}s")
+    busy = sum(sum(row.values()) for row in timings.values())
+    print(f"🎉 {len(jobs)} logs extracted in {wall:.2f}s wall time ({busy:.2f}s of work)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract RAN, throughput and delay data from the log files")
+    parser.add_argument('--columnar', action='store_true',
+                        help="also write typed, memory-mappable .npy tables next to the CSV files")
+    parser.add_argument('--batch', nargs='?', const='Data Set', metavar='ROOT',
+                        help="extract every log folder under ROOT (default 'Data Set') in parallel, "
+                             "writing the outputs next to each log")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for --batch (default: one per CPU)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only parse what was appended to each log since the last --incremental run "
+                             "(checkpoints are kept in *_data.txt.checkpoint.json)")
+    parser.add_argument('--force', action='store_true',
+                        help="re-extract even if the build manifest says a log did not change")
+    parser.add_argument('--from-text', action='store_true',
+                        help="parse the raw text logs even where the loggers wrote JSONL records (--records)")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"run under cProfile, saving {PROFILE_FILE} and the slowest functions in {REPORT_FILE}")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help=f"trace allocations with tracemalloc, adding peaks and top allocation sites to {REPORT_FILE}")
+    args = parser.parse_args(argv)
+    if args.incremental and args.columnar:
+        parser.error("--columnar tables are rebuilt from scratch, run them without --incremental")
+    if args.batch and (args.profile or args.trace_memory):
+        parser.error("--profile and --trace-memory work on a single folder, run them without --batch")
+    return args
+
+def main(argv=None):
+    """Main function to process all data types"""
+    
+    args = parse_args(argv)
+    if args.batch:
+        run_batch(args.batch, args.columnar, args.workers, args.incremental, args.from_text)
+        return
+    files = FILES
+
+    print("🚀 Starting Unified Network Data Extraction...")
+    print("=" * 50)
+    
+    # Stages whose log did not change since the last run are skipped
+    manifest = Manifest()
+    params = script_params(__file__, columnar=args.columnar, incremental=args.incremental, from_text=args.from_text)
+    # Several modems (RAN_logging.py --device) each get their own RAN step
+    devices = find_devices()
+    from_text = args.from_text or args.incremental
+    steps = [('throughput', None, "📊 Processing throughput data...")]
+    if not devices or os.path.exists(log_source('ran', from_text=from_text)):
+        steps.append(('ran', None, "📡 Processing RAN data..."))
+    steps += [('ran', device, f"📡 Processing RAN data of modem {device}...") for device in devices]
+    steps.append(('delay', None, "⏱️  Processing delay data..."))
+    skipped = []
+    with diagnostics(INSTRUMENTS, PROFILE_FILE, args.profile, args.trace_memory) as extra:
+        for kind, device, message in steps:
+            print(message)
+            spec = file_spec(kind, device)
+            stage = f'extract:{kind}:{device}' if device else f'extract:{kind}'
+            source = log_source(kind, from_text=from_text, device=device)
+            # a rotated log is all of its parts
+            inputs = log_parts(source)
+            if not args.force and manifest.is_fresh(stage, inputs, params):
+                print(f"⏭️  {source} unchanged, keeping {spec['output']}")
+                skipped.append(stage)
+                continue
+            with INSTRUMENTS.stage(stage):
+                extract_kind(kind, columnar=args.columnar, incremental=args.incremental, from_text=args.from_text,
+                             device=device)
+            outputs = [spec['output']]
+            if args.columnar:
+                outputs.append(columnar_path(spec['output']))
+            manifest.record(stage, inputs, params, outputs)
+        if devices:
+            write_device_table('', devices)
+    manifest.save(__file__, watch=LOG_NAMES)
+    INSTRUMENTS.report(REPORT_FILE, skipped=skipped, **extra)
+    
+    print("=" * 50)
+    print("🎉 Network data extraction complete!")
+    print("\nOutput files:")
+    print(f"  • {files['throughput']['output']} - Throughput data")
+    print(f"  • {files['ran']['output']} - RAN data")  
+    for device in devices:
+        print(f"  • {device_file(files['ran']['output'], device)} - RAN data of modem {device}")
+    if devices:
+        print(f"  • {DEVICES_OUTPUT} - RAN data of all modems, tagged with their device")
+    print(f"  • {files['delay']['output']} - Delay data")
+    if args.columnar:
+        print("  • typed .npy tables next to each of them")
+    print(f"  • {REPORT_FILE} - timings and counters of this run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import importlib.util
+
+try:
+    import resource
+except ImportError:  # Windows, peak RSS is not reported there
+    resource = None
+
+# Benchmark the parsers of all_data_extract.py (or an older copy of it) on the logs of a folder,
+# e.g. the ones written by generate_logs.py, and compare the results with an earlier run
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODULE = os.path.join(SCRIPT_DIR, 'all_data_extract.py')
+
+# parser name: log file it reads
+PARSERS = {
+    'parse_iperf_log': 'iperf3_log.txt',
+    'extract_ran_data': 'lte_log.txt',
+    'parse_nping_log': 'nping_log.txt',
+}
+
+def load_module(path):
+    """Import an all_data_extract.py by path, so an old build can be benchmarked next to the current one"""
+    spec = importlib.util.spec_from_file_location('benchmarked_extract', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, None where it cannot be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_parser(module_path, name, log_file):
+    """Run one parser once and measure it (called in a fresh process)"""
+    module = load_module(module_path)
+    with tempfile.TemporaryDirectory() as scratch, open(os.devnull, 'w') as quiet:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(quiet):
+            if name == 'extract_ran_data':
+                output = os.path.join(scratch, 'lte_data.txt')
+                module.extract_ran_data(log_file, output)
+            else:
+                records = getattr(module, name)(log_file)
+        wall = time.perf_counter() - start
+        if name == 'extract_ran_data':
+            with open(output) as f:
+                count = max(sum(1 for _ in f) - 1, 0)
+        else:
+            count = len(records)
+    return {'records': count, 'wall_s': wall, 'peak_rss': peak_rss()}
+
+def measure(module_path, name, log_file):
+    """Run one parser in its own process, so the peak RSS belongs to that parser alone"""
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', module_path, name, log_file],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+# --compress: suffix of the compressed logs (see generate_logs.py --compress)
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+def benchmark(folder, module_path, names, repeat, compress=None):
+    """Benchmark every parser whose log is in folder, keeping the fastest of repeat runs"""
+    results = {}
+    for name in names:
+        log_file = os.path.join(folder, PARSERS[name] + (COMPRESSIONS[compress] if compress else ''))
+        if not os.path.exists(log_file):
+            print(f"Warning: {log_file} not found! Skipping {name}.")
+            continue
+        runs = [measure(module_path, name, log_file) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run['wall_s'])
+        rss = [run['peak_rss'] for run in runs if run['peak_rss'] is not None]
+        best['peak_rss'] = max(rss) if rss else None
+        best['log_bytes'] = os.path.getsize(log_file)
+        best['records_per_s'] = best['records'] / best['wall_s'] if best['wall_s'] else 0.0
+        results[name] = best
+    return results
+
+def format_mb(value):
+    return '-' if value is None else f"{value / (1 << 20):.1f}"
+
+def print_results(results):
+    print(f"{'parser':<18}{'log MB':>9}{'records':>11}{'wall s':>9}{'records/s':>12}{'MB/s':>8}{'peak RSS MB':>13}")
+    for name, result in results.items():
+        mb_per_s = result['log_bytes'] / (1 << 20) / result['wall_s'] if result['wall_s'] else 0.0
+        print(f"{name:<18}{format_mb(result['log_bytes']):>9}{result['records']:>11}{result['wall_s']:>9.2f}"
+              f"{result['records_per_s']:>12.0f}{mb_per_s:>8.1f}{format_mb(result['peak_rss']):>13}")
+
+def compare(results, baseline, threshold):
+    """Print the change against a saved run, return the list of regressions beyond threshold percent"""
+    regressions = []
+    print(f"\n{'parser':<18}{'wall':>10}{'records/s':>12}{'peak RSS':>11}   (vs. baseline)")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            print(f"{name:<18}  not in the baseline")
+            continue
+        if before['records'] != result['records']:
+            regressions.append(f"{name}: {result['records']} records, baseline had {before['records']}")
+        changes = {}
+        for key in ('wall_s', 'records_per_s', 'peak_rss'):
+            if result.get(key) is None or not before.get(key):
+                changes[key] = None
+                continue
+            changes[key] = (result[key] - before[key]) / before[key] * 100
+        print(f"{name:<18}" + ''.join('          -' if changes[key] is None else f"{changes[key]:>+10.1f}%"
+                                      for key in ('wall_s', 'records_per_s', 'peak_rss')))
+        if changes['wall_s'] is not None and changes['wall_s'] > threshold:
+            regressions.append(f"{name}: {changes['wall_s']:+.1f}% wall time")
+        if changes['peak_rss'] is not None and changes['peak_rss'] > threshold:
+            regressions.append(f"{name}: {changes['peak_rss']:+.1f}% peak RSS")
+    return regressions
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--worker']:
+        print(json.dumps(run_parser(*argv[1:4])))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Measure records/s, wall time and peak RSS of the log parsers")
+    parser.add_argument('folder', help="folder with lte_log.txt, iperf3_log.txt and nping_log.txt (see generate_logs.py)")
+    parser.add_argument('--module', default=DEFAULT_MODULE,
+                        help="all_data_extract.py to benchmark, e.g. a copy from an older build (default: the one next to this script)")
+    parser.add_argument('--parsers', nargs='+', choices=list(PARSERS), default=list(PARSERS),
+                        help="parsers to run (default all)")
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="read the compressed logs (lte_log.txt.gz, ...) instead; log MB and MB/s are then on disk")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per parser, the fastest one is reported (default 1)")
+    parser.add_argument('--save', metavar='JSON', help="write the results to this file, to compare later runs against")
+    parser.add_argument('--compare', metavar='JSON', help="compare with the results saved by an earlier --save")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="percent of extra wall time or peak RSS counted as a regression (default 10)")
+    args = parser.parse_args(argv)
+
+    module_path = os.path.abspath(args.module)
+    print(f"Benchmarking {module_path} on {args.folder}")
+    results = benchmark(args.folder, module_path, args.parsers, max(args.repeat, 1), args.compress)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'module': module_path, 'folder': os.path.abspath(args.folder),
+                       'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Regressions against " + args.compare + ":")
+            for regression in regressions:
+                print(f"  • {regression}")
+            return 1
+        print(f"\n✅ No regression beyond {args.threshold:g}% against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import os
+import re
+import gzip
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# Synthetic lte_log.txt / iperf3_log.txt / nping_log.txt in the format the loggers write,
+# used to benchmark the extractors on logs much larger than the ones under "Data Set"
+
+MONTH_ABBR = ('', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Launch point of the flights under "Data Set" (Lawrence, KS) and the UTC offset of the logging laptop
+HOME_LAT = 38.9158
+HOME_LON = -95.3179
+LOCAL_OFFSET = timedelta(hours=-5)
+
+# Cells seen around the launch point: (PCI, EARFCN, cell id, LAC)
+CELLS = [
+    (78, 5230, 0x34CBE01, 0xD806),
+    (79, 5230, 0x34CBE02, 0xD806),
+    (203, 5230, 0x34CC520, 0xD806),
+    (386, 5230, 0x34C4E1E, 0xD806),
+    (98, 2300, 0x34C9A0B, 0xD807),
+]
+
+# Blocks generated between two writes
+CHUNK_BLOCKS = 2000
+
+# --compress: suffix of the compressed logs, as the loggers write them
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+
+def parse_size(text):
+    """'10MB', '5GB', '750KB' or a plain byte count"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMG]?B?)\s*', text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+def log_stamp(moment):
+    """Local time as the loggers print it (2025/Mar/18 11:25:25)"""
+    return f"{moment.year}/{MONTH_ABBR[moment.month]}/{moment.day:02d} {moment:%H:%M:%S}"
+
+def nmea(sentence):
+    """Add the NMEA checksum to a sentence body"""
+    checksum = 0
+    for char in sentence:
+        checksum ^= ord(char)
+    return f"${sentence}*{checksum:02X}"
+
+def nmea_coordinate(value, degree_digits, positive, negative):
+    value_abs = abs(value)
+    degrees = int(value_abs)
+    minutes = (value_abs - degrees) * 60
+    return f"{degrees:0{degree_digits}d}{minutes:09.6f}", positive if value >= 0 else negative
+
+class Flight:
+    """Random walk of the UAV position, altitude and serving cell"""
+
+    def __init__(self, rng, start):
+        self.rng = rng
+        self.clock = start
+        self.lat = HOME_LAT
+        self.lon = HOME_LON
+        self.altitude = 0.0
+        self.cell = 0
+
+    def step(self, seconds):
+        rng = self.rng
+        self.clock += timedelta(seconds=seconds)
+        self.lat += rng.uniform(-0.0002, 0.0002)
+        self.lon += rng.uniform(-0.0002, 0.0002)
+        self.altitude = min(max(self.altitude + rng.uniform(-15, 20), 0.0), 400.0)
+        if rng.random() < 0.03:
+            self.cell = rng.randrange(len(CELLS))
+
+def ran_block(flight, has_fix):
+    """One polling round of RAN_logging.py: NMEA, serving cell, neighbours and (sometimes) the modem info"""
+    rng = flight.rng
+    lines = ['UserDevice> AT+MGPSNMEA\r\n', '+MGPSNMEA:\r\n']
+    if has_fix:
+        utc = flight.clock - LOCAL_OFFSET
+        utc_time = f"{utc:%H%M%S}.00"
+        lat, lat_dir = nmea_coordinate(flight.lat, 2, 'N', 'S')
+        lon, lon_dir = nmea_coordinate(flight.lon, 3, 'E', 'W')
+        lines.append(' ' + nmea(f"GPGGA,{utc_time},{lat},{lat_dir},{lon},{lon_dir},1,07,0.7,"
+                                f"{flight.altitude + rng.uniform(0, 1):.1f},M,-32.0,M,,") + '\r\r\n')
+        lines.append(' ' + nmea(f"GPRMC,{utc_time},A,{lat},{lat_dir},{lon},{lon_dir},"
+                                f"{rng.uniform(0, 8):.1f},{rng.uniform(0, 360):.1f},{utc:%d%m%y},2.5,E,A,V") + '\r\r\n')
+    else:
+        lines.append(' $GPGGA,,,,,,0,,,,,,,,*66\r\r\n')
+        lines.append(' $GPRMC,,V,,,,,,,,,,N*53\r\r\n')
+    lines.append('OK\r\n')
+
+    pci, earfcn, cellid, lac = CELLS[flight.cell]
+    rsrp = rng.randint(-120, -70)
+    lines.append('UserDevice> AT+MMSVRCELL\r\n')
+    lines.append('+MMSRVCELL:\r\n')
+    lines.append(f' "servingcell","NOCONN","LTE","FDD",311,480,{cellid:X},{pci},{earfcn},13,3,3,{lac:X},'
+                 f'{rsrp},{rng.randint(-20, -5)},{rsrp + rng.randint(20, 35)},{rng.randint(-5, 25)},-\r\n')
+    lines.append('OK\r\n')
+
+    lines.append('UserDevice> AT+MMNEBCELL\r\n')
+    lines.append('+MMNEBCELL:\r\n')
+    neighbours = rng.sample(CELLS, rng.randint(0, len(CELLS)))
+    for index, (pci, earfcn, _, _) in enumerate(neighbours):
+        kind = 'intra' if earfcn == CELLS[flight.cell][1] else 'inter'
+        rsrp = rng.randint(-125, -75)
+        end = '\r\r\n' if index < len(neighbours) - 1 else '\r\n'
+        lines.append(f' "neighbourcell {kind}","LTE",{earfcn},{pci},{rng.randint(-20, -5)},{rsrp},'
+                     f'{rsrp + rng.randint(20, 35)},0,-,-,-,-,-{end}')
+    lines.append('OK\r\n')
+
+    if rng.random() < 0.1:
+        lines.append('UserDevice> AT+MSGMR\r\n+MSGMR:\r\n Hardware Version : 2.0\r\n'
+                     ' Software Version : v1.3.5 build 1018\r\n'
+                     ' Copyright        : 2020-2022 Microhard Systems Inc.\r\n'
+                     f" System Time      : {flight.clock:%a %b %d %H:%M:%S %Y}\r\nOK\r\n")
+    return ''.join(lines)
+
+def iperf_block(flight):
+    """One `iperf3 --bidir -t 1` run of throughput_logging.py, sometimes a failed one"""
+    rng = flight.rng
+    lines = [log_stamp(flight.clock) + '\n']
+    if rng.random() < 0.02:
+        lines.append('iperf3: error - unable to connect to server: Connection timed out\n')
+        return ''.join(lines)
+    port = rng.randint(40000, 60000)
+    ul = rng.uniform(0.5, 40)
+    dl = rng.uniform(0.5, 40)
+    lines.append('Connecting to host 129.237.161.212, port 5201\n'
+                 'Reverse mode, remote host 129.237.161.212 is sending\n'
+                 f'[  5] local 192.168.168.202 port {port} connected to 129.237.161.212 port 5201\n'
+                 '[ ID] Interval           Transfer     Bitrate         Retr  Cwnd\n'
+                 f'[  5]   0.00-1.00   sec   {dl * 122:.0f} KBytes  {dl:.2f} Mbits/sec                  \n'
+                 '- - - - - - - - - - - - - - - - - - - - - - - - -\n'
+                 '[ ID] Interval           Transfer     Bitrate         Retr\n'
+                 f'[  5][TX-C]   0.00-1.07   sec  {ul * 131:.0f} KBytes  {ul:.3g} Mbits/sec    0             sender\n'
+                 f'[  7][RX-C]   0.00-1.07   sec  {dl * 131:.0f} KBytes  {dl:.3g} Mbits/sec    0             sender\n'
+                 f'[  5]   0.00-1.00   sec   {dl * 122:.0f} KBytes  {dl:.2f} Mbits/sec                  receiver\n'
+                 '\n'
+                 'iperf Done.\n')
+    return ''.join(lines)
+
+def nping_block(flight):
+    """One single-probe nping run of Delay_logging.py, sometimes without an answer"""
+    rng = flight.rng
+    port = rng.randint(1024, 65535)
+    header = (f'Date and Time: {log_stamp(flight.clock)}\n'
+              f'://nmap.org/nping ) at {flight.clock:%Y-%m-%d %H:%M} CDT\n'
+              'comms\n'
+              f'SENT (0.0700s) TCP 192.168.168.202:{port} > 129.237.161.212:62 S ttl=64 '
+              f'id={rng.randint(0, 65535)} iplen=40  seq={rng.getrandbits(32)} win=1480 \n')
+    if rng.random() < 0.03:
+        return (header + ' \n'
+                'Max rtt: N/A | Min rtt: N/A | Avg rtt: N/A\n'
+                'Raw packets sent: 1 (40B) | Rcvd: 0 (0B) | Lost: 1 (100.00%)\n'
+                'Nping done: 1 IP address pinged in 1.07 seconds\n\n\n')
+    rtt = rng.lognormvariate(4.4, 0.5)
+    return (header +
+            f'RCVD ({0.07 + rtt / 1000:.4f}s) TCP 129.237.161.212:62 > 192.168.168.202:{port} SA ttl=45 '
+            f'id=0 iplen=44  seq={rng.getrandbits(32)} win=64240 <mss 1368>\n'
+            ' \n'
+            f'Max rtt: {rtt:.3f}ms | Min rtt: {rtt:.3f}ms | Avg rtt: {rtt:.3f}ms\n'
+            'Raw packets sent: 1 (40B) | Rcvd: 1 (46B) | Lost: 0 (0.00%)\n'
+            'Nping done: 1 IP address pinged in 1.11 seconds\n\n\n')
+
+def ran_blocks(flight):
+    # No GPS fix during the first minutes on the ground, and a few drop-outs in the air
+    blocks = 0
+    while True:
+        has_fix = blocks >= 20 and flight.rng.random() > 0.02
+        yield ran_block(flight, has_fix)
+        flight.step(3)
+        blocks += 1
+
+def iperf_blocks(flight):
+    while True:
+        yield iperf_block(flight)
+        flight.step(flight.rng.choice((2, 3, 5)))
+
+def nping_blocks(flight):
+    while True:
+        yield nping_block(flight)
+        flight.step(flight.rng.choice((1, 1, 2)))
+
+# log file, block generator
+LOGS = {
+    'ran': ('lte_log.txt', ran_blocks),
+    'throughput': ('iperf3_log.txt', iperf_blocks),
+    'delay': ('nping_log.txt', nping_blocks),
+}
+
+def open_log(filename, compress=None):
+    if compress == 'gzip':
+        return gzip.open(filename, 'wt', newline='', encoding='ascii')
+    if compress == 'zstd':
+        import zstandard
+        return zstandard.open(filename, 'wt', newline='', encoding='ascii')
+    return open(filename, 'w', newline='', encoding='ascii')
+
+def write_log(filename, blocks, size, compress=None):
+    """Write whole blocks until the log holds size bytes of text, return the bytes written"""
+    written = 0
+    with open_log(filename, compress) as f:
+        while written < size:
+            chunk = []
+            for block in blocks:
+                chunk.append(block)
+                written += len(block)
+                if written >= size or len(chunk) == CHUNK_BLOCKS:
+                    break
+            f.write(''.join(chunk))
+    return written
+
+def generate(folder, size, kinds, seed=0, start=None, compress=None):
+    """Write the synthetic logs of the given kinds into folder (lte_log.txt.gz, ... with compress)"""
+    os.makedirs(folder, exist_ok=True)
+    start = start or datetime(2025, 3, 18, 11, 25, 0)
+    for kind in kinds:
+        filename, make_blocks = LOGS[kind]
+        path = os.path.join(folder, filename + (COMPRESSIONS[compress] if compress else ''))
+        # one seed per kind, so a log does not change when the others are left out
+        flight = Flight(random.Random(f"{seed}:{kind}"), start)
+        written = write_log(path, make_blocks(flight), size, compress)
+        print(f"✅ {path}: {written / (1 << 20):.1f} MB of text, {os.path.getsize(path) / (1 << 20):.1f} MB on disk")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic RAN, iperf3 and nping logs for benchmarking the extractors")
+    parser.add_argument('folder', help="folder to write lte_log.txt, iperf3_log.txt and nping_log.txt into")
+    parser.add_argument('--size', type=parse_size, default=parse_size('10MB'),
+                        help="size of each log, e.g. 10MB or 5GB (default 10MB)")
+    parser.add_argument('--kinds', nargs='+', choices=list(LOGS), default=list(LOGS),
+                        help="which logs to write (default all)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed, the same seed writes the same logs")
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default=None,
+                        help="write the logs gzip or zstd compressed, like the loggers do with --compress")
+    args = parser.parse_args(argv)
+    generate(args.folder, args.size, args.kinds, args.seed, compress=args.compress)
+
+if __name__ == "__main__":
+    main()
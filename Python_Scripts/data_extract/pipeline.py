@@ -0,0 +1,299 @@
+import os
+import re
+import json
+import time
+import hashlib
+import contextlib
+import cProfile
+import pstats
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+# Shared by the pipeline stages all_data_extract.py, all_stat_result.py and RAN_Map.py:
+# the build manifest that lets a stage skip work whose inputs did not change,
+# the typed tables the extraction hands to the charts and maps, and the
+# timers and counters every stage reports.
+# In the WebGUI folder this file sits next to the three scripts.
+
+# ---- build manifest ----
+
+MANIFEST_FILE = '.pipeline_manifest.json'
+
+class Manifest:
+    """Content hashes of the inputs, parameters and outputs of each pipeline stage
+
+    Shared through .pipeline_manifest.json by all_data_extract.py,
+    all_stat_result.py and RAN_Map.py (the WebGUI server reads it too). A stage
+    whose inputs, parameters and outputs still hash to what was recorded after
+    its last run is skipped. The outputs of one stage are the inputs of the
+    next (logs -> *_data.txt -> charts and maps), so a change rebuilds exactly
+    the stages downstream of it. Files whose size and mtime did not change are
+    not hashed again.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        try:
+            with open(path) as infile:
+                self.data = json.load(infile)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault('stages', {})
+        self.data.setdefault('scripts', {})
+        self.data.setdefault('listings', {})
+        self._touched = []
+
+    def _recorded(self, path):
+        for entry in self.data['stages'].values():
+            for files in (entry['inputs'], entry['outputs']):
+                if files.get(path):
+                    return files[path]
+        return None
+
+    def digest(self, path):
+        """{'size', 'mtime_ns', 'sha256'} of a file, or None if it does not exist"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self._recorded(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known
+        sha = hashlib.sha256()
+        with open(path, 'rb') as infile:
+            for block in iter(lambda: infile.read(1 << 20), b''):
+                sha.update(block)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha.hexdigest()}
+
+    def _same(self, files):
+        for path, recorded in files.items():
+            current = self.digest(path)
+            if (current is None) != (recorded is None):
+                return False
+            if current is not None and current['sha256'] != recorded['sha256']:
+                return False
+        return True
+
+    def is_fresh(self, stage, inputs, params):
+        """True if the stage already ran on these inputs and parameters and its outputs are intact"""
+        entry = self.data['stages'].get(stage)
+        if (entry is None or entry['params'] != params or sorted(entry['inputs']) != sorted(inputs)
+                or not self._same(entry['inputs']) or not self._same(entry['outputs'])):
+            return False
+        self._touched.append(stage)
+        return True
+
+    def record(self, stage, inputs, params, outputs):
+        """Remember what a stage was built from and which files it produced"""
+        self.data['stages'][stage] = {
+            'inputs': {path: self.digest(path) for path in inputs},
+            'params': params,
+            'outputs': {path: self.digest(path) for path in outputs if os.path.exists(path)},
+        }
+        self._touched.append(stage)
+
+    def save(self, script, watch=None):
+        """Store the manifest, plus the size/mtime of every file the script used for the WebGUI
+
+        watch is a regex of the file names the script picks its inputs from. The
+        names matching it are stored as well, so the WebGUI also notices a log
+        that appeared (or went away) since the last run.
+        """
+        files = {script: self.digest(script), __file__: self.digest(__file__)}
+        for stage in self._touched:
+            entry = self.data['stages'][stage]
+            files.update(entry['inputs'])
+            files.update(entry['outputs'])
+        name = os.path.basename(script)
+        self.data['scripts'][name] = {
+            path: None if info is None else [info['size'], info['mtime_ns']] for path, info in files.items()}
+        if watch:
+            self.data['listings'][name] = {'pattern': watch, 'names': listing(watch)}
+        else:
+            self.data['listings'].pop(name, None)
+        with open(self.path + '.tmp', 'w') as outfile:
+            json.dump(self.data, outfile, indent=1)
+        os.replace(self.path + '.tmp', self.path)
+
+def listing(pattern, folder='.'):
+    """Sorted names of the files in folder that match the regex pattern"""
+    return sorted(name for name in os.listdir(folder) if re.match(pattern, name))
+
+def script_params(script, **params):
+    """Stage parameters, including a hash of the stage script and of this file so code changes rebuild too"""
+    sha = hashlib.sha256()
+    for path in (script, __file__):
+        with open(path, 'rb') as infile:
+            sha.update(infile.read())
+    params['script'] = sha.hexdigest()
+    return params
+
+# ---- typed tables ----
+
+# Schemas of the typed .npy tables written next to the CSV files by --columnar.
+# Missing or unparsable values are NaN (NaT for timestamps), so rows always
+# have the same columns, unlike the ragged CSV rows.
+NB_CAPACITY = 10
+
+THROUGHPUT_DTYPE = np.dtype([
+    ('Timestamp', 'M8[s]'), ('Date', 'U11'), ('Time', 'U8'), ('UL', 'f8'), ('DL', 'f8'),
+])
+
+DELAY_DTYPE = np.dtype([
+    ('Timestamp', 'M8[s]'), ('Date', 'U11'), ('Time', 'U8'),
+    ('Max_RTT_ms', 'f8'), ('Sent_Packets', 'i4'), ('Received_Packets', 'i4'),
+])
+
+# One RAN sample per $GPGGA fix (about 250 bytes). Integer fields cannot hold
+# NaN, so validity comes from masks: latitude/longitude/Timestamp are valid
+# where has_fix, the serving cell fields where has_serving, and neighbour slot
+# i where i < NB_count. Neighbours are fixed-capacity subarrays, e.g.
+# samples['NB_RSRP'][:, 0] is the first neighbour of every sample.
+RAN_DTYPE = np.dtype([
+    ('Timestamp', 'M8[s]'), ('latitude', 'f8'), ('longitude', 'f8'), ('Altitude', 'f4'),
+    ('MCC', 'u2'), ('MNC', 'u2'), ('PCI', 'u2'), ('EARFCN', 'u4'), ('CellID', 'f8'), ('LAC', 'u2'),
+    ('RSRP', 'f4'), ('RSRQ', 'f4'), ('RSSI', 'f4'), ('SINR', 'f4'),
+    ('has_fix', '?'), ('has_serving', '?'), ('NB_count', 'u1'),
+    ('NB_EARFCN', 'u4', (NB_CAPACITY,)), ('NB_PCI', 'u2', (NB_CAPACITY,)),
+    ('NB_RSRQ', 'f4', (NB_CAPACITY,)), ('NB_RSRP', 'f4', (NB_CAPACITY,)), ('NB_RSSI', 'f4', (NB_CAPACITY,)),
+])
+
+def columnar_path(csv_path):
+    """lte_data.txt -> lte_data.npy"""
+    return os.path.splitext(csv_path)[0] + '.npy'
+
+def load_columns(csv_file):
+    """Open the typed .npy table that all_data_extract.py --columnar writes next to csv_file
+
+    Returns a read-only memory-mapped structured array, whose fields are zero-copy
+    column views, or None when there is no table or it is older than the CSV file.
+    """
+    npy_file = columnar_path(csv_file)
+    if not os.path.exists(npy_file):
+        return None
+    if os.path.exists(csv_file) and os.path.getmtime(npy_file) < os.path.getmtime(csv_file):
+        return None
+    return np.load(npy_file, mmap_mode='r')
+
+# ---- instrumentation ----
+
+# Functions and allocation sites listed in the report with --profile / --trace-memory
+REPORT_TOP = 15
+
+class Instruments:
+    """Timers and counters of one run of a script, written as a JSON report next to its outputs
+
+    Work is grouped in stages (`with INSTRUMENTS.stage('extract:ran'):`). Inside
+    the running stage, timer() adds up the time of repeated steps, lap() the time
+    since the previous lap, and count() adds to a named counter, so the parsers
+    and charts can report what they did without passing anything around.
+    add_time() and count() take stage= to add to another stage, e.g. the
+    timers a worker process sends back.
+    """
+
+    def __init__(self, script):
+        self.script = os.path.basename(script)
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self._current = None
+        self._mark = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'timers': {}, 'counters': {}})
+        outer = self._current, self._mark
+        self._current = entry
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = self._mark = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] += time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                entry['peak_traced_bytes'] = max(entry.get('peak_traced_bytes', 0),
+                                                 tracemalloc.get_traced_memory()[1])
+            self._current, self._mark = outer
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def lap(self, name):
+        now = time.perf_counter()
+        if self._mark is not None:
+            self.add_time(name, now - self._mark)
+        self._mark = now
+
+    def _entry(self, stage):
+        if stage is None:
+            return self._current
+        return self.stages.setdefault(stage, {'seconds': 0.0, 'timers': {}, 'counters': {}})
+
+    def add_time(self, name, seconds, stage=None):
+        """Add to a timer of the running stage, or of the named one"""
+        entry = self._entry(stage)
+        if entry is not None:
+            entry['timers'][name] = entry['timers'].get(name, 0.0) + seconds
+
+    def count(self, name, amount=1, stage=None):
+        entry = self._entry(stage)
+        if entry is not None:
+            entry['counters'][name] = entry['counters'].get(name, 0) + amount
+
+    def report(self, path, **extra):
+        """Write the stages (and anything in extra) as JSON"""
+        report = {
+            'script': self.script,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': sum(entry['seconds'] for entry in self.stages.values()),
+            'stages': self.stages,
+        }
+        report.update(extra)
+        with open(path, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+
+def profile_summary(profiler, path):
+    """Dump the cProfile data to path and return the top functions by cumulative time"""
+    profiler.dump_stats(path)
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({function})",
+                     'calls': calls, 'own_seconds': own, 'cumulative_seconds': cumulative})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:REPORT_TOP]
+
+def memory_summary(snapshot):
+    """Top allocation sites still alive in a tracemalloc snapshot"""
+    return [{'site': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+            for stat in snapshot.statistics('lineno')[:REPORT_TOP]]
+
+@contextlib.contextmanager
+def diagnostics(instruments, profile_file, profile=False, trace_memory=False):
+    """Optionally run the body under cProfile and/or tracemalloc; yields the extra report sections"""
+    extra = {}
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield extra
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            extra['profile'] = profile_summary(profiler, profile_file)
+        if trace_memory:
+            # every stage resets the peak, so the run's peak is the largest stage peak
+            peaks = [entry.get('peak_traced_bytes', 0) for entry in instruments.stages.values()]
+            extra['memory'] = {'peak_traced_bytes': max(peaks + [tracemalloc.get_traced_memory()[1]]),
+                               'top_allocations': memory_summary(tracemalloc.take_snapshot())}
+            tracemalloc.stop()
@@ -1,50 +1,310 @@
 import os
+import sys
+import json
+import argparse
+import numpy as np
 import pandas as pd
-import geopandas as gpd
+import plotly
 import plotly.graph_objects as go
 import folium
 import branca
+from folium.map import Layer
+from jinja2 import Template
 
-# Define the main output folder
-main_output_folder = "spatiotemporal maps results"
-os.makedirs(main_output_folder, exist_ok=True)
+# pipeline.py is next to this script in the WebGUI folder, in ../data_extract in the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_extract'))
+from pipeline import Manifest, script_params, load_columns
 
-# Define the subfolder for individual metric HTML files
-output_subfolder = os.path.join(main_output_folder, "output")
-os.makedirs(output_subfolder, exist_ok=True)
+# ---- spatial binning ----
 
-# Load LTE data
-df = pd.read_csv('lte_data.txt')
+# Shapes of the coverage cells
+CELL_SHAPES = ('hex', 'square')
+# Cell widths in metres, finest first
+CELL_SIZES = (10, 25, 50)
+# Height of an altitude band in metres
+BAND_HEIGHT = 30
+# Percentiles kept per cell next to the mean and the sample count
+PERCENTILES = (10, 50, 90)
 
-# Drop rows missing any of the required fields
-required_columns = ['Altitude', 'longitude', 'latitude', 'CellID', 'RSRP', 'RSRQ', 'SINR', 'RSSI']
-df.dropna(subset=required_columns, inplace=True)
+def metres_per_degree(lat0):
+    """Metres per degree of latitude and of longitude around lat0, close enough for a flight area"""
+    return 110540.0, 111320.0 * np.cos(np.radians(lat0))
 
-# Ensure 'longitude' and 'latitude' columns exist for GeoDataFrame
-gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.longitude, df.latitude))
+def to_metres(df):
+    """East, north and up offsets in metres from the first sample"""
+    lat0, lon0 = df['latitude'].iloc[0], df['longitude'].iloc[0]
+    per_lat, per_lon = metres_per_degree(lat0)
+    east = (df['longitude'].to_numpy() - lon0) * per_lon
+    north = (df['latitude'].to_numpy() - lat0) * per_lat
+    return np.column_stack((east, north, df['Altitude'].to_numpy(float)))
 
-metrics = [
-    ('RSRP', 'RSRP (dBm)'),
-    ('RSRQ', 'RSRQ (dB)'),
-    ('RSSI', 'RSSI (dBm)'),
-    ('SINR', 'SINR (dB)')
-]
+def cell_of(east, north, size, shape):
+    """Integer coordinates of the cell of every point and the centres of those cells, in metres
 
-plot_files = []
-map_files = []
+    Hex cells are pointy-top hexagons size metres wide (axial coordinates,
+    rounded through cube coordinates), square cells are size x size metres.
+    """
+    if shape == 'square':
+        i, j = np.floor(east / size), np.floor(north / size)
+        return i.astype(np.int64), j.astype(np.int64), (i + 0.5) * size, (j + 0.5) * size
+    radius = size / np.sqrt(3)
+    q = (np.sqrt(3) / 3 * east - north / 3) / radius
+    r = (2 / 3 * north) / radius
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return (rq.astype(np.int64), rr.astype(np.int64),
+            radius * np.sqrt(3) * (rq + rr / 2), radius * 1.5 * rr)
 
-for metric, label in metrics:
-    values = df[metric]
+def group_percentiles(groups, counts, values, percentiles):
+    """Linear percentiles of values within every group, like np.percentile of each group on its own"""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = {}
+    for p in percentiles:
+        position = starts + p / 100 * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[p] = ordered[low] + (position - low) * (ordered[high] - ordered[low])
+    return result
 
-    # --- 3D Plotly Map ---
-    fig = go.Figure(data=go.Scatter3d(
-        x=df['longitude'],
-        y=df['latitude'],
-        z=df['Altitude'],
+def bin_samples(df, metrics, size, shape='hex', band_height=None):
+    """Samples aggregated into map cells (and altitude bands): count, mean and percentiles per metric
+
+    Every row of the result is one occupied cell (of one band) with the
+    latitude/longitude of its centre, the number of samples and, for every
+    metric, <metric>_mean and <metric>_p<percentile>. Its size depends on the
+    area flown, not on the number of samples.
+    """
+    xyz = to_metres(df)
+    i, j, centre_east, centre_north = cell_of(xyz[:, 0], xyz[:, 1], size, shape)
+    band = (np.floor(xyz[:, 2] / band_height).astype(np.int64) if band_height
+            else np.zeros(len(df), np.int64))
+    keys, first, cell, counts = np.unique(np.column_stack((band, i, j)), axis=0, return_index=True,
+                                          return_inverse=True, return_counts=True)
+    cell = cell.ravel()
+    lat0, lon0 = df['latitude'].iloc[0], df['longitude'].iloc[0]
+    per_lat, per_lon = metres_per_degree(lat0)
+    cells = pd.DataFrame({
+        'shape': shape,
+        'cell_m': size,
+        'altitude_from': keys[:, 0] * band_height if band_height else np.nan,
+        'altitude_to': (keys[:, 0] + 1) * band_height if band_height else np.nan,
+        'latitude': lat0 + centre_north[first] / per_lat,
+        'longitude': lon0 + centre_east[first] / per_lon,
+        'samples': counts,
+    })
+    for metric in metrics:
+        values = df[metric].to_numpy(float)
+        cells[f'{metric}_mean'] = np.bincount(cell, weights=values) / counts
+        for p, column in group_percentiles(cell, counts, values, PERCENTILES).items():
+            cells[f'{metric}_p{p}'] = column
+    return cells
+
+# ---- 2D map layers ----
+
+# Linear interpolation between the stops of a branca colormap, done in the browser
+COLOUR_JS = """
+            function colour(v, stops, colours) {
+                var i = 1;
+                while (i < stops.length - 1 && v > stops[i]) { i++; }
+                var t = Math.min(Math.max((v - stops[i - 1]) / ((stops[i] - stops[i - 1]) || 1), 0), 1);
+                var rgb = [0, 1, 2].map(function(k) {
+                    return Math.round(255 * (colours[i - 1][k] + t * (colours[i][k] - colours[i - 1][k])));
+                });
+                return 'rgb(' + rgb.join(',') + ')';
+            }
+"""
+
+def to_js(data):
+    return json.dumps(data, separators=(',', ':'))
+
+def deltas(column, scale):
+    """A column as differences of integers (column * scale), a few characters a sample for a smooth track"""
+    return np.diff(np.round(np.asarray(column, float) * scale).astype(np.int64), prepend=0).tolist()
+
+def sample_table(df, metrics, altitude=False):
+    """The samples for SampleLayer: delta-encoded microdegrees and hundredths of every metric"""
+    table = {'lat': deltas(df['latitude'], 1e6), 'lon': deltas(df['longitude'], 1e6)}
+    if altitude:
+        table['alt'] = deltas(df['Altitude'], 100)
+    for metric in metrics:
+        table[metric] = {'value': deltas(df[metric], 100)}
+    return table
+
+def cell_table(cells, metrics):
+    """The cells of bin_samples() for CellLayer: centres in microdegrees and the statistics of every metric"""
+    per_lat, per_lon = metres_per_degree(cells['latitude'].mean()) if len(cells) else (1.0, 1.0)
+    table = {
+        'shape': cells['shape'].iloc[0] if len(cells) else 'hex',
+        'size': float(cells['cell_m'].iloc[0]) if len(cells) else 0.0,
+        'per_lat': per_lat,
+        'per_lon': float(per_lon),
+        'lat': np.round(cells['latitude'].to_numpy() * 1e6).astype(np.int64).tolist(),
+        'lon': np.round(cells['longitude'].to_numpy() * 1e6).astype(np.int64).tolist(),
+        'samples': cells['samples'].tolist(),
+    }
+    for metric in metrics:
+        table[metric] = {
+            'mean': np.round(cells[f'{metric}_mean'].to_numpy(), 2).tolist(),
+            'stats': np.round(cells[[f'{metric}_p{p}' for p in PERCENTILES]].to_numpy(), 2).tolist(),
+        }
+    return table
+
+class TableLayer(Layer):
+    """A map layer drawn in the browser from a table of columns shared by all metrics
+
+    table is the JavaScript of the table: a JSON literal written into the
+    layer, or in a bundle (--bundle) the name of a table written once for
+    all the maps of the page. The layer reads the columns of the table plus
+    those of its metric (table[metric]) and the colormap stops.
+    """
+
+    def __init__(self, table, metric, colormap, name, show=True):
+        super().__init__(name=name, overlay=True, show=show)
+        self.table = table
+        self.options = to_js({'metric': metric, 'percentiles': list(PERCENTILES),
+                              'index': [float(v) for v in colormap.index],
+                              'colours': [list(c[:3]) for c in colormap.colors]})
+
+class SampleLayer(TableLayer):
+    """All samples of one metric as a single canvas layer, coloured in the browser
+
+    Instead of one folium.CircleMarker (and its own block of JavaScript) per
+    sample, the coordinates and values are written once as delta-encoded
+    integer arrays (sample_table()) and the markers are drawn by Leaflet on
+    one shared canvas, coloured with the stops of the branca colormap shown
+    as the legend. The map file then grows by a few bytes per sample and
+    opens quickly even for a long flight.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.featureGroup();
+        (function(layer, table, options) {
+            var data = Object.assign({}, table, table[options.metric], options);
+""" + COLOUR_JS + """
+            function tooltip(marker) {
+                return data.metric + ': ' + marker.options.value.toFixed(2);
+            }
+            // the markers are made when the layer is first shown
+            layer.once('add', function() {
+                var renderer = L.canvas({padding: 0.5});
+                var lat = 0, lon = 0, value = 0;
+                for (var i = 0; i < data.lat.length; i++) {
+                    lat += data.lat[i];
+                    lon += data.lon[i];
+                    value += data.value[i];
+                    var v = value / 100, c = colour(v, data.index, data.colours);
+                    L.circleMarker([lat / 1e6, lon / 1e6], {
+                        renderer: renderer, radius: 4, color: c, fillColor: c, fillOpacity: 1.0, value: v
+                    }).bindTooltip(tooltip).addTo(layer);
+                }
+            });
+        })({{ this.get_name() }}, {{ this.table }}, {{ this.options }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, df, metric, colormap, name='Samples', show=True, table=None):
+        super().__init__(table or to_js(sample_table(df, [metric])), metric, colormap, name, show)
+        self._name = 'SampleLayer'
+
+class CellLayer(TableLayer):
+    """The cells of bin_samples() for one metric as hexagons or squares on one canvas, coloured by their mean
+
+    Only the cell centres and statistics are written (cell_table()); the
+    outline of each cell is computed in the browser from its centre, shape and size.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.featureGroup();
+        (function(layer, table, options) {
+            var data = Object.assign({}, table, table[options.metric], options);
+""" + COLOUR_JS + """
+            var corners = [];
+            for (var k = 0; k < (data.shape == 'hex' ? 6 : 4); k++) {
+                var a = data.shape == 'hex' ? Math.PI / 180 * (60 * k - 30) : Math.PI / 180 * (90 * k + 45);
+                var r = data.shape == 'hex' ? data.size / Math.sqrt(3) : data.size / Math.SQRT2;
+                corners.push([r * Math.sin(a) / data.per_lat, r * Math.cos(a) / data.per_lon]);
+            }
+            function tooltip(cell) {
+                var o = cell.options;
+                return data.metric + ' mean ' + o.mean.toFixed(2) + ' (' + data.percentiles.map(function(p, n) {
+                    return 'p' + p + ' ' + o.stats[n].toFixed(2);
+                }).join(', ') + '), ' + o.samples + ' samples';
+            }
+            layer.once('add', function() {
+                var renderer = L.canvas({padding: 0.5});
+                for (var i = 0; i < data.lat.length; i++) {
+                    var lat = data.lat[i] / 1e6, lon = data.lon[i] / 1e6, c = colour(data.mean[i], data.index, data.colours);
+                    L.polygon(corners.map(function(d) { return [lat + d[0], lon + d[1]]; }), {
+                        renderer: renderer, stroke: false, fillColor: c, fillOpacity: 0.8,
+                        mean: data.mean[i], stats: data.stats[i], samples: data.samples[i]
+                    }).bindTooltip(tooltip).addTo(layer);
+                }
+            });
+        })({{ this.get_name() }}, {{ this.table }}, {{ this.options }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, cells, metric, colormap, name, show=True, table=None):
+        super().__init__(table or to_js(cell_table(cells, [metric])), metric, colormap, name, show)
+        self._name = 'CellLayer'
+
+# ---- 3D level of detail ----
+
+# Points drawn by default in a 3D view, the flight is averaged into voxels above that
+POINT_BUDGET = 5000
+# Coarser views offered next to the default one, as fractions of the budget
+COARSER_LEVELS = (4, 16)
+
+def voxel_keys(xyz, size):
+    cells = np.floor((xyz - xyz.min(axis=0)) / size).astype(np.int64)
+    spans = cells.max(axis=0) + 1
+    return (cells[:, 0] * spans[1] + cells[:, 1]) * spans[2] + cells[:, 2]
+
+def voxel_average(df, metrics, budget):
+    """The samples averaged into cubic voxels, sized so that at most budget of them are occupied
+
+    Returns longitude, latitude, Altitude, the mean of every metric and the
+    number of samples of every occupied voxel. Voxels follow the flight in 3D,
+    so a climb over one spot keeps its altitude profile while a hover is merged
+    into one point. The voxels depend on the positions only, so all metrics share them.
+    """
+    if len(df) <= budget:
+        return df[['longitude', 'latitude', 'Altitude'] + metrics].assign(samples=1)
+    xyz = to_metres(df)
+    # bisect the voxel edge (in metres) on a log scale for the finest grid within the budget
+    low, high = 1e-3, float(np.ptp(xyz, axis=0).max()) + 1.0
+    for _ in range(30):
+        size = np.sqrt(low * high)
+        if len(np.unique(voxel_keys(xyz, size))) > budget:
+            low = size
+        else:
+            high = size
+    _, voxel, counts = np.unique(voxel_keys(xyz, high), return_inverse=True, return_counts=True)
+
+    def mean(column):
+        return np.bincount(voxel, weights=df[column].to_numpy(float)) / counts
+
+    return pd.DataFrame({column: mean(column) for column in ['longitude', 'latitude', 'Altitude'] + metrics}
+                        ).assign(samples=counts)
+
+def scatter3d(points, metric, label, cmin, cmax, **kwargs):
+    return go.Scatter3d(
+        x=points['longitude'],
+        y=points['latitude'],
+        z=points['Altitude'],
         mode='markers',
         marker=dict(
             size=4,
-            color=values,
+            color=points[metric],
             colorscale='RdYlGn',
             colorbar=dict(
                 title=label,
@@ -53,14 +313,19 @@ for metric, label in metrics:
                 y=0.5,
                 ticks="outside"
             ),
-            cmin=values.min(),
-            cmax=values.max()
+            cmin=cmin,
+            cmax=cmax
         ),
-        text=[f"{metric}: {v:.2f}" for v in values],
-        hoverinfo='text'
-    ))
+        customdata=points['samples'] if 'samples' in points else None,
+        # hover text is formatted by plotly in the browser instead of a Python string per marker
+        hovertemplate=(f"{metric}: %{{marker.color:.2f}}" + ("<br>%{customdata} samples" if 'samples' in points else "")
+                       + "<extra></extra>"),
+        **kwargs
+    )
+
+def layout_3d(fig, title):
     fig.update_layout(
-        title=f"{label} - 3D Scatter",
+        title=title,
         margin=dict(l=0, r=0, b=0, t=40),
         scene=dict(
             xaxis_title='Longitude',
@@ -68,9 +333,238 @@ for metric, label in metrics:
             zaxis_title='Altitude'
         )
     )
-    plot_file = os.path.join(output_subfolder, f"{metric.lower()}_3d.html")
-    fig.write_html(plot_file)
-    plot_files.append(plot_file)
+
+def figure_3d(views, metric, label, cmin, cmax, title):
+    """3D scatter of one metric with one trace per (button label, points) view, buttons to switch between them"""
+    fig = go.Figure(data=[scatter3d(points, metric, label, cmin, cmax, visible=(n == 0))
+                          for n, (_, points) in enumerate(views)])
+    layout_3d(fig, title)
+    if len(views) > 1:
+        fig.update_layout(updatemenus=[dict(
+            type='buttons', direction='right', x=0, y=1, xanchor='left', yanchor='top',
+            buttons=[dict(label=name, method='restyle', args=[{'visible': [n == shown for n in range(len(views))]}])
+                     for shown, (name, _) in enumerate(views)],
+        )])
+    return fig
+
+# ---- single-file bundle ----
+
+# The JavaScript of every 3D view (plotly.js) and 2D map (Leaflet, branca) is written into the page
+# once, and every table of samples, voxels and cells once for all four metrics, in a global RAN
+# object the views read from.
+
+BUNDLE_JS = """
+    function undelta(values, scale) {
+        var out = new Float64Array(values.length), sum = 0;
+        for (var i = 0; i < values.length; i++) { sum += values[i]; out[i] = sum / scale; }
+        return out;
+    }
+    // every sample in plain numbers for the full resolution 3D view
+    RAN.full = {lat: undelta(RAN.samples.lat, 1e6), lon: undelta(RAN.samples.lon, 1e6),
+                alt: undelta(RAN.samples.alt, 100)};
+    RAN.metrics.forEach(function(metric) { RAN.full[metric] = undelta(RAN.samples[metric].value, 100); });
+"""
+
+def level_table(points, metrics):
+    """The voxels of voxel_average() as plain columns for the 3D views of a bundle"""
+    table = {'lon': np.round(points['longitude'].to_numpy(float), 7).tolist(),
+             'lat': np.round(points['latitude'].to_numpy(float), 7).tolist(),
+             'alt': np.round(points['Altitude'].to_numpy(float), 2).tolist(),
+             'samples': points['samples'].tolist()}
+    for metric in metrics:
+        table[metric] = np.round(points[metric].to_numpy(float), 2).tolist()
+    return table
+
+def plot_script(fig, div_id, sources, metric):
+    """JavaScript drawing a figure_3d() in div_id with the points of its traces taken from the RAN tables"""
+    figure = fig.to_plotly_json()
+    for trace in figure['data']:
+        for key in ('x', 'y', 'z', 'customdata'):
+            trace.pop(key, None)
+        trace['marker'].pop('color', None)
+    return f"""
+    (function(figure, sources) {{
+        figure.data.forEach(function(trace, n) {{
+            var points = sources[n];
+            trace.x = points.lon; trace.y = points.lat; trace.z = points.alt;
+            trace.marker.color = points[{json.dumps(metric)}];
+            if (points.samples) {{ trace.customdata = points.samples; }}
+        }});
+        Plotly.newPlot({json.dumps(div_id)}, figure.data, figure.layout, {{responsive: true}});
+    }})({json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder, separators=(',', ':'))}, [{', '.join(sources)}]);
+"""
+
+def map_parts(m):
+    """Header elements (by name), body and script of a rendered folium map, to put several maps in one page"""
+    root = m.get_root()
+    root.render()
+    header = {name: child.render() for name, child in root.header._children.items()}
+    body = ''.join(child.render() for child in root.html._children.values())
+    script = ''.join(child.render() for child in root.script._children.values())
+    return header, body, script
+
+def write_bundle(path, tables, views):
+    """One HTML page with every view, views being (label, 3D div id, 3D script, folium map) per metric"""
+    header, bodies, scripts = {}, [], []
+    for _, _, _, m in views:
+        parts = map_parts(m)
+        for name, element in parts[0].items():
+            header.setdefault(name, element)  # the Leaflet and branca assets once
+        bodies.append(parts[1])
+        scripts.append(parts[2])
+    with open(path, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="utf-8" />\n'
+                '    <title>LTE Metrics Visualization</title>\n')
+        f.write(''.join(header.values()))
+        f.write(f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>\n')
+        f.write("""
+    <style>
+        html, body { margin: 0; padding: 0; width: 100%; height: auto; overflow-y: auto; }
+        .grid-container { display: grid; grid-template-columns: 50% 50%; grid-template-rows: repeat(4, 500px);
+                          width: 100%; gap: 20px; }
+        .grid-item { border: 2px solid black; overflow: hidden; display: flex; flex-direction: column; }
+        .view { flex: 1; min-height: 0; position: relative; }
+        .title { text-align: center; font-weight: bold; padding: 10px; background-color: #f0f0f0; }
+    </style>
+</head>
+<body>
+""")
+        f.write(f'<script>\n    var RAN = {to_js(tables)};\n{BUNDLE_JS}</script>\n')
+        f.write('<div class="grid-container">\n')
+        for (label, div_id, _, _), body in zip(views, bodies):
+            f.write(f'    <div class="grid-item"><div class="title">{label} - 3D Plot</div>'
+                    f'<div class="view" id="{div_id}"></div></div>\n')
+            f.write(f'    <div class="grid-item"><div class="title">{label} - 2D Map</div>'
+                    f'<div class="view">{body}</div></div>\n')
+        f.write('</div>\n<script>\n')
+        f.write(''.join(scripts))
+        f.write(''.join(script for _, _, script, _ in views))
+        f.write('</script>\n</body>\n</html>\n')
+
+# Define the main output folder
+main_output_folder = "spatiotemporal maps results"
+os.makedirs(main_output_folder, exist_ok=True)
+
+parser = argparse.ArgumentParser(description="Map the serving cell RAN metrics in 2D and 3D")
+parser.add_argument('--points', type=int, default=POINT_BUDGET,
+                    help=f"points drawn by default in a 3D view (default {POINT_BUDGET}), a longer flight is "
+                         "averaged into voxels and every sample goes to a separate *_3d_full.html; 0 draws every sample")
+parser.add_argument('--bins', choices=CELL_SHAPES + ('none',), default='hex',
+                    help="shape of the cells the 2D maps are drawn from (default hex), none draws every sample")
+parser.add_argument('--cell-sizes', type=float, nargs='+', default=list(CELL_SIZES), metavar='METRES',
+                    help=f"cell widths, finest first (default {' '.join(map(str, CELL_SIZES))}), one map layer each")
+parser.add_argument('--band-height', type=float, default=BAND_HEIGHT, metavar='METRES',
+                    help=f"height of the altitude bands mapped with the finest cells (default {BAND_HEIGHT}), 0 for none")
+parser.add_argument('--bundle', action='store_true',
+                    help="write lte_combined_visuals.html as one page holding every view, with plotly.js, Leaflet "
+                         "and the data written once, instead of eight HTML files in iframes")
+parser.add_argument('--force', action='store_true',
+                    help="redraw the maps even if the build manifest says lte_data did not change")
+args = parser.parse_args()
+if args.points < 0:
+    parser.error("--points must be 0 or more")
+if min(args.cell_sizes) <= 0 or args.band_height < 0:
+    parser.error("--cell-sizes must be positive and --band-height 0 or more")
+
+# Nothing to redraw if the LTE data did not change since the maps were made
+manifest = Manifest()
+map_inputs = ['lte_data.txt', 'lte_data.npy']
+map_params = script_params(__file__, points=args.points, bins=args.bins, cell_sizes=args.cell_sizes, band_height=args.band_height,
+                           bundle=args.bundle)
+if not args.force and manifest.is_fresh('map:ran', map_inputs, map_params):
+    manifest.save(__file__)
+    print(f"lte_data is unchanged since the last run, the maps in '{main_output_folder}' are up to date.")
+    raise SystemExit(0)
+
+# Define the subfolder for individual metric HTML files
+output_subfolder = os.path.join(main_output_folder, "output")
+if not args.bundle:
+    os.makedirs(output_subfolder, exist_ok=True)
+
+# Load LTE data, from the RAN samples of all_data_extract.py --columnar when they are up to date
+required_columns = ['Altitude', 'longitude', 'latitude', 'CellID', 'RSRP', 'RSRQ', 'SINR', 'RSSI']
+samples = load_columns('lte_data.txt')
+if samples is not None:
+    # only samples with a GPS fix and a serving cell can be mapped
+    samples = samples[samples['has_fix'] & samples['has_serving']]
+    df = pd.DataFrame({name: samples[name].astype(float) for name in required_columns})
+else:
+    df = pd.read_csv('lte_data.txt')
+    # rows logged without a GPS fix hold placeholders ('LAT', 'altitude', ...) instead of numbers
+    df[required_columns] = df[required_columns].apply(pd.to_numeric, errors='coerce')
+
+# Drop rows missing any of the required fields
+df.dropna(subset=required_columns, inplace=True)
+
+metrics = [
+    ('RSRP', 'RSRP (dBm)'),
+    ('RSRQ', 'RSRQ (dB)'),
+    ('RSSI', 'RSSI (dBm)'),
+    ('SINR', 'SINR (dB)')
+]
+
+names = [m for m, _ in metrics]
+plot_files = []
+full_files = []
+map_files = []
+html_output = os.path.join(main_output_folder, "lte_combined_visuals.html")
+
+# Coverage cells of every size over all altitudes, then the finest cells per altitude band
+cell_layers = []
+if args.bins != 'none':
+    for size in args.cell_sizes:
+        cell_layers.append((f"{args.bins} cells {size:g} m", bin_samples(df, names, size, args.bins)))
+    if args.band_height:
+        finest = min(args.cell_sizes)
+        banded = bin_samples(df, names, finest, args.bins, args.band_height)
+        for (low, high), cells in banded.groupby(['altitude_from', 'altitude_to']):
+            cell_layers.append((f"{args.bins} cells {finest:g} m, altitude {low:g}-{high:g} m", cells))
+    bins_file = os.path.join(main_output_folder, "ran_bins.csv")
+    pd.concat([cells for _, cells in cell_layers]).to_csv(bins_file, index=False, float_format='%.10g')
+    full_files.append(bins_file)
+
+# Voxel averages of the 3D views, the same voxels for every metric
+levels = []
+if args.points and len(df) > args.points:
+    budgets = [args.points] + [args.points // k for k in COARSER_LEVELS if args.points // k >= 100]
+    levels = [voxel_average(df, names, budget) for budget in budgets]
+
+if args.bundle:
+    # written once into the page, for the views of all four metrics
+    tables = {'metrics': names, 'samples': sample_table(df, names, altitude=True),
+              'levels': [level_table(points, names) for points in levels],
+              'cells': [cell_table(cells, names) for _, cells in cell_layers]}
+    bundle_views = []
+
+for metric, label in metrics:
+    values = df[metric]
+
+    # --- 3D Plotly Map ---
+    full = (f"all {len(df)} samples", df)
+    views = [(f"{len(points)} points", points) for points in levels]
+    if args.bundle:
+        # every sample is in the page anyway, so the full resolution is one more button
+        div_id = f"{metric.lower()}_3d"
+        fig = figure_3d(views + [full], metric, label, values.min(), values.max(),
+                        f"{label} - 3D Scatter" + (", averaged into voxels" if levels else ""))
+        sources = [f"RAN.levels[{n}]" for n in range(len(levels))] + ["RAN.full"]
+        plot = plot_script(fig, div_id, sources, metric)
+    else:
+        plot_file = os.path.join(output_subfolder, f"{metric.lower()}_3d.html")
+        if levels:
+            # every sample in its own file, the default view shows the voxel averages
+            full_file = os.path.join(output_subfolder, f"{metric.lower()}_3d_full.html")
+            fig = figure_3d([full], metric, label, values.min(), values.max(),
+                            f"{label} - 3D Scatter, all {len(df)} samples")
+            fig.write_html(full_file)
+            full_files.append(full_file)
+            fig = figure_3d(views, metric, label, values.min(), values.max(),
+                            f'{label} - 3D Scatter, averaged into voxels '
+                            f'(<a href="{os.path.basename(full_file)}">all {len(df)} samples</a>)')
+        else:
+            fig = figure_3d([full], metric, label, values.min(), values.max(), f"{label} - 3D Scatter")
+        fig.write_html(plot_file)
+        plot_files.append(plot_file)
 
     # --- 2D Folium Map ---
     colormap = branca.colormap.LinearColormap(
@@ -79,84 +573,104 @@ for metric, label in metrics:
         vmax=values.max()
     )
     m = folium.Map(location=[df['latitude'].mean(), df['longitude'].mean()], zoom_start=17)
-    for _, row in gdf.iterrows():
-        folium.CircleMarker(
-            location=[row['latitude'], row['longitude']],
-            radius=4,
-            color=colormap(row[metric]),
-            fill=True,
-            fill_color=colormap(row[metric]),
-            fill_opacity=1.0,
-            tooltip=f'{metric}: {row[metric]:.2f}'
-        ).add_to(m)
+    for n, (name, cells) in enumerate(cell_layers):
+        m.add_child(CellLayer(cells, metric, colormap, name, show=(n == 0),
+                              table=f"RAN.cells[{n}]" if args.bundle else None))
+    # the samples too, as long as they fit the point budget, so a long flight keeps a constant-size map
+    # (a bundle holds them anyway)
+    if args.bundle or not cell_layers or args.points == 0 or len(df) <= args.points:
+        m.add_child(SampleLayer(df, metric, colormap, name=f"Samples ({len(df)})", show=not cell_layers,
+                                table="RAN.samples" if args.bundle else None))
     colormap.caption = label
     m.add_child(colormap)
-    map_file = os.path.join(output_subfolder, f"{metric.lower()}_map.html")
-    m.save(map_file)
-    map_files.append(map_file)
+    m.add_child(folium.LayerControl(collapsed=False))
+    if args.bundle:
+        bundle_views.append((label, div_id, plot, m))
+    else:
+        map_file = os.path.join(output_subfolder, f"{metric.lower()}_map.html")
+        m.save(map_file)
+        map_files.append(map_file)
+
+if args.bundle:
+    write_bundle(html_output, tables, bundle_views)
 
 # --- Save the Combined HTML in the Main Output Directory ---
-html_output = os.path.join(main_output_folder, "lte_combined_visuals.html")
-with open(html_output, 'w') as f:
-    f.write("""
-    <html>
-    <head>
-        <title>LTE Metrics Visualization</title>
-        <style>
-            html, body {
-                margin: 0;
-                padding: 0;
-                width: 100%;
-                height: auto;
-                overflow-y: auto;
-            }
-            .grid-container {
-                display: grid;
-                grid-template-columns: 50% 50%;
-                grid-template-rows: repeat(4, 500px);
-                width: 100%;
-                gap: 20px;
-            }
-            .grid-item {
-                border: 2px solid black;
-                overflow: hidden;
-            }
-            iframe {
-                width: 100%;
-                height: 100%;
-                border: none;
-            }
-            .title {
-                text-align: center;
-                font-weight: bold;
-                padding: 10px;
-                background-color: #f0f0f0;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="grid-container">
-    """)
+if not args.bundle:
+    with open(html_output, 'w') as f:
+        f.write("""
+        <html>
+        <head>
+            <title>LTE Metrics Visualization</title>
+            <style>
+                html, body {
+                    margin: 0;
+                    padding: 0;
+                    width: 100%;
+                    height: auto;
+                    overflow-y: auto;
+                }
+                .grid-container {
+                    display: grid;
+                    grid-template-columns: 50% 50%;
+                    grid-template-rows: repeat(4, 500px);
+                    width: 100%;
+                    gap: 20px;
+                }
+                .grid-item {
+                    border: 2px solid black;
+                    overflow: hidden;
+                }
+                iframe {
+                    width: 100%;
+                    height: 100%;
+                    border: none;
+                }
+                .title {
+                    text-align: center;
+                    font-weight: bold;
+                    padding: 10px;
+                    background-color: #f0f0f0;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="grid-container">
+        """)
 
-    for plot, map_, (metric, label) in zip(plot_files, map_files, metrics):
-        relative_plot_path = os.path.relpath(plot, start=main_output_folder)
-        relative_map_path = os.path.relpath(map_, start=main_output_folder)
-        f.write(f"""
-            <div class="grid-item">
-                <div class="title">{label} - 3D Plot</div>
-                <iframe src="{relative_plot_path}"></iframe>
-            </div>
-            <div class="grid-item">
-                <div class="title">{label} - 2D Map</div>
-                <iframe src="{relative_map_path}"></iframe>
+        for plot, map_, (metric, label) in zip(plot_files, map_files, metrics):
+            relative_plot_path = os.path.relpath(plot, start=main_output_folder)
+            relative_map_path = os.path.relpath(map_, start=main_output_folder)
+            f.write(f"""
+                <div class="grid-item">
+                    <div class="title">{label} - 3D Plot</div>
+                    <iframe src="{relative_plot_path}"></iframe>
+                </div>
+                <div class="grid-item">
+                    <div class="title">{label} - 2D Map</div>
+                    <iframe src="{relative_map_path}"></iframe>
+                </div>
+            """)
+
+        f.write("""
             </div>
+        </body>
+        </html>
         """)
 
-    f.write("""
-        </div>
-    </body>
-    </html>
-    """)
+# Remove what an earlier run in another mode left (per-metric pages before --bundle, a full
+# resolution view the flight no longer needs, cells after --bins none), so the folder holds this run only
+written = plot_files + full_files + map_files + [html_output]
+earlier = [os.path.join(output_subfolder, f"{name.lower()}{suffix}.html")
+           for name in names for suffix in ('_3d', '_3d_full', '_map')]
+earlier.append(os.path.join(main_output_folder, "ran_bins.csv"))
+for path in earlier:
+    if path not in written and os.path.exists(path):
+        os.remove(path)
+if args.bundle and os.path.isdir(output_subfolder) and not os.listdir(output_subfolder):
+    os.rmdir(output_subfolder)
+
+manifest.record('map:ran', map_inputs, map_params, written)
+manifest.save(__file__)
 
 print(f"All visualizations have been successfully created and saved in the '{main_output_folder}' folder.")
 
@@ -0,0 +1,196 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# pipeline.py (the typed tables of all_data_extract.py --columnar) is in ../data_extract
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_extract'))
+from pipeline import load_columns
+
+# joined table written next to the extracted data
+OUTPUT_FILE = 'joined_data.txt'
+
+# the extracted data files and the columns taken from each of them,
+# categorical columns (cell identities) are never interpolated, they take the nearest sample
+STREAMS = [
+    {'file': 'lte_data.txt', 'label': 'RAN',
+     'columns': ['Altitude', 'latitude', 'longitude', 'PCI', 'CellID', 'LAC', 'RSRP', 'RSRQ', 'RSSI', 'SINR'],
+     'categorical': ['PCI', 'CellID', 'LAC']},
+    {'file': 'iperf3_data.txt', 'label': 'throughput',
+     'columns': ['UL', 'DL'],
+     'categorical': []},
+    {'file': 'nping_data.txt', 'label': 'delay',
+     'columns': ['Max_RTT_ms'],
+     'categorical': []},
+]
+
+METHODS = ('nearest', 'previous', 'next', 'linear')
+
+# RAN sample fields (lte_data.npy) and the mask saying where they were logged
+RAN_MASKS = {name: 'has_fix' for name in ('latitude', 'longitude')}
+RAN_MASKS.update({name: 'has_serving' for name in ('MCC', 'MNC', 'PCI', 'EARFCN', 'CellID', 'LAC')})
+
+def typed_column(table, name):
+    """A column of a typed table as float64, NaN where its validity mask is False"""
+    values = np.array(table[name], dtype=float)
+    mask = RAN_MASKS.get(name)
+    if mask is not None and mask in table.dtype.names:
+        values[~table[mask]] = np.nan
+    return values
+
+def load_stream(csv_file, columns):
+    """Load one extracted file as (epoch seconds, float columns), sorted by time
+
+    Rows without a parseable date/time (e.g. RAN rows logged before the first GPS
+    fix) are dropped, non-numeric values become NaN.
+    """
+    table = load_columns(csv_file)
+    if table is not None:
+        stamps = table['Timestamp'].astype('datetime64[s]')
+        values = np.column_stack([typed_column(table, name) for name in columns])
+    else:
+        df = pd.read_csv(csv_file, dtype=str, usecols=['Date', 'Time'] + columns)
+        stamps = pd.to_datetime(df['Date'] + ' ' + df['Time'], format='%Y/%b/%d %H:%M:%S',
+                                errors='coerce').to_numpy().astype('datetime64[s]')
+        values = np.column_stack([pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+                                  for name in columns])
+
+    valid = ~np.isnat(stamps)
+    stamps = stamps[valid].astype(np.int64)
+    values = values[valid]
+    order = np.argsort(stamps, kind='stable')
+    return stamps[order], values[order]
+
+def collapse_duplicates(stamps, values, categorical):
+    """Merge samples that share a timestamp into one
+
+    Numeric columns are averaged (ignoring NaN), categorical columns keep the
+    last sample of that second. stamps must be sorted.
+    """
+    if len(stamps) == 0:
+        return stamps, values
+    starts = np.flatnonzero(np.r_[True, np.diff(stamps) != 0])
+    if len(starts) == len(stamps):
+        return stamps, values
+
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(present, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged = np.where(counts > 0, sums / counts, np.nan)
+
+    ends = np.r_[starts[1:], len(stamps)] - 1
+    merged[:, categorical] = values[ends][:, categorical]
+    return stamps[starts], merged
+
+def asof_join(target, stamps, values, tolerance, method='nearest', categorical=None):
+    """Align one stream onto the target timestamps without looping over rows
+
+    For each target time the sample before and after it are found with a binary
+    search. 'previous'/'next'/'nearest' take one of them, 'linear' interpolates
+    between both. A sample further than tolerance seconds from the target is not
+    used, so gaps in a stream come out as NaN instead of stale values.
+    """
+    result = np.full((len(target), values.shape[1]), np.nan)
+    if not len(stamps):
+        return result
+
+    before = np.searchsorted(stamps, target, side='right') - 1
+    after = np.searchsorted(stamps, target, side='left')
+    has_before = before >= 0
+    has_after = after < len(stamps)
+    before = np.clip(before, 0, len(stamps) - 1)
+    after = np.clip(after, 0, len(stamps) - 1)
+    gap_before = np.where(has_before, target - stamps[before], np.iinfo(np.int64).max)
+    gap_after = np.where(has_after, stamps[after] - target, np.iinfo(np.int64).max)
+    ok_before = gap_before <= tolerance
+    ok_after = gap_after <= tolerance
+
+    def pick(use_before, use_after):
+        picked = np.full_like(result, np.nan)
+        picked[use_before] = values[before[use_before]]
+        picked[use_after] = values[after[use_after]]
+        return picked
+
+    nearest_before = ok_before & (gap_before <= gap_after)
+    nearest = pick(nearest_before, ok_after & ~nearest_before)
+    if method == 'previous':
+        return pick(ok_before, np.zeros_like(ok_after))
+    if method == 'next':
+        return pick(np.zeros_like(ok_before), ok_after)
+    if method == 'nearest':
+        return nearest
+
+    # linear: weight of the later sample, 0 when the target falls on a sample
+    span = (stamps[after] - stamps[before]).astype(float)
+    weight = np.divide(gap_before, span, out=np.zeros(len(target)), where=span > 0)[:, None]
+    both = ok_before & ok_after
+    result[both] = values[before[both]] + weight[both] * (values[after[both]] - values[before[both]])
+    if categorical:
+        result[:, categorical] = nearest[:, categorical]
+    return result
+
+def build_timeline(stream_stamps, step):
+    """Every step-second slot in which at least one stream logged a sample
+
+    Building the timeline from the samples (instead of a full range) keeps
+    day-long idle gaps between flights out of the joined table.
+    """
+    stamps = np.concatenate(stream_stamps) if stream_stamps else np.empty(0, dtype=np.int64)
+    return np.unique(stamps // step * step)
+
+def join_streams(step=1, tolerance=2, method='nearest'):
+    """Load the extracted files and join them on one timeline
+
+    Returns a DataFrame with Date and Time followed by the columns of every
+    stream that could be loaded.
+    """
+    loaded = []
+    for stream in STREAMS:
+        if not os.path.exists(stream['file']) and load_columns(stream['file']) is None:
+            print(f"Warning: {stream['file']} not found. Leaving the {stream['label']} columns out.")
+            continue
+        stamps, values = load_stream(stream['file'], stream['columns'])
+        if not len(stamps):
+            # e.g. a ground test without a GPS fix: no row has a date and time to join on
+            print(f"Warning: no timestamped samples in {stream['file']}. Leaving the {stream['label']} columns out.")
+            continue
+        categorical = [stream['columns'].index(name) for name in stream['categorical']]
+        stamps, values = collapse_duplicates(stamps, values, categorical)
+        print(f"Loaded {len(stamps)} {stream['label']} samples from {stream['file']}")
+        loaded.append((stream, stamps, values, categorical))
+
+    timeline = build_timeline([stamps for _, stamps, _, _ in loaded], step)
+    moments = pd.to_datetime(timeline, unit='s')
+    joined = pd.DataFrame({'Date': moments.strftime('%Y/%b/%d'), 'Time': moments.strftime('%H:%M:%S')})
+    for stream, stamps, values, categorical in loaded:
+        aligned = asof_join(timeline, stamps, values, tolerance, method, categorical)
+        for index, name in enumerate(stream['columns']):
+            joined[name] = aligned[:, index]
+
+    # Drop the slots where nothing could be matched within the tolerance
+    data_columns = joined.columns[2:]
+    return joined[joined[data_columns].notna().any(axis=1)].reset_index(drop=True)
+
+def main(argv=None):
+    """Join the RAN, throughput and delay data into joined_data.txt"""
+    parser = argparse.ArgumentParser(
+        description="Align lte_data.txt, iperf3_data.txt and nping_data.txt on their timestamps")
+    parser.add_argument('--step', type=int, default=1,
+                        help="seconds between two rows of the joined table (default 1)")
+    parser.add_argument('--tolerance', type=int, default=2,
+                        help="ignore samples further than this many seconds from a row (default 2)")
+    parser.add_argument('--method', choices=METHODS, default='nearest',
+                        help="how a row takes its value from the samples around it (default nearest)")
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f"joined table to write (default {OUTPUT_FILE})")
+    args = parser.parse_args(argv)
+    if args.step < 1 or args.tolerance < 0:
+        parser.error("--step must be at least 1 and --tolerance cannot be negative")
+
+    joined = join_streams(args.step, args.tolerance, args.method)
+    joined.to_csv(args.output, index=False)
+    print(f"Joined {len(joined)} rows ({args.method}, tolerance {args.tolerance}s) into {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # headless: the charts are only saved, here and in the rendering workers
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import sys
+import time
+import multiprocessing
+import concurrent.futures
+import argparse
+
+# pipeline.py is next to this script in the WebGUI folder, in ../data_extract in the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_extract'))
+from pipeline import Manifest, script_params, Instruments, diagnostics, NB_CAPACITY, RAN_DTYPE, load_columns
 
 # directory name where the results saved and its location inside the script folder
 OUTPUT_DIR = "Statistical Results"
@@ -14,43 +25,140 @@ def create_output_directory():
     else:
         print(f"Output directory already exists: {OUTPUT_DIR}")
 
+# files written by the analysis that is running, recorded in the build manifest
+generated_files = []
+
+# ---- instrumentation ----
+
+# JSON report of the last run, written next to the charts
+REPORT_FILE = os.path.join(OUTPUT_DIR, 'stat_report.json')
+PROFILE_FILE = os.path.join(OUTPUT_DIR, 'stat_profile.prof')
+
+INSTRUMENTS = Instruments(__file__)
+
+def loaded_rows(rows, used):
+    """Count the rows read and dropped by an analysis, and close its 'load' lap"""
+    INSTRUMENTS.count('rows_loaded', rows)
+    INSTRUMENTS.count('rows_rejected', rows - used)
+    INSTRUMENTS.lap('load')
+
+def save_chart(output_file, **kwargs):
+    """plt.savefig, timing the save and the whole chart (since the previous lap) in the running stage"""
+    start = time.perf_counter()
+    plt.savefig(output_file, **kwargs)
+    INSTRUMENTS.add_time('savefig', time.perf_counter() - start)
+    INSTRUMENTS.lap(os.path.basename(output_file))
+    INSTRUMENTS.count('charts')
+
+# ---- chart rendering ----
+
+class ChartQueue:
+    """Charts of the analyses, drawn right away or queued for a pool of worker processes
+
+    The analyses load their data once and hand every chart to draw() as a
+    function and its arguments. With one worker the chart is drawn at once,
+    inside the running stage. Otherwise it is queued and render() draws the
+    queue in forked worker processes: the workers inherit the loaded data
+    (copy-on-write, nothing is pickled but the chart's index) and each one
+    times its chart with its own Instruments, merged into the report here.
+    """
+
+    def __init__(self):
+        self.parallel = False
+        self.stage = None
+        self.queue = []
+
+    def draw(self, function, *args, **kwargs):
+        if self.parallel:
+            self.queue.append((self.stage, function, args, kwargs))
+        else:
+            function(*args, **kwargs)
+
+    def render(self, workers):
+        """Draw the queued charts on workers processes; returns the files written per stage"""
+        files = {}
+        if not self.queue:
+            return files
+        print()
+        with INSTRUMENTS.stage('render'):
+            context = multiprocessing.get_context('fork')
+            with concurrent.futures.ProcessPoolExecutor(min(workers, len(self.queue)), mp_context=context) as pool:
+                for stage, entry, written in pool.map(render_chart, range(len(self.queue))):
+                    for name, seconds in entry['timers'].items():
+                        INSTRUMENTS.add_time(name, seconds, stage=stage)
+                    for name, amount in entry['counters'].items():
+                        INSTRUMENTS.count(name, amount, stage=stage)
+                    INSTRUMENTS.add_time('chart_seconds', entry['seconds'])
+                    files.setdefault(stage, []).extend(written)
+            INSTRUMENTS.count('charts', len(self.queue))
+            INSTRUMENTS.count('workers', min(workers, len(self.queue)))
+        render = INSTRUMENTS.stages['render']
+        print(f"Rendered {len(self.queue)} charts on {render['counters']['workers']} worker processes in "
+              f"{render['seconds']:.1f} s ({render['timers']['chart_seconds']:.1f} s of chart time)")
+        del self.queue[:]
+        return files
+
+CHARTS = ChartQueue()
+
+def render_chart(index):
+    """Draw one queued chart in a worker process: its stage, timers and the files it wrote"""
+    stage, function, args, kwargs = CHARTS.queue[index]
+    INSTRUMENTS.reset()
+    del generated_files[:]
+    with INSTRUMENTS.stage(stage) as entry:
+        function(*args, **kwargs)
+    return stage, entry, list(generated_files)
+
 def get_output_path(filename):
     """Get the full path for output files in the Statistical Results directory"""
-    return os.path.join(OUTPUT_DIR, filename)
+    path = os.path.join(OUTPUT_DIR, filename)
+    generated_files.append(path)
+    return path
 
 def analyze_delay_statistics():
     """Analyze and plot delay statistics from nping_data.txt"""
     print("Processing delay statistics...")
     
+    # Typed table if the extractor wrote one, otherwise the CSV file
+    table = load_columns('nping_data.txt')
+
     # Check if file exists
-    if not os.path.exists('nping_data.txt'):
+    if table is None and not os.path.exists('nping_data.txt'):
         print("Warning: nping_data.txt not found. Skipping delay statistics.")
         return
     
     # how long to bin the dealy time in msec
     bin_width = 10
 
-    # delay log file
-    df = pd.read_csv('nping_data.txt', sep=',')
+    if table is not None:
+        rows_loaded = len(table)
+        rtt = table['Max_RTT_ms']
+        rtt = rtt[~np.isnan(rtt)]
+    else:
+        # delay log file
+        df = pd.read_csv('nping_data.txt', sep=',')
 
-    # Convert 'Max' column to number, handling potential errors
-    df['Max_RTT_ms'] = pd.to_numeric(df['Max_RTT_ms'], errors='coerce')
+        # Convert 'Max' column to number, handling potential errors
+        df['Max_RTT_ms'] = pd.to_numeric(df['Max_RTT_ms'], errors='coerce')
 
-    # Delete rows with NaN values
-    df.dropna(subset=['Max_RTT_ms'], inplace=True)
+        # Delete rows with NaN values
+        rows_loaded = len(df)
+        df.dropna(subset=['Max_RTT_ms'], inplace=True)
+        rtt = df['Max_RTT_ms'].to_numpy()
+    loaded_rows(rows_loaded, len(rtt))
 
     # Set the graph starts from 0
     min_max = 0
-    max_max = np.ceil(df['Max_RTT_ms'].max())
+    max_max = np.ceil(rtt.max())
 
     # Create bins
     bins = np.arange(min_max, max_max + bin_width, bin_width)
 
     # Calculate the frequency distribution of 'Max' values into bins
-    hist, bin_edges = np.histogram(df['Max_RTT_ms'], bins=bins)
+    hist, bin_edges = np.histogram(rtt, bins=bins)
 
     # Calculate the PDF (normalize frequencies by the total number of values)
-    pdf = hist / len(df['Max_RTT_ms'])
+    pdf = hist / len(rtt)
 
     # Create a DataFrame for plotting
     pdf_df = pd.DataFrame({'Bin_Start': bin_edges[:-1], 'PDF': pdf})
@@ -59,101 +167,133 @@ def analyze_delay_statistics():
     pdf_df['Bin_Center'] = pdf_df['Bin_Start'] + (bin_width / 2)
 
     # Plotting the bar chart
-    plt.figure(figsize=(10, 6))
-    plt.bar(pdf_df['Bin_Center'], pdf_df['PDF'], width=bin_width, align='center', edgecolor='black')
-    plt.xlabel('Latency (ms)', fontsize=18)
-    plt.ylabel('Probability Density Function', fontsize=18)
-    plt.title(f'PDF of Latency (Bin Width: {bin_width} ms)', fontsize=20)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.xticks(fontsize=18)
-    plt.yticks(fontsize=18)
-
-    # Set x-axis limits to start from 0 and extend slightly beyond the max value
-    plt.xlim(left=0, right=max_max + bin_width / 2)
-
-    # Save the plot to a file
-    output_file = get_output_path(f'pdf_of_delay_{bin_width}msec.png')
-    plt.savefig(output_file)
-    plt.close()
-    print(f"Delay statistics plot saved as: {output_file}")
+    def plot_delay_pdf():
+        plt.figure(figsize=(10, 6))
+        plt.bar(pdf_df['Bin_Center'], pdf_df['PDF'], width=bin_width, align='center', edgecolor='black')
+        plt.xlabel('Latency (ms)', fontsize=18)
+        plt.ylabel('Probability Density Function', fontsize=18)
+        plt.title(f'PDF of Latency (Bin Width: {bin_width} ms)', fontsize=20)
+        plt.grid(axis='y', linestyle='--', alpha=0.7)
+        plt.xticks(fontsize=18)
+        plt.yticks(fontsize=18)
+
+        # Set x-axis limits to start from 0 and extend slightly beyond the max value
+        plt.xlim(left=0, right=max_max + bin_width / 2)
+
+        # Save the plot to a file
+        output_file = get_output_path(f'pdf_of_delay_{bin_width}msec.png')
+        save_chart(output_file)
+        plt.close()
+        print(f"Delay statistics plot saved as: {output_file}")
+
+    CHARTS.draw(plot_delay_pdf)
+
+def ran_samples_from_csv(csv_file):
+    """Parse lte_data.txt into RAN samples (RAN_DTYPE)
+
+    Fields are found through the header, and a row simply ends after its last
+    neighbour, so no column offset is assumed. Placeholders written for a
+    missing GPS fix ('LAT', 'altitude', ...) become NaN or a False mask.
+    """
+    with open(csv_file, 'r') as file:
+        header = file.readline().rstrip('\n').split(',')
+        lines = file.read().splitlines()
+    samples = np.zeros(len(lines), RAN_DTYPE)
+    if not lines:
+        return samples
+    fields = pd.Series(lines).str.split(',', expand=True)
+    position = {name: index for index, name in enumerate(header)}
+
+    def text(name):
+        index = position[name]
+        return fields[index] if index < fields.shape[1] else pd.Series(None, index=fields.index, dtype=object)
+
+    def numbers(name):
+        return pd.to_numeric(text(name), errors='coerce').to_numpy(dtype=float)
+
+    def as_int(values, valid):
+        return np.where(valid, values, 0).astype(np.int64)
+
+    samples['Altitude'] = numbers('Altitude')
+    latitude, longitude = numbers('latitude'), numbers('longitude')
+    samples['has_fix'] = ~(np.isnan(latitude) | np.isnan(longitude))
+    samples['latitude'] = latitude
+    samples['longitude'] = longitude
+    samples['Timestamp'] = pd.to_datetime(text('Date') + ' ' + text('Time'), format='%Y/%b/%d %H:%M:%S',
+                                          errors='coerce').to_numpy().astype('datetime64[s]')
+
+    ids = {name: numbers(name) for name in ('MCC', 'MNC', 'PCI', 'EARFCN')}
+    has_serving = ~np.isnan(np.column_stack(list(ids.values()))).any(axis=1)
+    samples['has_serving'] = has_serving
+    for name, values in ids.items():
+        samples[name] = as_int(values, has_serving)
+    lac = numbers('LAC')
+    samples['LAC'] = as_int(lac, ~np.isnan(lac))
+    for name in ('CellID', 'RSRP', 'RSRQ', 'RSSI', 'SINR'):
+        samples[name] = numbers(name)
+
+    # Neighbour slots are filled in order, so the count is the run of slots with a parseable cell
+    slots = [i for i in range(1, NB_CAPACITY + 1) if f'NB{i}_PCI' in position]
+    earfcn = np.column_stack([numbers(f'NB{i}_EARFCN') for i in slots])
+    pci = np.column_stack([numbers(f'NB{i}_PCI') for i in slots])
+    present = ~(np.isnan(earfcn) | np.isnan(pci))
+    count = np.cumprod(present, axis=1).sum(axis=1)
+    used = np.arange(len(slots)) < count[:, None]
+    samples['NB_count'] = count
+    samples['NB_EARFCN'][:, :len(slots)] = as_int(earfcn, used)
+    samples['NB_PCI'][:, :len(slots)] = as_int(pci, used)
+    for metric in ('RSRQ', 'RSRP', 'RSSI'):
+        values = np.column_stack([numbers(f'NB{i}_{metric}') for i in slots])
+        samples[f'NB_{metric}'] = np.nan
+        samples[f'NB_{metric}'][:, :len(slots)] = np.where(used, values, np.nan)
+    return samples
+
+def ran_columns_from_table(samples):
+    """Build the RAN analysis inputs from RAN samples
+
+    Only samples with a serving cell, an altitude and at least three neighbours,
+    all with numeric metrics, are kept. The kept columns are copied out as
+    float64 arrays.
+    """
+    metrics = ('RSRP', 'RSRQ', 'RSSI')
+    valid = samples['has_serving'] & (samples['NB_count'] >= 3) & ~np.isnan(samples['Altitude'])
+    for name in ('CellID', 'RSRP', 'RSRQ', 'RSSI', 'SINR'):
+        valid &= ~np.isnan(samples[name])
+    for metric in metrics:
+        valid &= ~np.isnan(samples[f'NB_{metric}'][:, :3]).any(axis=1)
+    kept = samples[valid]
+
+    columns = {name: kept[name].astype(float) for name in ('Altitude', 'CellID', 'LAC', 'RSRP', 'RSRQ', 'RSSI', 'SINR')}
+    cellid = columns['CellID']
+    data = np.column_stack([cellid, columns['RSRP'], columns['RSRQ'], columns['RSSI'], columns['SINR']])
+    altitude = columns['Altitude']
+    nb_data = {'CellID': cellid}
+    nb_data.update({f'NB{i}_{metric}': kept[f'NB_{metric}'][:, i - 1].astype(float)
+                    for i in (1, 2, 3) for metric in metrics})
+    return (altitude, cellid, columns['LAC'], columns['RSRP'], columns['RSRQ'],
+            columns['RSSI'], columns['SINR'], data,
+            np.column_stack([altitude, columns['RSRP']]), np.column_stack([altitude, columns['RSRQ']]),
+            np.column_stack([altitude, columns['RSSI']]), np.column_stack([altitude, columns['SINR']]),
+            nb_data)
 
 def analyze_ran_statistics():
     """Analyze and plot RAN statistics from lte_data.txt"""
     print("Processing RAN statistics...")
     
+    # Typed table if the extractor wrote one, otherwise the CSV file
+    table = load_columns('lte_data.txt')
+
     # Check if file exists
-    if not os.path.exists('lte_data.txt'):
+    if table is None and not os.path.exists('lte_data.txt'):
         print("Warning: lte_data.txt not found. Skipping RAN statistics.")
         return
 
-    # Initialize lists for data storage
-    cellid_values = []
-    lac_values = []
-    rsrp_values = []
-    rsrq_values = []
-    rssi_values = []
-    sinr_values = []
-    data = []
-    altitude_values = []
-    alt_rsrp_values = []
-    alt_rsrq_values = []
-    alt_rssi_values = []
-    alt_sinr_values = []
-    nb_data = []
-
-    # Read and parse data
-    try:
-        with open('lte_data.txt', 'r') as file:
-            for line in file:
-                values = line.strip().split(',')
-                if len(values) >= 29:
-                    try:
-                        altitude = float(values[0])
-                        cellid = float(values[9])
-                        lac = float(values[10])
-                        rsrp = float(values[11])
-                        rsrq = float(values[12])
-                        rssi = float(values[13])
-                        sinr = float(values[14])
-                        
-                        # Extracting NB RSRP, RSRQ, and RSSI from their respective columns
-                        nb1_rsrp = float(values[18])
-                        nb2_rsrp = float(values[23])
-                        nb3_rsrp = float(values[28])
-                        nb1_rsrq = float(values[17])
-                        nb2_rsrq = float(values[22])
-                        nb3_rsrq = float(values[27])
-                        nb1_rssi = float(values[19])
-                        nb2_rssi = float(values[24])
-                        nb3_rssi = float(values[29])
-                        
-                        # Append values to the lists
-                        cellid_values.append(cellid)
-                        lac_values.append(lac)
-                        rsrp_values.append(rsrp)
-                        rsrq_values.append(rsrq)
-                        rssi_values.append(rssi)
-                        sinr_values.append(sinr)
-                        
-                        data.append((cellid, rsrp, rsrq, rssi, sinr))
-                        altitude_values.append(altitude)
-                        alt_rsrp_values.append((altitude, rsrp))
-                        alt_rsrq_values.append((altitude, rsrq))
-                        alt_rssi_values.append((altitude, rssi))
-                        alt_sinr_values.append((altitude, sinr))
-                        
-                        # Append NB RSRP, RSRQ, and RSSI values to nb_data
-                        nb_data.append({
-                            'CellID': cellid,
-                            'NB1_RSRP': nb1_rsrp, 'NB2_RSRP': nb2_rsrp, 'NB3_RSRP': nb3_rsrp,
-                            'NB1_RSRQ': nb1_rsrq, 'NB2_RSRQ': nb2_rsrq, 'NB3_RSRQ': nb3_rsrq,
-                            'NB1_RSSI': nb1_rssi, 'NB2_RSSI': nb2_rssi, 'NB3_RSSI': nb3_rssi,
-                        })
-                    except ValueError:
-                        continue
-    except FileNotFoundError:
-        print("Error: The file 'lte_data.txt' was not found.")
-        return
+    # Both sources end up as the same compact RAN samples
+    samples = table if table is not None else ran_samples_from_csv('lte_data.txt')
+    (altitude_values, cellid_values, lac_values, rsrp_values, rsrq_values,
+     rssi_values, sinr_values, data, alt_rsrp_values, alt_rsrq_values,
+     alt_rssi_values, alt_sinr_values, nb_data) = ran_columns_from_table(samples)
+    loaded_rows(len(samples), len(rsrp_values))
 
     # Helper functions for RAN analysis
     def calculate_cdf(values):
@@ -169,7 +309,7 @@ def analyze_ran_statistics():
         plt.title(title)
         plt.grid(True, linestyle='--', alpha=0.7)
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300)
+        save_chart(output_file, dpi=300)
         plt.close()
         print(f"RAN CDF plot saved as: {output_file}")
 
@@ -191,7 +331,7 @@ def analyze_ran_statistics():
 
         plt.tight_layout()
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300)
+        save_chart(output_file, dpi=300)
         plt.close()
         print(f"RAN PDF plot saved as: {output_file}")
 
@@ -224,7 +364,7 @@ def analyze_ran_statistics():
         plt.subplots_adjust(bottom=0.3)
         plt.tight_layout()
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        save_chart(output_file, dpi=300, bbox_inches='tight')
         plt.close()
         print(f"RAN statistics plot saved as: {output_file}")
 
@@ -245,7 +385,7 @@ def analyze_ran_statistics():
         plt.legend()
         plt.tight_layout()
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300)
+        save_chart(output_file, dpi=300)
         plt.close()
         print(f"RAN altitude plot saved as: {output_file}")
 
@@ -260,7 +400,7 @@ def analyze_ran_statistics():
         plt.grid(True, linestyle='--', alpha=0.7)
         plt.tight_layout()
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300)
+        save_chart(output_file, dpi=300)
         plt.close()
         print(f"Altitude count plot saved as: {output_file}")
 
@@ -291,104 +431,120 @@ def analyze_ran_statistics():
         plt.subplots_adjust(bottom=0.3)
         plt.tight_layout()
         output_file = get_output_path(filename)
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        save_chart(output_file, dpi=300, bbox_inches='tight')
         plt.close()
         print(f"NB metric plot saved as: {output_file}")
 
     # Generate all RAN plots
-    if rsrp_values:  # Only proceed if we have data
+    if len(rsrp_values):  # Only proceed if we have data
         # Generate CDF plots
-        plot_cdf(*calculate_cdf(rsrp_values), 'RSRP (dBm)', 'CDF of RSRP', 'CDF_RSRP.png', 'blue')
-        plot_cdf(*calculate_cdf(rsrq_values), 'RSRQ (dB)', 'CDF of RSRQ', 'CDF_RSRQ.png', 'green')
-        plot_cdf(*calculate_cdf(rssi_values), 'RSSI (dB)', 'CDF of RSSI', 'CDF_RSSI.png', 'black')
-        plot_cdf(*calculate_cdf(sinr_values), 'SINR (dB)', 'CDF of SINR', 'CDF_SINR.png', 'red')
+        CHARTS.draw(plot_cdf, *calculate_cdf(rsrp_values), 'RSRP (dBm)', 'CDF of RSRP', 'CDF_RSRP.png', 'blue')
+        CHARTS.draw(plot_cdf, *calculate_cdf(rsrq_values), 'RSRQ (dB)', 'CDF of RSRQ', 'CDF_RSRQ.png', 'green')
+        CHARTS.draw(plot_cdf, *calculate_cdf(rssi_values), 'RSSI (dB)', 'CDF of RSSI', 'CDF_RSSI.png', 'black')
+        CHARTS.draw(plot_cdf, *calculate_cdf(sinr_values), 'SINR (dB)', 'CDF of SINR', 'CDF_SINR.png', 'red')
 
         # Generate PDF plots
-        plot_pdf(cellid_values, 'Cell ID', 'PDF of Cell IDs', 'PDF_CellID.png', 'orange')
-        plot_pdf(lac_values, 'LAC', 'PDF of LACs', 'PDF_LAC.png', 'brown')
+        CHARTS.draw(plot_pdf, cellid_values, 'Cell ID', 'PDF of Cell IDs', 'PDF_CellID.png', 'orange')
+        CHARTS.draw(plot_pdf, lac_values, 'LAC', 'PDF of LACs', 'PDF_LAC.png', 'brown')
 
         # Generate Min/Mean/Max plots
-        plot_min_mean_max(data, 'RSRP', 'Cell ID', 'RSRP (dBm)', 'Statistics of RSRP', 'stats_RSRP.png')
-        plot_min_mean_max(data, 'RSRQ', 'Cell ID', 'RSRQ (dB)', 'Statistics of RSRQ', 'stats_RSRQ.png')
-        plot_min_mean_max(data, 'RSSI', 'Cell ID', 'RSSI (dB)', 'Statistics of RSSI', 'stats_RSSI.png')
-        plot_min_mean_max(data, 'SINR', 'Cell ID', 'SINR (dB)', 'Statistics of SINR', 'stats_SINR.png')
+        CHARTS.draw(plot_min_mean_max, data, 'RSRP', 'Cell ID', 'RSRP (dBm)', 'Statistics of RSRP', 'stats_RSRP.png')
+        CHARTS.draw(plot_min_mean_max, data, 'RSRQ', 'Cell ID', 'RSRQ (dB)', 'Statistics of RSRQ', 'stats_RSRQ.png')
+        CHARTS.draw(plot_min_mean_max, data, 'RSSI', 'Cell ID', 'RSSI (dB)', 'Statistics of RSSI', 'stats_RSSI.png')
+        CHARTS.draw(plot_min_mean_max, data, 'SINR', 'Cell ID', 'SINR (dB)', 'Statistics of SINR', 'stats_SINR.png')
 
         # Plot metrics per altitude
-        plot_metric_per_altitude(alt_rsrp_values, 'RSRP', 'RSRP (dBm)', 'RSRP_vs_Altitude.png', 'skyblue')
-        plot_metric_per_altitude(alt_rsrq_values, 'RSRQ', 'RSRQ (dB)', 'RSRQ_vs_Altitude.png', 'lightgreen')
-        plot_metric_per_altitude(alt_rssi_values, 'RSSI', 'RSSI (dB)', 'RSSI_vs_Altitude.png', 'lightcoral')
-        plot_metric_per_altitude(alt_sinr_values, 'SINR', 'SINR (dB)', 'SINR_vs_Altitude.png', 'gold')
+        CHARTS.draw(plot_metric_per_altitude, alt_rsrp_values, 'RSRP', 'RSRP (dBm)', 'RSRP_vs_Altitude.png', 'skyblue')
+        CHARTS.draw(plot_metric_per_altitude, alt_rsrq_values, 'RSRQ', 'RSRQ (dB)', 'RSRQ_vs_Altitude.png', 'lightgreen')
+        CHARTS.draw(plot_metric_per_altitude, alt_rssi_values, 'RSSI', 'RSSI (dB)', 'RSSI_vs_Altitude.png', 'lightcoral')
+        CHARTS.draw(plot_metric_per_altitude, alt_sinr_values, 'SINR', 'SINR (dB)', 'SINR_vs_Altitude.png', 'gold')
 
         # Generate altitude count plot
-        plot_altitude_count(altitude_values, 'Altitude over sea level(m)', 'Sample Count', 'Sample Count per Altitude', 'Altitude_Count.png')
+        CHARTS.draw(plot_altitude_count, altitude_values, 'Altitude over sea level(m)', 'Sample Count', 'Sample Count per Altitude', 'Altitude_Count.png')
 
         # Generate NB plots
-        plot_nb_metric_per_cellid(nb_data, 'RSRP', 'RSRP (dBm)', 'NB RSRP per Cell ID', 'NB_RSRP_per_CellID.png')
-        plot_nb_metric_per_cellid(nb_data, 'RSRQ', 'RSRQ (dB)', 'NB RSRQ per Cell ID', 'NB_RSRQ_per_CellID.png')
-        plot_nb_metric_per_cellid(nb_data, 'RSSI', 'RSSI (dB)', 'NB RSSI per Cell ID', 'NB_RSSI_per_CellID.png')
+        CHARTS.draw(plot_nb_metric_per_cellid, nb_data, 'RSRP', 'RSRP (dBm)', 'NB RSRP per Cell ID', 'NB_RSRP_per_CellID.png')
+        CHARTS.draw(plot_nb_metric_per_cellid, nb_data, 'RSRQ', 'RSRQ (dB)', 'NB RSRQ per Cell ID', 'NB_RSRQ_per_CellID.png')
+        CHARTS.draw(plot_nb_metric_per_cellid, nb_data, 'RSSI', 'RSSI (dB)', 'NB RSSI per Cell ID', 'NB_RSSI_per_CellID.png')
 
 def analyze_throughput_statistics():
     """Analyze and plot throughput statistics from iperf3_data.txt"""
     print("Processing throughput statistics...")
     
+    # Typed table if the extractor wrote one, otherwise the CSV file
+    table = load_columns('iperf3_data.txt')
+
     # Check if file exists
-    if not os.path.exists('iperf3_data.txt'):
+    if table is None and not os.path.exists('iperf3_data.txt'):
         print("Warning: iperf3_data.txt not found. Skipping throughput statistics.")
         return
 
     # Define bin width
     bin_size = 1
 
-    # Load the dataset from the file 'iperf3_result.txt'.
-    # We skip the second row (index 1) because it contains invalid data ',0,0'.
-    df = pd.read_csv('iperf3_data.txt', skiprows=[1])
+    if table is not None:
+        rows_loaded = len(table)
+        valid = ~(np.isnan(table['UL']) | np.isnan(table['DL']))
+        ul = table['UL'][valid]
+        dl = table['DL'][valid]
+    else:
+        # Load the dataset from the file 'iperf3_data.txt', every row like the typed table
+        # (all_data_extract.py writes no ',0,0' placeholder row, rows without numbers are dropped below)
+        df = pd.read_csv('iperf3_data.txt')
 
-    # Convert speed columns to numeric types
-    df['UL'] = pd.to_numeric(df['UL'], errors='coerce')
-    df['DL'] = pd.to_numeric(df['DL'], errors='coerce')
+        # Convert speed columns to numeric types
+        df['UL'] = pd.to_numeric(df['UL'], errors='coerce')
+        df['DL'] = pd.to_numeric(df['DL'], errors='coerce')
 
-    # Remove any rows that have NaN in speed columns
-    df.dropna(subset=['UL', 'DL'], inplace=True)
+        # Remove any rows that have NaN in speed columns
+        rows_loaded = len(df)
+        df.dropna(subset=['UL', 'DL'], inplace=True)
+        ul = df['UL'].to_numpy()
+        dl = df['DL'].to_numpy()
+    loaded_rows(rows_loaded, len(ul))
 
     # Determine the maximum speed to set the upper limit for our bins
-    max_speed = max(df['UL'].max(), df['DL'].max())
+    max_speed = max(ul.max(), dl.max())
 
     # Create bins using the bin_size variable
     bins = np.arange(0, max_speed + bin_size, bin_size)
 
     # Calculate the histogram for UL_speed
-    ul_counts, ul_bins = np.histogram(df['UL'], bins=bins)
+    ul_counts, ul_bins = np.histogram(ul, bins=bins)
     ul_cdf = np.cumsum(ul_counts) / sum(ul_counts)
 
     # Calculate the histogram for DL_speed
-    dl_counts, dl_bins = np.histogram(df['DL'], bins=bins)
+    dl_counts, dl_bins = np.histogram(dl, bins=bins)
     dl_cdf = np.cumsum(dl_counts) / sum(dl_counts)
 
     # Plot the CDFs as step line charts
-    plt.figure(figsize=(10, 6))
-
-    # Create step line for UL_speed
-    plt.step(ul_bins[:-1], ul_cdf, where='post', label='UL_Throughput CDF')
-
-    # Create step line for DL_speed
-    plt.step(dl_bins[:-1], dl_cdf, where='post', label='DL_Throughput CDF')
-
-    # Set the title and labels for the plot
-    plt.title(f'CDF of Throughput (bin size: {bin_size})')
-    plt.xlabel('Throughput (Mbps)')
-    plt.ylabel('Cumulative Distribution Function')
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-    plt.legend()
-    plt.xticks(rotation=90)
-    plt.tight_layout()
-
-    # Save the plot
-    output_file = get_output_path(f'speed_cdf_{bin_size}_Mbps.png')
-    plt.savefig(output_file)
-    plt.close()
-    print(f"Throughput statistics plot saved as: {output_file}")
-
-def main():
+    def plot_throughput_cdf():
+        plt.figure(figsize=(10, 6))
+
+        # Create step line for UL_speed
+        plt.step(ul_bins[:-1], ul_cdf, where='post', label='UL_Throughput CDF')
+
+        # Create step line for DL_speed
+        plt.step(dl_bins[:-1], dl_cdf, where='post', label='DL_Throughput CDF')
+
+        # Set the title and labels for the plot
+        plt.title(f'CDF of Throughput (bin size: {bin_size})')
+        plt.xlabel('Throughput (Mbps)')
+        plt.ylabel('Cumulative Distribution Function')
+        plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+        plt.legend()
+        plt.xticks(rotation=90)
+        plt.tight_layout()
+
+        # Save the plot
+        output_file = get_output_path(f'speed_cdf_{bin_size}_Mbps.png')
+        save_chart(output_file)
+        plt.close()
+        print(f"Throughput statistics plot saved as: {output_file}")
+
+    CHARTS.draw(plot_throughput_cdf)
+
+def main(argv=None):
     """Main function to run all analyses"""
     print("Starting Combined Network Statistics Analysis")
     print("=" * 50)
@@ -397,12 +553,53 @@ def main():
     create_output_directory()
     print()
     
-    # Run all analysis functions
-    analyze_delay_statistics()
-    print()
-    analyze_ran_statistics()
-    print()
-    analyze_throughput_statistics()
+    parser = argparse.ArgumentParser(description="Plot the RAN, delay and throughput statistics charts")
+    parser.add_argument('--force', action='store_true',
+                        help="redraw every chart even if the build manifest says its data did not change")
+    parser.add_argument('--profile', action='store_true',
+                        help="run under cProfile, saving stat_profile.prof and the slowest functions in stat_report.json")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="trace allocations with tracemalloc, adding peaks and top allocation sites to stat_report.json")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="worker processes drawing the charts in parallel (default: one per CPU core, 1 with "
+                             "--profile or --trace-memory); 1 draws them one after another in this process")
+    args = parser.parse_args(argv)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    workers = args.workers or (1 if args.profile or args.trace_memory else cores)
+    if workers < 1:
+        parser.error("--workers must be at least 1")
+    # the workers are forked to inherit the loaded data, without fork (Windows) the charts are drawn here
+    CHARTS.parallel = workers > 1 and 'fork' in multiprocessing.get_all_start_methods()
+
+    # Run all analysis functions, skipping those whose data did not change since the last run
+    manifest = Manifest()
+    params = script_params(__file__)
+    analyses = [
+        ('stats:delay', ['nping_data.txt', 'nping_data.npy'], analyze_delay_statistics),
+        ('stats:ran', ['lte_data.txt', 'lte_data.npy'], analyze_ran_statistics),
+        ('stats:throughput', ['iperf3_data.txt', 'iperf3_data.npy'], analyze_throughput_statistics),
+    ]
+    skipped = []
+    analyzed = {}
+    with diagnostics(INSTRUMENTS, PROFILE_FILE, args.profile, args.trace_memory) as extra:
+        for index, (stage, inputs, analyze) in enumerate(analyses):
+            if index:
+                print()
+            if not args.force and manifest.is_fresh(stage, inputs, params):
+                print(f"Skipping {stage}: {inputs[0]} unchanged since the last run, charts are up to date")
+                skipped.append(stage)
+                continue
+            del generated_files[:]
+            CHARTS.stage = stage
+            with INSTRUMENTS.stage(stage):
+                analyze()
+            analyzed[stage] = (inputs, list(generated_files))
+        for stage, files in CHARTS.render(workers).items():
+            analyzed[stage][1].extend(files)
+    for stage, (inputs, files) in analyzed.items():
+        manifest.record(stage, inputs, params, files)
+    manifest.save(__file__)
+    INSTRUMENTS.report(REPORT_FILE, skipped=skipped, **extra)
     
     print()
     print("=" * 50)
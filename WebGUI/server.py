@@ -1,6 +1,8 @@
 import subprocess
 from flask import Flask, render_template_string, request, jsonify
 import os
+import re
+import json
 
 app = Flask(__name__)
 
@@ -8,6 +10,42 @@ app = Flask(__name__)
 # This should match the path you set in your run_flask.sh script
 ANACONDA_PYTHON_EXECUTABLE = "/home/s338a494/anaconda3/bin/python3"
 
+# Build manifest written by the scripts (see the Manifest class in pipeline.py)
+MANIFEST_FILE = ".pipeline_manifest.json"
+
+# Last output of each script, shown again when a script has nothing to rebuild
+last_outputs = {}
+
+def script_is_up_to_date(script_name):
+    """True if every file the script read or wrote on its last run still has the same size and mtime
+
+    Checking the manifest here answers a repeated click in milliseconds, without
+    starting Python and importing pandas/matplotlib just to find nothing to do.
+    A script that picks its inputs by name also stored the names it could pick
+    from, so a new log (or one removed) makes it run again.
+    """
+    try:
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        files = manifest['scripts'][script_name]
+    except (OSError, ValueError, KeyError):
+        return False
+    watched = manifest.get('listings', {}).get(script_name)
+    if watched:
+        names = sorted(name for name in os.listdir('.') if re.match(watched['pattern'], name))
+        if names != watched['names']:
+            return False
+    for path, recorded in files.items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            if recorded is not None:
+                return False
+            continue
+        if recorded is None or [stat.st_size, stat.st_mtime_ns] != recorded:
+            return False
+    return True
+
 # A simple HTML template to serve. We'll load the actual index.html content here.
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -93,8 +131,13 @@ def run_script():
     if not os.path.exists(script_path):
         return jsonify({'success': False, 'error': f'Script "{script_name}" not found.'})
 
+    if script_is_up_to_date(script_name):
+        output = last_outputs.get(script_name, '')
+        return jsonify({'success': True, 'output': output + '\nInputs unchanged since the last run, results are up to date.'})
+
     try:
         process = subprocess.run([ANACONDA_PYTHON_EXECUTABLE, script_path], capture_output=True, text=True, check=True)
+        last_outputs[script_name] = process.stdout
         return jsonify({'success': True, 'output': process.stdout})
     except subprocess.CalledProcessError as e:
         return jsonify({'success': False, 'error': f'Script execution failed:\n{e.stderr}'})